@@ -1,9 +1,20 @@
-from sqlalchemy import create_engine
-from sqlalchemy import Table, Column, Integer, String, MetaData, ForeignKey, select, insert, update
-from read_from_db import read_all_from_db, RosterConnection
-from player_scrape import get_player_data_pandas, NFL
+from .read_from_db import read_all_from_db, RosterConnection
+from .player_scrape import player_url, NFL, enable_cache
+from .cache import RETIRED_TTL
+from .fetch import HostRateLimiter, DEFAULT_CONCURRENCY, DEFAULT_RATE
+from .jobs import JobQueue, DEFAULT_STALE_AFTER, PENDING
+from .writers import mlb_roster_writer, nfl_roster_writer, BufferedSink, DEFAULT_FLUSH_ROWS
+from .schemas import PLAYER_ID
+from .table_specs import get_spec, summary_columns, SEASONS, SUMMARY
+from .stat_tables import ensure_stat_table
+from .players_list import current_season
+from .pipeline import run_pipeline, parse_pool, parse_nfl_summary, parse_nfl_seasons, parse_mlb_batting, parse_mlb_tables
+from .sessions import get_database
+from .metrics import get_metrics
+from .player_index import SITES
+from .aggregates import materialize, SPECS as AGGREGATE_SPECS
+from functools import partial
 import pandas as pd
-import sqlite3
 import os
 
 
@@ -12,193 +23,292 @@ def mlb_add_to_all_players_db(db="sqlite", abs_path="/core/Databases/MLB/all_pla
                               row_vals=[]):
     """Adds players to database. Creates table and db and table if none exists. By default, the new databases will be
     created at /Databases/all_players.db from the current working directory. As of now, this only works for sqlite
+
+    This opens a connection for the one row, so for anything more than a handful of players use
+    writers.mlb_roster_writer directly (that is what mlb_get_player_list does).
     """
-    error = ""
     if db == "sqlite":
-        if not os.path.isfile(abs_path):
-            print("Creating new database!")
-
-        sql_engine = create_engine(db + ":///" + abs_path)
-        metadata = MetaData(sql_engine)
-        if not sql_engine.has_table(table):
-        # creates the following table if the table does not exist
-            player_list = Table(table, metadata,
-                                Column("Id", Integer, primary_key=True),
-                                Column('Name', String),
-                                Column('First', Integer),
-                                Column('Last', Integer),
-                                Column('HOF', String),)
-            metadata.create_all()
-            mlb_add_to_all_players_db(db=db, abs_path=abs_path, table=table, row_vals=row_vals)  # just a simple one-step recursion if the table doesn't exist
-        else:
-            player_list = Table(table, metadata, autoload=True)
-            try:
-                s = select(player_list).where(player_list.c.Id == row_vals[0])  # This line is to trigger the exception
-                # handling. If the above statement fails, this means that the current ID has not been created.
-                # Therefore, a new one must be inserted rather than updating the current ID. The reason for doing it
-                # this way is to account for when new players enter the league. This means that each time the table is
-                # updated the indexes of players may change depending on if new have entered the league since the last
-                # update. I will most likely think of a more sleek way to do this in the future.
-                updt = update(player_list).where(player_list.c.Id == row_vals[0]).values(Name=row_vals[1],First=row_vals[2],
-                                                                            Last=row_vals[3], HOF=row_vals[4])
-
-                sql_engine.execute(updt)
-            except:
-                # Inserts the data into the table if the id does not already exist
-                try:
-                    ins = player_list.insert().values(Id=row_vals[0],Name=row_vals[1], First=row_vals[2], Last=row_vals[3], HOF=row_vals[4])
-                    sql_engine.execute(ins)
-                except:
-                    print("Insert Failed") # This will be used to return the players that were not able to be processed
-            sql_engine.dispose()
+        with mlb_roster_writer(abs_path, table=table) as writer:
+            writer.add(row_vals)  # upserts on Id, so existing players are updated and new ones inserted
 
 
 def mlb_create_annual_db(db="sqlite", abs_path="/core/Databases/MLB/NFL.db", source_table="all_players_table",
-                         destination_table="all_players_batting", begin=0, end=1000):
+                         destination_table="all_players_batting", begin=0, end=1000, flush_rows=DEFAULT_FLUSH_ROWS,
+                         reset=False, stale_after=DEFAULT_STALE_AFTER, concurrency=DEFAULT_CONCURRENCY,
+                         rate=DEFAULT_RATE, processes=None, tables=None, refresh=False):
     """I had initially tried to add the annual batting data to the sql table one row at a time but found this much too
     time consuming
+
+    Players are buffered by a writers.BufferedSink and written flush_rows rows at a time. Which players are done is
+    kept in a jobs.JobQueue in the same database, so running this again carries on where the last run stopped and
+    never scrapes a finished player twice. reset=True drops the destination table and starts over, which used to
+    happen on every run.
+
+    Pages go through pipeline.run_pipeline: `concurrency` fetch threads, `processes` parser processes (None for one
+    per core, 0 to parse in this process) and the sink writing from this thread.
+
+    tables, a dict of table id -> destination table (i.e. MLB_TABLE_DESTINATIONS), stores every one of those tables
+    the page has from the one download, pitchers and two way players included, instead of only the batting of players
+    whose first table is batting. destination_table then only names the job.
+
+    Every player is fetched from the HREF the roster has for them, so namesakes each get their own page. Rows are
+    stored with the roster Id of their player as player_id, and the career/peak/era tables of the batting and
+    pitching tables (aggregates.materialize) are brought up to date at the end.
+
+    refresh=True is the nightly update, as for nfl_stat_builder: players whose Last year is the current season
+    (players_list.current_season("baseball")) are scraped again and their rows in every destination table replaced
+    in the same commit. Run players_list.refresh_mlb_roster first so the roster's Last years are up to date.
     """
 
     if db == "sqlite":
 
         if not os.path.isfile(abs_path):
             print("Creating new database!")
-        sql_engine = create_engine(db + ":////" + abs_path)
-        metadata = MetaData(sql_engine)
-        player_data = Table(destination_table, metadata, autoload=True)
-        player_data.drop(sql_engine)
 
+        queue = JobQueue(abs_path, job=destination_table)
+        if reset:
+            queue.reset()
+            queue.connection.execute('DROP TABLE IF EXISTS "{0}"'.format(destination_table))
 
+        metrics = get_metrics()
         try:
-            df = read_all_from_db(table=source_table)
-        except:
-            return print("Please configure database before proceeding. This can be done with add_to_all_players_db(). "
-                         "This will create a local sqlite db in the current working directory")
+            df = read_all_from_db(abs_path=abs_path, table=source_table)
+        except Exception as e:  # i.e. no roster table yet
+            metrics.error("roster", e)
+            return print("Please configure database before proceeding ({0}). This can be done with "
+                         "add_to_all_players_db(). This will create a local sqlite db in the current working "
+                         "directory".format(e))
+
+        # straight to the page the roster has for the player. Namesakes are keyed by their HREF so each of them gets
+        # a job, everyone else keeps the name as the key so queues from before this still line up. Rosters without
+        # an HREF column fall back on player_url
+        players = df.iloc[begin:begin+end]
+        hrefs = players['HREF'].where(players['HREF'].notna(), None) if 'HREF' in players else [None] * len(players)
+        repeated = set(players['Name'][players['Name'].duplicated()])
+        keys = [href if name in repeated and href else name for name, href in zip(players['Name'], hrefs)]
+        queue.enqueue((key, SITES["baseball"] + href if href else player_url(name), name, None)
+                      for key, name, href in zip(keys, players['Name'], hrefs))
+        player_ids = dict(zip(keys, (int(id_) for id_ in players['Id']))) if 'Id' in players else {}
+        if refresh and 'Last' in players:  # only active players' stats can have changed since the last build
+            season = current_season("baseball")
+            queue.requeue((key, SITES["baseball"] + href if href else player_url(name), name, None)
+                          for key, name, href, last in zip(keys, players['Name'], hrefs, players['Last'])
+                          if key in player_ids and pd.notna(last) and int(last) >= season)
+        queue.release_stale(older_than=stale_after)  # players a crashed run had claimed but not finished
+
+        limiter = HostRateLimiter(rate)
 
-        players = list(df['Name'])[begin:begin+end]
-        new_start = begin + end
         # This will use the code from player_scrape.py to return a list of pandas dataframes containing all Standard
         # Batting data available for the player's entire mlb career.
-        aggregate_df = []
+        if tables:
+            parse = partial(parse_mlb_tables, table_ids=list(tables))
+        else:
+            parse = parse_mlb_batting
+
+        destinations = list(tables.values()) if tables else [destination_table]
+
+        def replace_rows(connection, keys):
+            # a re-scraped player's new rows take the place of the old ones in every table, in the same commit
+            ids = [(player_ids[key],) for key in keys if key in player_ids]
+            for table in destinations if ids else ():
+                if PLAYER_ID in {row[1] for row in connection.execute('PRAGMA table_info("{0}")'.format(table))}:
+                    connection.executemany('DELETE FROM "{0}" WHERE "{1}" = ?'.format(table, PLAYER_ID), ids)
+            queue.mark_done(connection, keys)
+
+        with BufferedSink(abs_path, destination_table, flush_rows=flush_rows, on_flush=replace_rows) as sink:
+
+            def write(job, parsed):
+                player_id = player_ids.get(job.key)
+                if isinstance(parsed, dict):
+                    if not parsed:
+                        metrics.error("parse", "no_tables")
+                        queue.fail(job.key, "Error")
+                    else:  # marked done once every table's rows are committed
+                        sink.add_tables({tables[table_id]: ([row + [player_id] for row in rows], columns + [PLAYER_ID],
+                                                            table_id)
+                                         for table_id, (columns, rows) in parsed.items()}, tag=job.key)
+                elif parsed == "Pitcher":
+                    metrics.inc("players_skipped_total", reason="pitcher")
+                    queue.complete([job.key])  # nothing to store, but no reason to fetch them again either
+                elif isinstance(parsed, str):
+                    metrics.error("parse", parsed)
+                    queue.fail(job.key, parsed)
+                else:
+                    columns, rows = parsed
+                    sink.add_rows([row + [player_id] for row in rows], columns + [PLAYER_ID], "batting_standard",
+                                  tag=job.key)  # marked done when committed
 
-        for player in players:
-            try:
-                player_df = get_player_data_pandas(player)  #Returns a pandas dataframe of all of the annual batting data
-            # for players
+            def failed(job, error):
+                queue.fail(job.key, repr(error))  # run_pipeline has already counted it in the metrics
 
-                if isinstance(player_df, pd.DataFrame):
-                    player_df.to_sql(destination_table, con=sql_engine, if_exists="append")
-                else:
-                    continue
-            except:
-                continue
+            with parse_pool(processes) as pool:
+                while queue.counts()[PENDING]:  # players that failed late in a pass are retried in the next one
+                    jobs = ((job, job.url or player_url(job.name)) for batch in queue.drain() for job in batch)
+                    stats = run_pipeline(jobs, parse, write, failed, executor=pool,
+                                         concurrency=concurrency, limiter=limiter)
+                    print(stats.as_dict())
 
-        sql_engine.dispose()
+        print(metrics.summary())
+        print(queue.counts())
+        queue.close()
 
+        for table, table_id in (tables or {destination_table: "batting_standard"}).items():
+            if table_id in AGGREGATE_SPECS:
+                print(materialize(abs_path, table, table_id))
 
 
 
+
+# where mlb_create_annual_db(tables=...) puts each table
+MLB_TABLE_DESTINATIONS = {"batting_standard": "all_players_batting", "pitching_standard": "all_players_pitching",
+                          "standard_fielding": "all_players_fielding", "batting_value": "all_players_batting_value",
+                          "pitching_value": "all_players_pitching_value",
+                          "batting_postseason": "all_players_batting_postseason",
+                          "pitching_postseason": "all_players_pitching_postseason"}
+
+
 ### NFL
 
 
 def nfl_add_to_all_players_db(db="sqlite", abs_path="/core/Databases/NFL/NFL.db", table="all_nfl_players_table", row_vals=[]):
     """Adds players to database. Creates table and db and table if none exists. By default, the new databases will be
     created at /Databases/all_players.db from the current working directory. As of now, this only works for sqlite
+
+    This opens a connection for the one row, so for anything more than a handful of players use
+    writers.nfl_roster_writer directly (that is what nfl_get_player_list does).
     """
-    error = ""
     if db == "sqlite":
-        if not os.path.isfile(abs_path):
-            print("Creating new database!")
+        with nfl_roster_writer(abs_path, table=table) as writer:
+            writer.add(row_vals)
 
-        sql_engine = create_engine(db + ":///" + abs_path)
-        metadata = MetaData(sql_engine)
-        if not sql_engine.has_table(table):
-            # creates the following table if the table does not exist
-            player_list = Table(table, metadata,
-                                Column("Id", Integer, primary_key=True),
-                                Column('Position', String),
-                                Column('Name', String),
-                                Column('First', Integer),
-                                Column('Last', Integer),
-                                Column('HOF', String),
-                                Column('HREF', String))
-            metadata.create_all()
-            nfl_add_to_all_players_db(db=db, abs_path=abs_path, table=table, row_vals=row_vals)  # just a simple one-step recursion if the table doesn't exist
-        else:
-            player_list = Table(table, metadata, autoload=True)
-            try:
-                s = select(player_list).where(player_list.c.Id == row_vals[0])  # This line is to trigger the exception
-                # handling. If the above statement fails, this means that the current ID has not been created.
-                # Therefore, a new one must be inserted rather than updating the current ID. The reason for doing it
-                # this way is to account for when new players enter the league. This means that each time the table is
-                # updated the indexes of players may change depending on if new have entered the league since the last
-                # update. I will most likely think of a more sleek way to do this in the future.
-                updt = update(player_list).where(player_list.c.Id == row_vals[0]).values(Position=row_vals[1], Name=row_vals[2],
-                                                                                         First=row_vals[3],
-                                                                                         Last=row_vals[4], HOF=row_vals[5], HREF=row_vals[6])
-
-                sql_engine.execute(updt)
-            except:
-                # Inserts the data into the table if the id does not already exist
-                try:
-                    ins = player_list.insert().values(Id=row_vals[0], Position=row_vals[1], Name=row_vals[2], First=row_vals[3],
-                                                      Last=row_vals[4], HOF=row_vals[5], HREF=row_vals[6])
-                    sql_engine.execute(ins)
-                except:
-                    print("Insert Failed") # This will be used to return the players that were not able to be processed
-            sql_engine.dispose()
-
-
-def nfl_stat_builder(db="sqlite", database="", destination_table="nfl_wrs_1994", position="", last_year=0, HOF=True):
+
+def nfl_stat_builder(db="sqlite", database="", destination_table="nfl_wrs_1994", position="", last_year=0, HOF=True,
+                     concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, cache_dir=None, flush_rows=DEFAULT_FLUSH_ROWS,
+                     reset=False, stale_after=DEFAULT_STALE_AFTER, processes=None, refresh=False, columnar_dir=None,
+                     seasons=False):
     """I had initially tried to add the annual batting data to the sql table one row at a time but found this much too
     time consuming
+
+    Player pages are downloaded concurrently by fetch_pages (up to `concurrency` at a time, with at most `rate`
+    requests per second going to pro-football-reference) and handed to a pool of `processes` parser processes (None
+    for one per core, 0 to parse in this process), see pipeline.run_pipeline. If cache_dir is given the pages are
+    kept in an on-disk cache there, so re-running the build after a crash only downloads the players it hadn't gotten
+    to yet. Rows are written flush_rows at a time by a writers.BufferedSink.
+
+    Progress is checkpointed in a jobs.JobQueue stored in the same database: a player is marked done in the same
+    commit that writes their row, failures are retried with an exponential backoff, and several processes can run
+    the same build at once and split the players between them. Re-running after a crash only does what is left.
+    reset=True starts the build over. Returns the names of the players that failed every attempt.
+
+    refresh=True is the nightly update: players who played in the current season (players_list.current_season) are
+    scraped again and their old row replaced, everyone else stays as it is. Run players_list.refresh_nfl_roster first
+    so new players and the roster's Last years are up to date.
+
+    columnar_dir mirrors the finished table into a columnar.ColumnarStore there (football/position partition) for
+    analysis, read it back with read_all_from_db(db="parquet", abs_path=columnar_dir, table=destination_table).
+
+    seasons=True stores every season row of the position's table (with the player's name and player_id) instead of
+    the one career summary row. For the tables aggregates knows (WR and TE), its career/peak/era tables are brought
+    up to date with aggregates.materialize at the end. The tables and columns read for a position come from
+    table_specs (WR, TE, RB and QB so far), another position only needs a spec registered there.
+
+    Progress goes to metrics.get_metrics() (fetch/parse/flush times, rows written, errors by cause) rather than a
+    line per player, a summary is printed at the end. See cli.py --metrics to save all of it.
     """
+    spec = get_spec("football", position, SEASONS if seasons else SUMMARY)  # KeyError for positions without one
+    if cache_dir is not None:
+        enable_cache(cache_dir)
 
     if db == "sqlite":
 
-        if not os.path.isfile(database):
-            print("Creating new database!")
-        sql_engine = create_engine(db + ":///" + database)
+        queue = JobQueue(database, job=destination_table)
+        if reset:
+            queue.reset()
 
         nfl_players = RosterConnection(db=database, table="all_nfl_players_table")
 
-        df = nfl_players.special_select(column="Position", position=position, last_year=last_year)
+        df = nfl_players.special_select(column="Position", value=position, last_year=last_year,
+                                        columns=["Id", "Name", "HREF", "HOF", "Last"])
+        nfl_players.close()
+
+        # Every player goes in the queue keyed by their HREF. Players that are already done from an earlier run are
+        # left alone, so only the ones that are still pending get fetched
+        players = [(href, NFL.base_url + href, name, {"HOF": hof, "Last": int(last), "Id": int(id_)})
+                   for id_, name, href, hof, last in zip(df['Id'], df['Name'], df['HREF'], df['HOF'], df['Last'])]
+        queue.enqueue(players)
+        season = current_season("football")
+        if refresh:  # only active players' stats can have changed since the last build
+            queue.requeue(player for player in players if player[3]["Last"] >= season)
+        queue.release_stale(older_than=stale_after)
+        player_ids = {player[0]: player[3]["Id"] for player in players}
+
+        def ttl(job):
+            # retired players' pages can stay cached for a long time. Whoever played in the season that just ended
+            # isn't retired until the next one starts without them
+            return RETIRED_TTL if job.data["Last"] < season else None
+
+        limiter = HostRateLimiter(rate)
+
+        if seasons:
+            # the season table's columns come from the page, pandas creates it with the first flush
+            parse, table_id = partial(parse_nfl_seasons, position=position), spec.name
+        else:
+            # typed columns and a player_id pointing at the roster. A table left over from before that gets migrated
+            ensure_stat_table(database, destination_table, spec.name, position=position)
+            parse, table_id = partial(parse_nfl_summary, position=position), spec.name
+            columns = summary_columns(spec) + [PLAYER_ID]
+
+        def replace_rows(connection, keys):
+            # a re-scraped player's new rows take the place of the old ones, in the same commit
+            if connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                  (destination_table,)).fetchone():
+                connection.executemany('DELETE FROM "{0}" WHERE "{1}" = ?'.format(destination_table, PLAYER_ID),
+                                       ((player_ids[key],) for key in keys if key in player_ids))
+            queue.mark_done(connection, keys)
+
+        with BufferedSink(database, destination_table, flush_rows=flush_rows, on_flush=replace_rows) as sink:
+
+            def write(job, parsed):
+                player_id = player_ids.get(job.key, job.data.get("Id"))
+                if seasons:
+                    page_columns, rows = parsed
+                    sink.add_rows([row + [player_id] for row in rows], page_columns + [PLAYER_ID], table_id,
+                                  tag=job.key)
+                else:
+                    sink.add_rows([parsed + [player_id]], columns, table_id, tag=job.key)  # done once committed
 
-        players = list(df['Name'])
-        player_url = list(df['HREF'])
-        HOF = list(df['HOF'])
-        print(HOF[0])
+            def failed(job, error):
+                queue.fail(job.key, repr(error))  # retried later with a backoff, run_pipeline counted the cause
 
-        # This will use the code from player_scrape.py to return a list of pandas dataframes containing all Standard
-        # Batting data available for the player's entire mlb career.
-        i = 0
-        errors = []
+            with parse_pool(processes) as pool:
+                while queue.counts()[PENDING]:  # players that failed late in a pass are retried in the next one
+                    jobs = ((job, job.url) for batch in queue.drain(batch_size=concurrency * 4) for job in batch)
+                    stats = run_pipeline(jobs, parse, write, failed, executor=pool, concurrency=concurrency,
+                                         limiter=limiter, ttl=ttl)
+                    print(stats.as_dict())
 
-        while i < len(players):
+        print(get_metrics().summary())
+        print(queue.counts())
 
-            player = NFL(players[i], player_url=player_url[i])  #Returns a pandas dataframe of all of the annual batting data
-            try:
-                player_data = player.get_summary(position, HOF[i])
-                player_df = pd.DataFrame([player_data], columns=['GS', 'Tgt', 'Rec', 'Yds', 'Y/R', 'TD', '1D', 'Lng', 'R/G', 'Y/G', 'Ctch%',
-                                                        'Y/Tgt', 'Name', 'HOF'])
-                if isinstance(player_df, pd.DataFrame):
-                    player_df.to_sql(destination_table, con=sql_engine, if_exists="append")
-                    print(player.name)
+        errors = [name for key, name, attempts, error in queue.failures()]
+        queue.close()
 
-            except:
-                errors.append(player.name)
-                print("error ", player.name)
-            i += 1
+        if columnar_dir is not None:
+            from .columnar import ColumnarStore  # needs pyarrow, only imported if asked for
+            ColumnarStore(columnar_dir).import_sqlite(database, destination_table, "football", position=position,
+                                                      season_column="Year" if seasons else None)
 
-        sql_engine.dispose()
+        if seasons and table_id in AGGREGATE_SPECS:
+            print(materialize(database, destination_table, table_id))
 
         return errors
 
 
-
-
-errors = nfl_stat_builder(database="/Users/nickblackmore/personal_projects/sportscrape/_database_creation/core/Databases/NFL.db",
-    position='WR', last_year=1994)
+if __name__ == "__main__":
+    # python -m sportscrape.add_rows_to_db Databases/NFL.db --position WR --last-year 1994, same as sportscrape stats
+    import sys
+    from .cli import main
+    sys.exit(main(["stats"] + sys.argv[1:]))
 
 
 """
@@ -217,11 +327,9 @@ NFL.db
 
 def delete_sqlite_table(db, table=''):
 
-    conn = sqlite3.connect(db)
-    cur = conn.cursor()
-    sql = "DELETE FROM {0}".format(table)
-    cur.execute(sql)
-    conn.commit()
+    with get_database(db).connection() as conn, conn:
+        sql = "DELETE FROM {0}".format(table)
+        conn.execute(sql)
 
 
 #delete_sqlite_table("/Users/nickblackmore/personal_projects/sportscrape/_database_creation/core/Databases/NFL.db",
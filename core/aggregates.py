@@ -0,0 +1,274 @@
+"""Career, peak and era aggregates computed from stored season rows.
+
+The summary rows the builders scrape are whatever Sports Reference put in the table footer, so anything else (best
+three seasons, a player's numbers since 1994, ages 25-29) used to mean scraping again. Here the per-season tables
+(nfl_stat_builder(seasons=True) for WR/TE, mlb_create_annual_db) are summed with a groupby and the rate stats
+recomputed from the sums, which is the only correct way to combine them (a career Y/R is total yards over total
+receptions, not the mean of the season Y/Rs). Both builders store a player_id with every season row, which is what
+the summaries are keyed by.
+
+materialize() stores the results in summary tables next to the season table. The builders call it at the end of a
+seasons build (so does `sportscrape aggregates`), and triggers on the season table keep a list of the players whose
+rows were inserted, updated or deleted since, so a refresh only recomputes those players:
+
+    materialize("Databases/NFL.db", "nfl_receiving", "receiving_and_rushing")
+    -> nfl_receiving_career, nfl_receiving_peak3, nfl_receiving_era
+"""
+import numpy as np
+import pandas as pd
+
+from .schemas import sql_rows, sql_type
+from .sessions import get_database
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    def rate(totals):
+        bottom = totals[denominator].astype("float64")
+        return scale * totals[numerator].astype("float64") / bottom.where(bottom != 0)
+    return rate
+
+
+def _obp(totals):
+    on_base = totals["H"] + totals["BB"] + totals["HBP"]
+    chances = (totals["AB"] + totals["BB"] + totals["HBP"] + totals["SF"]).astype("float64")
+    return on_base / chances.where(chances != 0)
+
+
+def _win_loss(totals):
+    decisions = (totals["W"] + totals["L"]).astype("float64")
+    return totals["W"] / decisions.where(decisions != 0)
+
+
+def _ip_to_outs(ip):
+    # innings pitched are written with thirds after the point, 6.2 is six and two thirds innings
+    ip = pd.to_numeric(ip, errors="coerce").astype("float64")
+    whole = np.floor(ip)
+    return whole * 3 + np.round((ip - whole) * 10)
+
+
+# per table id: columns summed, columns where the career value is the best season, rate stats recomputed from the
+# summed columns, and the stat a player's peak seasons are picked by
+SPECS = {
+    "receiving_and_rushing": {
+        "sums": ["G", "GS", "Tgt", "Rec", "Yds", "TD", "1D", "Rush", "Yds.1", "TD.1", "1D.1", "YScm", "RRTD", "Fmb",
+                 "AV"],
+        "maxes": ["Lng"],
+        "rates": {"Y/R": _ratio("Yds", "Rec"), "Ctch%": _ratio("Rec", "Tgt"), "Y/G": _ratio("Yds", "G"),
+                  "R/G": _ratio("Rec", "G"), "Y/Tgt": _ratio("Yds", "Tgt"), "Y/A": _ratio("Yds.1", "Rush")},
+        "peak_by": "Yds",
+    },
+    "batting_standard": {
+        "sums": ["G", "PA", "AB", "R", "H", "2B", "3B", "HR", "RBI", "SB", "CS", "BB", "SO", "TB", "GDP", "HBP", "SH",
+                 "SF", "IBB"],
+        "maxes": [],
+        "rates": {"BA": _ratio("H", "AB"), "OBP": _obp, "SLG": _ratio("TB", "AB"),
+                  "OPS": lambda totals: _obp(totals) + _ratio("TB", "AB")(totals)},
+        "peak_by": "TB",
+    },
+    "pitching_standard": {
+        "derived": {"outs": lambda seasons: _ip_to_outs(seasons["IP"])},
+        "sums": ["W", "L", "G", "GS", "GF", "CG", "SHO", "SV", "outs", "H", "R", "ER", "HR", "BB", "IBB", "SO", "HBP",
+                 "BK", "WP", "BF"],
+        "maxes": [],
+        "rates": {"IP": lambda totals: totals["outs"] / 3, "ERA": _ratio("ER", "outs", 27),
+                  "WHIP": lambda totals: 3 * (totals["BB"] + totals["H"]) / totals["outs"].where(totals["outs"] != 0),
+                  "SO9": _ratio("SO", "outs", 27), "W-L%": _win_loss},
+        "peak_by": "SO",
+    },
+}
+
+# (label, first season, last season) with None for open ended. Roughly the rule and league changes that moved the
+# numbers the most
+NFL_ERAS = [("pre-1970", None, 1969), ("1970-1977", 1970, 1977), ("1978-1993", 1978, 1993),
+            ("1994-2009", 1994, 2009), ("2010-", 2010, None)]
+MLB_ERAS = [("dead ball", None, 1919), ("live ball", 1920, 1941), ("integration", 1942, 1960),
+            ("expansion", 1961, 1976), ("free agency", 1977, 1993), ("steroid", 1994, 2005), ("modern", 2006, None)]
+ERAS = {"receiving_and_rushing": NFL_ERAS, "batting_standard": MLB_ERAS, "pitching_standard": MLB_ERAS}
+
+DEFAULT_KINDS = ("career", "peak", "era")
+DEFAULT_PEAK_SEASONS = 3
+DIRTY_TABLE = "aggregate_dirty"  # (season table, player) written to since the last materialize
+
+_multi_team = r"^(TOT|\dTM)$"  # the row that totals a season split between teams
+
+
+def season_totals(seasons, table_id, player="player_id", season="Year", team="Tm"):
+    """One row per player season. Players traded mid season have a row per team plus one totalling them (TOT, or
+    2TM/3TM), only the total is kept so nothing is counted twice"""
+    seasons = seasons[pd.to_numeric(seasons[season], errors="coerce").notna()]  # blank/summary rows
+    if team in seasons.columns:
+        is_total = seasons[team].astype("string").str.match(_multi_team).fillna(False).astype(bool)
+        totalled = pd.MultiIndex.from_frame(seasons.loc[is_total, [player, season]])
+        split = pd.MultiIndex.from_frame(seasons[[player, season]]).isin(totalled) & ~is_total.to_numpy()
+        seasons = seasons[~split]
+    for column, derive in SPECS[table_id].get("derived", {}).items():
+        seasons = seasons.assign(**{column: derive(seasons)})
+    return seasons
+
+
+def aggregate(seasons, table_id, by, season="Year"):
+    """Sums/maxes every group of season rows and recomputes the rate stats from the totals. Vectorized, one
+    groupby for the whole frame"""
+    spec = SPECS[table_id]
+    sums = [column for column in spec["sums"] if column in seasons.columns]
+    maxes = [column for column in spec["maxes"] if column in seasons.columns]
+    numeric = seasons[sums + maxes].apply(pd.to_numeric, errors="coerce")
+    numeric[by] = seasons[by]
+    numeric[season] = pd.to_numeric(seasons[season], errors="coerce")
+
+    grouped = numeric.groupby(by, sort=False, dropna=False)
+    totals = grouped[sums].sum(min_count=1)
+    if maxes:
+        totals = totals.join(grouped[maxes].max())
+    totals = totals.assign(seasons=grouped[season].count(), first=grouped[season].min(), last=grouped[season].max())
+    for name, rate in spec["rates"].items():
+        if all(column in totals.columns for column in _inputs(rate, totals)):
+            totals[name] = rate(totals)
+    if "name" in seasons.columns and "name" not in by:
+        totals = totals.join(seasons.groupby(by, sort=False, dropna=False)["name"].first())
+    return totals.reset_index()
+
+
+def _inputs(rate, totals):
+    # the columns a rate needs, found by running it on an empty frame. A missing one raises KeyError
+    try:
+        rate(totals.iloc[:0])
+    except KeyError as e:
+        return [e.args[0]]
+    return []
+
+
+def career(seasons, table_id, player="player_id", season="Year", ages=None, years=None, age="Age"):
+    """Career totals, optionally only over an age range or a span of seasons, i.e. ages=(25, 29), years=(1994, None).
+    Works on any frame of season rows so custom windows never need a re-scrape"""
+    seasons = season_totals(seasons, table_id, player, season)
+    mask = pd.Series(True, index=seasons.index)
+    for column, window in ((age, ages), (season, years)):
+        if window is not None:
+            values = pd.to_numeric(seasons[column], errors="coerce")
+            low, high = window
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+    return aggregate(seasons[mask], table_id, [player], season)
+
+
+def peak(seasons, table_id, n=DEFAULT_PEAK_SEASONS, player="player_id", season="Year"):
+    """Totals over each player's n best seasons by the table's peak stat"""
+    seasons = season_totals(seasons, table_id, player, season)
+    by = SPECS[table_id]["peak_by"]
+    ranked = seasons.assign(_rank=pd.to_numeric(seasons[by], errors="coerce")).sort_values("_rank", ascending=False)
+    best = ranked.groupby(player, sort=False, dropna=False).head(n).drop(columns="_rank")
+    return aggregate(best, table_id, [player], season)
+
+
+def era(seasons, table_id, eras=None, player="player_id", season="Year"):
+    """Totals per player per era, see NFL_ERAS/MLB_ERAS"""
+    seasons = season_totals(seasons, table_id, player, season)
+    eras = eras or ERAS[table_id]
+    years = pd.to_numeric(seasons[season], errors="coerce")
+    labels = pd.Series(pd.NA, index=seasons.index, dtype="object")
+    for label, first, last in eras:
+        mask = years.notna()
+        if first is not None:
+            mask &= years >= first
+        if last is not None:
+            mask &= years <= last
+        labels[mask] = label
+    seasons = seasons.assign(era=labels)
+    return aggregate(seasons[labels.notna()], table_id, [player, "era"], season)
+
+
+def materialize(abs_path, source_table, table_id, player="player_id", season="Year", kinds=DEFAULT_KINDS,
+                peak_seasons=DEFAULT_PEAK_SEASONS, eras=None, full=False):
+    """Brings the summary tables of a season table up to date.
+
+    The first run recomputes every player and puts triggers on the season table that record the player of every row
+    inserted, updated or deleted in aggregate_dirty. After that only those players are read and recomputed (a
+    player whose rows are all gone loses their summary rows), their old summary rows replaced and the list cleared in
+    the same transaction. Rowids can't be used for this, sqlite hands a deleted row's rowid to the next insert.
+    full=True recomputes everyone. Returns {summary table: players updated}.
+    """
+    pooled = get_database(abs_path)
+    connection = pooled.checkout()
+    connection.isolation_level = None  # transactions by hand, the summary writes and the dirty list go together
+    targets = {kind: _target(source_table, kind, peak_seasons) for kind in kinds}
+    try:
+        if not _exists(connection, "table", source_table):
+            return {target: 0 for target in targets.values()}
+
+        connection.execute("BEGIN IMMEDIATE")  # no writes to the season table between reading it and clearing the list
+        try:
+            everyone = full or not _exists(connection, "trigger", _trigger(source_table, "insert"))
+            _track(connection, source_table, player)
+            connection.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" ON "{0}" ("{1}")'.format(source_table, player))
+            # the affected players' full histories, not just the changed rows, since their totals change as a whole
+            if everyone:
+                where, params = '"{0}" IS NOT NULL'.format(player), ()
+            else:
+                where, params = '"{0}" IN (SELECT player FROM "{1}" WHERE source = ?)'.format(player, DIRTY_TABLE), \
+                    (source_table,)
+                players = [row[0] for row in connection.execute(
+                    'SELECT player FROM "{0}" WHERE source = ?'.format(DIRTY_TABLE), params)]
+            seasons = pd.read_sql_query('SELECT * FROM "{0}" WHERE {1}'.format(source_table, where), connection,
+                                        params=params)
+            if everyone:
+                players = seasons[player].unique().tolist()
+
+            results = {}
+            for kind, target in targets.items() if players else ():
+                if kind == "career":
+                    results[target] = career(seasons, table_id, player, season)
+                elif kind == "peak":
+                    results[target] = peak(seasons, table_id, peak_seasons, player, season)
+                elif kind == "era":
+                    results[target] = era(seasons, table_id, eras, player, season)
+
+            for target, df in results.items():
+                if everyone:
+                    connection.execute('DROP TABLE IF EXISTS "{0}"'.format(target))
+                _create_like(connection, target, df, player)
+                connection.executemany('DELETE FROM "{0}" WHERE "{1}" = ?'.format(target, player),
+                                       ((p,) for p in players))
+                connection.executemany('INSERT INTO "{0}" ({1}) VALUES ({2})'.format(
+                    target, ", ".join('"{0}"'.format(c) for c in df.columns), ", ".join("?" * len(df.columns))),
+                    sql_rows(df))
+            connection.execute('DELETE FROM "{0}" WHERE source = ?'.format(DIRTY_TABLE), (source_table,))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return {target: len(players) for target in targets.values()}
+    finally:
+        pooled.release(connection)
+
+
+def _exists(connection, kind, name):
+    return connection.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name)).fetchone() \
+        is not None
+
+
+def _trigger(source_table, event):
+    return "{0}_aggregates_{1}".format(source_table, event)
+
+
+def _track(connection, source_table, player):
+    # an update can move a row from one player to another, both of them are recorded
+    connection.execute('CREATE TABLE IF NOT EXISTS "{0}" (source TEXT NOT NULL, player NOT NULL, '
+                       'PRIMARY KEY (source, player))'.format(DIRTY_TABLE))
+    for event, rows in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+        record = " ".join('INSERT OR IGNORE INTO "{0}" (source, player) SELECT \'{1}\', {2}."{3}" WHERE {2}."{3}" IS '
+                          'NOT NULL;'.format(DIRTY_TABLE, source_table, row, player) for row in rows)
+        connection.execute('CREATE TRIGGER IF NOT EXISTS "{0}" AFTER {1} ON "{2}" BEGIN {3} END'.format(
+            _trigger(source_table, event.lower()), event, source_table, record))
+
+
+def _target(source_table, kind, peak_seasons):
+    return "{0}_{1}".format(source_table, "peak{0}".format(peak_seasons) if kind == "peak" else kind)
+
+
+def _create_like(connection, table, df, player):
+    definitions = ['"{0}" {1}'.format(column, sql_type(dtype)) for column, dtype in df.dtypes.items()]
+    connection.execute('CREATE TABLE IF NOT EXISTS "{0}" ({1})'.format(table, ", ".join(definitions)))
+    connection.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" ON "{0}" ("{1}")'.format(table, player))
@@ -0,0 +1,84 @@
+"""Memory held by players: the whole roster in Databases/NFL.db as RosterRecords, a DataFrame, Athlete objects and
+an AthleteBatch, then a few hundred loaded NFL players holding their page and soup (the way they used to) against
+released ones that only keep their stats. The DataFrame shares its strings with the rows it was made from, so its
+number leaves the text out.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_athletes --loaded 200
+"""
+import argparse
+import gc
+import os
+import sqlite3
+import tracemalloc
+
+import pandas as pd
+
+from ..player_scrape import NFL
+from ..roster_parser import RosterRecord
+from .pages import nfl_player_page
+
+
+ROSTER_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Databases", "NFL.db")
+
+
+def measure(build):
+    """(bytes still allocated by what build() returns, the thing itself)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, built
+
+
+def roster_rows():
+    connection = sqlite3.connect(ROSTER_DB)
+    rows = connection.execute("SELECT Name, Position, First, Last, HOF, HREF FROM all_nfl_players_table").fetchall()
+    connection.close()
+    return rows
+
+
+def loaded(n, release):
+    players = []
+    for i in range(n):
+        player = NFL("Player {0}".format(i), player_url="/players/X/Play{0:04d}.htm".format(i),
+                     content=nfl_player_page("Player {0}".format(i), seed=i))
+        summary = player.get_summary("WR", "No")
+        if release:
+            player.release()
+        else:
+            player.soup  # what every NFL object used to hold on to
+        players.append((player, summary))
+    return players
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loaded", type=int, default=200, help="players to load with their pages")
+    args = parser.parse_args(argv)
+
+    rows = roster_rows()
+    records = [RosterRecord(*row) for row in rows]
+    print("{0} roster players".format(len(rows)))
+    builds = [
+        ("RosterRecords", lambda: [RosterRecord(*row) for row in rows]),
+        ("DataFrame", lambda: pd.DataFrame(rows, columns=["Name", "Position", "First", "Last", "HOF", "HREF"])),
+        ("NFL objects", lambda: [NFL(r.name, player_url=r.href, hof=r.hof) for r in records]),
+        ("AthleteBatch", lambda: NFL.from_roster(records)),
+    ]
+    for label, build in builds:
+        size, _ = measure(build)
+        print("  {0:<15} {1:>8.1f} MB {2:>7.0f} bytes/player".format(label, size / 1024 ** 2, size / len(rows)))
+
+    print("{0} players with their stats read".format(args.loaded))
+    for label, release in (("page and soup", False), ("released", True)):
+        size, _ = measure(lambda: loaded(args.loaded, release))
+        print("  {0:<15} {1:>8.1f} MB {2:>7.0f} KB/player".format(label, size / 1024 ** 2, size / 1024 / args.loaded))
+
+
+if __name__ == "__main__":
+    main()
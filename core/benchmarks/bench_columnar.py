@@ -0,0 +1,59 @@
+"""Loading a stat table for analysis: pd.read_sql_query on sqlite against the columnar.ColumnarStore copy.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_columnar --rows 200000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+from ..columnar import ColumnarStore
+from .bench_export import build_table
+
+
+ANALYSIS_COLUMNS = ["GS", "Tgt", "Rec", "Yds", "TD", "1D"]  # what the wide receiver notebook clusters on
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stats.db")
+        build_table(path, args.rows)
+        store = ColumnarStore(os.path.join(tmp, "columnar"))
+        store.import_sqlite(path, "nfl_wrs", "football", position="WR")
+
+        connection = sqlite3.connect(path)
+        projection = ", ".join('"{0}"'.format(column) for column in ANALYSIS_COLUMNS)
+        timings = [
+            ("read_sql_query, all columns", lambda: pd.read_sql_query("SELECT * FROM nfl_wrs", connection)),
+            ("read_sql_query, 6 columns", lambda: pd.read_sql_query(
+                "SELECT {0} FROM nfl_wrs".format(projection), connection)),
+            ("parquet, all columns", lambda: store.read("nfl_wrs")),
+            ("parquet, 6 columns", lambda: store.read("nfl_wrs", columns=ANALYSIS_COLUMNS)),
+            ("parquet, 6 columns, WR", lambda: store.read("nfl_wrs", columns=ANALYSIS_COLUMNS,
+                                                          filters={"position": "WR"})),
+        ]
+        for label, fn in timings:
+            print("{0:<30} {1:8.1f} ms".format(label, 1000 * best_of(fn)))
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Peak memory of exporting a stat table: read_all_from_db + to_csv against the chunked iter_from_db + exporters.
+
+Builds a typed table of synthetic career rows first, then measures each export with tracemalloc.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_export --rows 200000 --chunk-rows 10000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from ..exporters import export
+from ..read_from_db import read_all_from_db, iter_from_db
+from ..schemas import NFL_WR_SUMMARY_COLUMNS
+from ..stat_tables import create_stat_table
+
+
+def build_table(path, rows):
+    rng = random.Random(0)
+    connection = sqlite3.connect(path)
+    create_stat_table(connection, "nfl_wrs", "nfl_wr_summary")
+    sql = 'INSERT INTO nfl_wrs VALUES ({0})'.format(", ".join("?" * (len(NFL_WR_SUMMARY_COLUMNS) + 1)))
+    batch = []
+    for i in range(rows):
+        batch.append([rng.randint(0, 200) for _ in range(4)] + [round(rng.uniform(5, 20), 1)] +
+                     [rng.randint(0, 100) for _ in range(3)] + [round(rng.uniform(0, 100), 1) for _ in range(2)] +
+                     [round(rng.random(), 3), round(rng.uniform(3, 12), 1), "Player {0}".format(i), "No", i])
+        if len(batch) == 10000:
+            connection.executemany(sql, batch)
+            batch = []
+    connection.executemany(sql, batch)
+    connection.commit()
+    connection.close()
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    took = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return took, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--chunk-rows", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stats.db")
+        build_table(path, args.rows)
+
+        def materialized():
+            read_all_from_db(abs_path=path, table="nfl_wrs").to_csv(os.path.join(tmp, "all.csv"), index=False)
+
+        def streamed():
+            export(iter_from_db(path, "nfl_wrs", chunk_rows=args.chunk_rows), os.path.join(tmp, "chunked.csv"))
+
+        for label, fn in (("read_all_from_db + to_csv", materialized), ("iter_from_db + export", streamed)):
+            took, peak = measure(fn)
+            print("{0:<26} {1:7.2f}s   peak {2:8.1f} MB".format(label, took, peak / 2 ** 20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compares downloading + parsing player pages one at a time (the old nfl_stat_builder loop) with fetch_pages.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_fetch --players 200 --latency 0.15 --concurrency 16
+"""
+import argparse
+import os
+import time
+
+from ..player_scrape import NFL, get_page
+from ..fetch import fetch_pages
+from .pages import nfl_player_page
+from .standin import StandInServer
+
+
+def make_pages(n):
+    pages = {}
+    for i in range(n):
+        pages["/players/X/Play{0:04d}.htm".format(i)] = nfl_player_page("Player {0}".format(i), seed=i)
+    return pages
+
+
+def saved_pages(directory):
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            paths.append("/" + os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/"))
+    return paths
+
+
+def sequential(base_url, paths):
+    for path in paths:
+        player = NFL("Test Player", player_url=path, content=get_page(base_url + path))
+        player.get_summary("WR", "No")
+
+
+def concurrent(base_url, paths, concurrency):
+    jobs = ((path, base_url + path) for path in paths)
+    for path, url, content, error in fetch_pages(jobs, concurrency=concurrency, rate=None):
+        if error is not None:
+            raise error
+        player = NFL("Test Player", player_url=path, content=content)
+        player.get_summary("WR", "No")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds the stand-in waits before responding")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--pages", default=None, help="directory of saved pages to serve instead of generated ones")
+    args = parser.parse_args(argv)
+
+    pages = {} if args.pages else make_pages(args.players)
+    with StandInServer(pages, directory=args.pages, latency=args.latency) as server:
+        paths = sorted(saved_pages(args.pages) if args.pages else pages)[:args.players]
+
+        start = time.perf_counter()
+        sequential(server.url, paths)
+        seq = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concurrent(server.url, paths, args.concurrency)
+        conc = time.perf_counter() - start
+
+    print("players: {0}  latency: {1}s".format(len(paths), args.latency))
+    print("sequential:               {0:8.2f}s  {1:8.1f} pages/s".format(seq, len(paths) / seq))
+    print("fetch_pages (x{0:d}):{3}{1:8.2f}s  {2:8.1f} pages/s".format(args.concurrency, conc, len(paths) / conc, " " * (11 - len(str(args.concurrency)))))
+    print("speedup: {0:.1f}x".format(seq / conc))
+
+
+if __name__ == "__main__":
+    main()
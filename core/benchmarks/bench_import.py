@@ -0,0 +1,60 @@
+"""Start up time: `sportscrape --help` and importing each module, every one in a fresh interpreter.
+
+Fails (exit status 1) if --help takes longer than --max-help-ms, so it can be used as a regression check. Also
+lists which heavy dependencies (pandas, requests, bs4, SQLAlchemy...) each module pulls in when imported.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_import --repeat 5 --max-help-ms 100
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+CORE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(CORE)  # subprocesses run from here, so the package imports from a checkout too
+PACKAGE = __package__.rpartition(".")[0]  # sportscrape, or core in a checkout that isn't installed
+MODULES = ["cli", "sessions", "fetch", "jobs", "table_extract", "roster_parser", "cache", "schemas", "player_scrape",
+           "read_from_db", "writers", "players_list", "pipeline", "add_rows_to_db", "similarity", "aggregates"]
+HEAVY = ["pandas", "numpy", "requests", "bs4", "lxml", "sqlalchemy", "pyarrow"]
+
+_report_heavy = "import sys, {0}; print(' '.join(m for m in {1!r} if m in sys.modules))"
+
+
+def best_time(command, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return 1000 * min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-help-ms", type=float, default=100.0)
+    args = parser.parse_args(argv)
+
+    baseline = best_time([sys.executable, "-c", "pass"], args.repeat)
+    help_ms = best_time([sys.executable, "-m", PACKAGE + ".cli", "--help"], args.repeat)
+    print("{0:<16} {1:7.1f} ms".format("interpreter", baseline))
+    print("{0:<16} {1:7.1f} ms".format("cli --help", help_ms))
+
+    for module in MODULES:
+        took = best_time([sys.executable, "-c", "import {0}.{1}".format(PACKAGE, module)], args.repeat)
+        heavy = subprocess.run([sys.executable, "-c", _report_heavy.format(PACKAGE + "." + module, HEAVY)],
+                               cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        print("{0:<16} {1:7.1f} ms   {2}".format(module, took, heavy))
+
+    if help_ms > args.max_help_ms:
+        print("cli --help took {0:.1f} ms, more than {1:.0f} ms".format(help_ms, args.max_help_ms))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""pipeline.run_pipeline with the parsing done in-process against 1..N parser processes.
+
+Serves synthetic player pages from a local StandInServer with no rate limit, so parsing is the bottleneck and the
+pages/s should go up with the number of processes until the fetch threads or the writer become the limit.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_pipeline --players 400 --processes 0 1 2 4
+"""
+import argparse
+import os
+import tempfile
+from functools import partial
+
+from ..jobs import Job
+from ..pipeline import run_pipeline, parse_pool, parse_nfl_summary
+from ..schemas import NFL_WR_SUMMARY_COLUMNS
+from ..writers import BufferedSink
+from .pages import nfl_player_page
+from .standin import StandInServer
+
+
+def run(server, n, processes, concurrency, path):
+    keys = ("/players/T/Test{0:05d}.htm".format(i) for i in range(n))
+    jobs = ((Job(key, None, "Test Player", {"HOF": "No"}, 0), server.url + key) for key in keys)
+    with BufferedSink(path, "nfl_wrs") as sink, parse_pool(processes) as pool:
+        def write(job, row):
+            sink.add_rows([row], NFL_WR_SUMMARY_COLUMNS, "nfl_wr_summary", tag=job.key)
+
+        def failed(job, error):
+            raise error
+
+        return run_pipeline(jobs, partial(parse_nfl_summary, position="WR"), write, failed, executor=pool,
+                            concurrency=concurrency, rate=None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=400)
+    parser.add_argument("--processes", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    class Pages(dict):  # every player reuses one of the first 50 pages
+
+        def __contains__(self, path):
+            return True
+
+        def __missing__(self, path):
+            return self["/players/T/Test{0:05d}.htm".format(int(path[-9:-4]) % 50)]
+
+    pages = Pages(("/players/T/Test{0:05d}.htm".format(i), nfl_player_page("Test Player", seed=i)) for i in range(50))
+
+    with StandInServer(pages) as server, tempfile.TemporaryDirectory() as tmp:
+        for processes in args.processes:
+            stats = run(server, args.players, processes, args.concurrency,
+                        os.path.join(tmp, "p{0}.db".format(processes))).as_dict()
+            print("processes={0:<3} {1:8.1f} pages/s   parse mean {2:6.1f} ms   fetched queue max {3:3d}   "
+                  "parsed queue max {4:3d}".format(processes, stats["pages_per_sec"], stats["parse"]["mean_latency_ms"],
+                                                   stats["fetch"]["max_queue_depth"],
+                                                   stats["parse"]["max_queue_depth"]))
+
+
+if __name__ == "__main__":
+    main()
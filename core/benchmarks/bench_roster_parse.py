@@ -0,0 +1,88 @@
+"""Parse time of a roster letter page: the old find_all("p")-per-player loop against roster_parser.iter_roster.
+
+The letter pages are rebuilt from the real roster in Databases/NFL.db (or a directory of saved letter pages can be
+given with --pages). Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_roster_parse --letters A B S
+"""
+import argparse
+import os
+import re
+import sqlite3
+import time
+
+from bs4 import BeautifulSoup
+
+from .. import roster_parser
+from ..roster_parser import iter_roster
+from .pages import nfl_letter_page
+
+
+ROSTER_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Databases", "NFL.db")
+
+
+def letter_page(letter):
+    connection = sqlite3.connect(ROSTER_DB)
+    roster = connection.execute("SELECT Position, Name, First, Last, HOF, HREF FROM all_nfl_players_table "
+                                "WHERE HREF LIKE ? ORDER BY Id", ("/players/{0}/%".format(letter),)).fetchall()
+    connection.close()
+    return nfl_letter_page(roster)
+
+
+def old_parse(content):
+    """The db branch of nfl_get_player_list before roster_parser, without the database writes"""
+    player_data_div = BeautifulSoup(content, features="html.parser").find("div", {"id": "div_players"})
+    rows = []
+    x = 0
+    while x < len(player_data_div.find_all("p")):
+        entry = player_data_div.find_all("p")[x].text
+        raw_year = entry[-10:]
+        try:
+            position = re.findall(r'\(([^)]+)\)', entry)[0]
+        except IndexError:
+            position = ""
+        name = player_data_div.find_all("p")[x].find_all("a")[0].text
+        url = player_data_div.find_all("p")[x].find_all('a', href=True)[0]['href']
+        rows.append([position, name, raw_year[0:5], raw_year[-4:], "Yes" if "+" in entry else "No", url])
+        x += 1
+    return rows
+
+
+def backends():
+    found = ["html.parser"]
+    if roster_parser.BS4_FEATURES == "lxml":
+        found.append("lxml")
+    if roster_parser.SELECTOLAX:
+        found.append("selectolax")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--letters", nargs="+", default=["A", "B", "S"])
+    parser.add_argument("--pages", default=None, help="directory of saved letter pages named <letter>.html")
+    args = parser.parse_args(argv)
+
+    for letter in args.letters:
+        if args.pages:
+            with open(os.path.join(args.pages, "{0}.html".format(letter)), "rb") as f:
+                content = f.read()
+        else:
+            content = letter_page(letter)
+
+        start = time.perf_counter()
+        players = len(old_parse(content))
+        old = time.perf_counter() - start
+        print("{0}: {1} players".format(letter, players))
+        print("    old find_all loop:   {0:8.3f}s".format(old))
+
+        for backend in backends():
+            start = time.perf_counter()
+            parsed = sum(1 for _ in iter_roster(content, backend=backend))
+            took = time.perf_counter() - start
+            assert parsed == players
+            print("    iter_roster {0:<12s}{1:8.3f}s  ({2:.0f}x)".format(backend, took, old / took))
+
+
+if __name__ == "__main__":
+    main()
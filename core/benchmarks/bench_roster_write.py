@@ -0,0 +1,81 @@
+"""Rows/sec of the old one-engine-per-row roster insert against writers.RosterWriter.
+
+Uses the real NFL roster in Databases/NFL.db as the rows to write. Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_roster_write --rows 2000 --batch-size 1000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine, inspect, MetaData, Table, Column, Integer, String, update
+
+from ..writers import nfl_roster_writer
+
+
+ROSTER_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Databases", "NFL.db")
+
+
+def load_rows(n):
+    connection = sqlite3.connect(ROSTER_DB)
+    rows = connection.execute("SELECT Id, Position, Name, First, Last, HOF, HREF FROM all_nfl_players_table "
+                              "ORDER BY Id LIMIT ?", (n,)).fetchall()
+    connection.close()
+    return rows
+
+
+def per_row_engine(path, rows, table="all_nfl_players_table"):
+    """What nfl_add_to_all_players_db used to do for every row: new engine, reflect the table, UPDATE or INSERT,
+    commit, dispose"""
+    for row in rows:
+        engine = create_engine("sqlite:///" + path)
+        metadata = MetaData()
+        if not inspect(engine).has_table(table):
+            Table(table, metadata, Column("Id", Integer, primary_key=True), Column("Position", String),
+                  Column("Name", String), Column("First", Integer), Column("Last", Integer), Column("HOF", String),
+                  Column("HREF", String))
+            metadata.create_all(engine)
+        player_list = Table(table, metadata, autoload_with=engine, extend_existing=True)
+        values = dict(zip(["Id", "Position", "Name", "First", "Last", "HOF", "HREF"], row))
+        with engine.begin() as connection:
+            result = connection.execute(update(player_list).where(player_list.c.Id == row[0]).values(**values))
+            if result.rowcount == 0:
+                connection.execute(player_list.insert().values(**values))
+        engine.dispose()
+
+
+def batched_writer(path, rows, batch_size):
+    with nfl_roster_writer(path, batch_size=batch_size) as writer:
+        writer.add_many(rows)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000, help="rows for the old path, it is slow")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    old_rows = load_rows(args.rows)
+    all_rows = load_rows(10 ** 6)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old = timed(per_row_engine, os.path.join(tmp, "old.db"), old_rows)
+        new = timed(batched_writer, os.path.join(tmp, "new.db"), all_rows, args.batch_size)
+        again = timed(batched_writer, os.path.join(tmp, "new.db"), all_rows, args.batch_size)  # all updates
+
+    print("per-row engine:     {0:7d} rows {1:8.2f}s {2:12.0f} rows/s".format(len(old_rows), old, len(old_rows) / old))
+    print("RosterWriter:       {0:7d} rows {1:8.2f}s {2:12.0f} rows/s".format(len(all_rows), new, len(all_rows) / new))
+    print("RosterWriter (upd): {0:7d} rows {1:8.2f}s {2:12.0f} rows/s".format(len(all_rows), again,
+                                                                           len(all_rows) / again))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Building a feature matrix and answering nearest neighbour queries (similarity.SimilarityIndex) over N players.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_similarity --players 100000 --queries 200
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from ..similarity import SimilarityIndex, build_features
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.gamma(2.0, 50.0, (args.players, args.columns)),
+                      columns=["stat{0}".format(i) for i in range(args.columns)])
+    df.iloc[::7, 0] = np.nan
+    df.insert(0, "player_id", np.arange(args.players))
+    df.insert(1, "Name", ["Player {0}".format(i) for i in range(args.players)])
+
+    start = time.perf_counter()
+    index = SimilarityIndex(build_features(df))
+    print("build     {0:8.1f} ms".format((time.perf_counter() - start) * 1000))
+
+    index.query(0)  # builds the key -> row lookup
+    times = []
+    for key in rng.integers(0, args.players, args.queries):
+        start = time.perf_counter()
+        index.query(int(key), k=10)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    print("query p50 {0:8.2f} ms  p99 {1:.2f} ms".format(np.percentile(times, 50), np.percentile(times, 99)))
+
+
+if __name__ == "__main__":
+    main()
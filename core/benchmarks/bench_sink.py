@@ -0,0 +1,63 @@
+"""A to_sql + commit per player (the old stat builders) against writers.BufferedSink.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_sink --players 2000 --flush-rows 500
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from ..player_scrape import NFL
+from ..schemas import frame_from_rows, sql_ready, NFL_WR_SUMMARY_COLUMNS
+from ..writers import BufferedSink
+from .pages import nfl_player_page
+
+
+def summary_frames(n):
+    # parse a handful of pages and reuse them, the benchmark is about the writes
+    rows = [NFL("Test Player", content=nfl_player_page("Test Player", seed=i)).get_summary("WR", "No")
+            for i in range(min(n, 50))]
+    return [frame_from_rows([rows[i % len(rows)]], NFL_WR_SUMMARY_COLUMNS, "nfl_wr_summary") for i in range(n)]
+
+
+def per_player(path, frames):
+    connection = sqlite3.connect(path)
+    for df in frames:
+        sql_ready(df).to_sql("nfl_wrs", con=connection, if_exists="append", index=False)
+        connection.commit()
+    connection.close()
+
+
+def buffered(path, frames, flush_rows):
+    with BufferedSink(path, "nfl_wrs", flush_rows=flush_rows) as sink:
+        for df in frames:
+            sink.add_frame(df)
+    return sink.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--flush-rows", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    frames = summary_frames(args.players)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        per_player(os.path.join(tmp, "old.db"), frames)
+        old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        stats = buffered(os.path.join(tmp, "new.db"), frames, args.flush_rows)
+        new = time.perf_counter() - start
+
+    print("to_sql per player: {0:8.2f}s {1:10.0f} rows/s".format(old, len(frames) / old))
+    print("BufferedSink:      {0:8.2f}s {1:10.0f} rows/s  ({2} flushes, mean {3:.1f} ms, max {4:.1f} ms)".format(
+        new, len(frames) / new, stats["flushes"], stats["mean_flush_ms"], stats["max_flush_ms"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""End to end benchmark of the football scrape at increasing numbers of players: roster load, stat build and reads.
+
+Runs against a StandInServer serving a pages.SyntheticSite of every size asked for (or a recorded corpus, see
+corpus.py), with the scrapers pointed at it through player_scrape.redirect_to and no rate limit. Every phase runs in
+its own interpreter so the peak RSS reported is that phase's own. For each phase it reports the items processed,
+throughput, p50/p95/p99 latency (a page fetch for roster and stats, a query for reads) and peak RSS, plus the peak
+RSS of the parser processes for the stat build.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_suite --sizes 1000 10000
+    python -m sportscrape.benchmarks.bench_suite --sizes 1000 10000 100000 --latency 0.05 --jitter 0.02 --save base.json
+    python -m sportscrape.benchmarks.bench_suite --sizes 1000 10000 --compare base.json  # exit status 1 on a regression
+    python -m sportscrape.benchmarks.bench_suite --corpus fixtures --letters AB
+
+Injected errors (--error-rate, --drop-rate) make the stat build slower than the error rate alone suggests, failed
+players are retried after the job queue's backoff.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+
+CORE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT = os.path.dirname(CORE)  # subprocesses run from here, so the package imports from a checkout too
+PACKAGE = __package__.rpartition(".")[0]  # sportscrape, or core in a checkout that isn't installed
+PHASES = ["roster", "stats", "reads"]
+SITE = "https://www.pro-football-reference.com"
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    pick = lambda q: 1000 * values[min(len(values) - 1, int(q * len(values)))]
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+def histogram_percentiles(histogram):
+    return {"p50_ms": 1000 * histogram.quantile(0.5), "p95_ms": 1000 * histogram.quantile(0.95),
+            "p99_ms": 1000 * histogram.quantile(0.99)}
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / 1024 if sys.platform != "darwin" else rss / 1024 ** 2  # KB on linux, bytes on macOS
+
+
+# phases, each run in a fresh interpreter by run_phase
+
+def roster_phase(args):
+    from ..metrics import configure
+    from ..player_scrape import redirect_to
+    from ..players_list import refresh_roster
+    metrics = configure()
+    redirect_to(args.url)
+    start = time.perf_counter()
+    result = refresh_roster(args.db, "football", letters=list(args.letters) if args.letters else None, rate=None)
+    seconds = time.perf_counter() - start
+    return dict(items=result["rows_written"], seconds=seconds, errors=metrics.summary()["errors"],
+                **histogram_percentiles(metrics.histogram("stage_seconds", stage="fetch")))
+
+
+def stats_phase(args):
+    from ..metrics import configure
+    from ..player_scrape import redirect_to
+    from ..add_rows_to_db import nfl_stat_builder
+    metrics = configure()
+    redirect_to(args.url)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):  # the builder prints a summary after every pass
+        nfl_stat_builder(database=args.db, destination_table="nfl_wrs", position="WR", concurrency=args.concurrency,
+                         rate=None, processes=args.processes)
+    seconds = time.perf_counter() - start
+    fetch = histogram_percentiles(metrics.histogram("stage_seconds", stage="fetch"))
+    parse = metrics.histogram("stage_seconds", stage="parse")
+    return dict(items=metrics.value("rows_written_total"), seconds=seconds, errors=metrics.summary()["errors"],
+                parse_p50_ms=1000 * parse.quantile(0.5), parse_p95_ms=1000 * parse.quantile(0.95),
+                children_peak_rss_mb=peak_rss_mb(resource.RUSAGE_CHILDREN), **fetch)
+
+
+def reads_phase(args):
+    from ..read_from_db import read_all_from_db, iter_from_db, RosterConnection
+    queries = []
+
+    start = time.perf_counter()
+    roster = read_all_from_db(abs_path=args.db, table="all_nfl_players_table")
+    stats = read_all_from_db(abs_path=args.db, table="nfl_wrs")
+    rows = len(roster) + len(stats)
+    for chunk in iter_from_db(args.db, "nfl_wrs"):
+        rows += len(chunk)
+    seconds = time.perf_counter() - start
+
+    # the kind of query the stat builders make, every one different so the connection's result cache can't help
+    players = RosterConnection(db=args.db, table="all_nfl_players_table")
+    for last_year in range(1930, 2021):
+        query_start = time.perf_counter()
+        players.special_select(column="Position", value="WR", last_year=last_year, columns=["Id", "Name", "HREF"])
+        queries.append(time.perf_counter() - query_start)
+    players.close()
+    return dict(items=rows, seconds=seconds, errors={}, **percentiles(queries))
+
+
+def run_phase(phase, url, db, args):
+    """Runs one phase in a new interpreter and returns its results"""
+    command = [sys.executable, "-m", __package__ + ".bench_suite", "--phase", phase, "--url", url, "--db", db,
+               "--concurrency", str(args.concurrency), "--letters", args.letters or ""]
+    if args.processes is not None:
+        command += ["--processes", str(args.processes)]
+    output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError("{0} phase failed:\n{1}".format(phase, output.stderr))
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def trim_roster(db, directory):
+    """A recorded corpus only has some of the players a letter page lists. The rest are taken off the roster so the
+    stat build doesn't spend its time on 404s"""
+    from .corpus import corpus_file
+    connection = sqlite3.connect(db)
+    with connection:
+        hrefs = [href for (href,) in connection.execute("SELECT HREF FROM all_nfl_players_table")]
+        missing = [(href,) for href in hrefs if not os.path.isfile(corpus_file(directory, SITE + href))]
+        connection.executemany("DELETE FROM all_nfl_players_table WHERE HREF = ?", missing)
+    connection.close()
+
+
+def benchmark(server, label, args, results, corpus=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "NFL.db")
+        for phase in args.phases:
+            result = run_phase(phase, server.url, db, args)
+            result.update(size=label, phase=phase, per_sec=result["items"] / result["seconds"]
+                          if result["seconds"] else 0.0)
+            results.append(result)
+            print("{size:>8} {phase:<7} {items:>9} {per_sec:>10.1f} {p50_ms:>8.1f} {p95_ms:>8.1f} {p99_ms:>8.1f} "
+                  "{peak_rss_mb:>9.1f}   {errors}".format(**result))
+            if phase == "roster" and corpus is not None:
+                trim_roster(db, corpus)
+
+
+def compare(results, baseline_path, tolerance):
+    """Prints every phase whose throughput dropped by more than tolerance against the saved run. True if any did"""
+    with open(baseline_path) as f:
+        baseline = {(r["size"], r["phase"]): r for r in json.load(f)}
+    regressed = False
+    for result in results:
+        before = baseline.get((result["size"], result["phase"]))
+        if before is None or not before["per_sec"]:
+            continue
+        change = result["per_sec"] / before["per_sec"] - 1
+        if change < -tolerance:
+            regressed = True
+            print("REGRESSION {size} {phase}: {0:.1f}/s, was {1:.1f}/s ({2:+.0%})".format(
+                result["per_sec"], before["per_sec"], change, **result))
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=PHASES)
+    parser.add_argument("--corpus", default=None, help="replay this recorded corpus instead of a synthetic site")
+    parser.add_argument("--letters", default=None, help="letters to load the roster from, all of them by default")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=None, help="parser processes, one per core by default")
+    parser.add_argument("--save", default=None, help="write the results here as json")
+    parser.add_argument("--compare", default=None, help="results saved by an earlier --save to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed drop in throughput for --compare")
+    # used by run_phase
+    parser.add_argument("--phase", choices=PHASES, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--url", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--db", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.phase is not None:
+        result = {"roster": roster_phase, "stats": stats_phase, "reads": reads_phase}[args.phase](args)
+        result["peak_rss_mb"] = peak_rss_mb()
+        print(json.dumps(result))
+        return 0
+
+    from .pages import SyntheticSite
+    from .standin import StandInServer
+    faults = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                  error_status=args.error_status, drop_rate=args.drop_rate)
+
+    print("{0:>8} {1:<7} {2:>9} {3:>10} {4:>8} {5:>8} {6:>8} {7:>9}   errors".format(
+        "players", "phase", "items", "items/s", "p50 ms", "p95 ms", "p99 ms", "rss MB"))
+    results = []
+    if args.corpus is not None:
+        with StandInServer(directory=args.corpus, **faults) as server:
+            benchmark(server, "corpus", args, results, corpus=args.corpus)
+    else:
+        for size in args.sizes:
+            with StandInServer(SyntheticSite(size, positions=["WR"]), **faults) as server:
+                benchmark(server, size, args, results)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None and compare(results, args.compare, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
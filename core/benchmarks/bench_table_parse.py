@@ -0,0 +1,84 @@
+"""CPU time and peak memory of pulling one stats table out of a player page: full BeautifulSoup parse + find()
+against table_extract.extract_table. For the receiving table it also times the WR career row the way get_summary
+used to read it (every <th> of the table, then slices) against the compiled table_specs extractor.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_table_parse --players 50
+    python -m sportscrape.benchmarks.bench_table_parse --pages saved_pages/ --table receiving_and_rushing
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from ..table_extract import extract_table, FRAGMENT_FEATURES
+from ..table_specs import extract_rows, get_spec, SUMMARY
+from .pages import nfl_player_page
+
+
+def full_parse(content, table_id, features):
+    soup = BeautifulSoup(content, features=features)
+    return soup.find('table', attrs={"id": table_id})
+
+
+def sliced_summary(content):
+    table = extract_table(content, "receiving_and_rushing")
+    headings = [th.get_text() for th in table.find_all("th")][9:21]
+    return headings, [[td.get_text() for td in table.find("tfoot").find_all("tr")[0]][5:17]]
+
+
+def spec_summary(content):
+    return extract_rows(content, get_spec("football", "WR", SUMMARY))
+
+
+def measure(fn, pages, *args):
+    tracemalloc.start()
+    start = time.process_time()
+    found = 0
+    for content in pages:
+        if fn(content, *args) is not None:
+            found += 1
+    took = time.process_time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return took, peak, found
+
+
+def load_pages(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "rb") as f:
+            pages.append(f.read())
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--pages", default=None, help="directory of saved player pages")
+    parser.add_argument("--table", default="receiving_and_rushing")
+    args = parser.parse_args(argv)
+
+    pages = load_pages(args.pages) if args.pages else [nfl_player_page("Player", seed=i) for i in range(args.players)]
+    size = sum(len(p) for p in pages) / len(pages)
+    print("{0} pages, {1:.0f} KB average, table {2}".format(len(pages), size / 1024, args.table))
+
+    results = [("full soup (html.parser)",) + measure(full_parse, pages, args.table, "html.parser")]
+    if FRAGMENT_FEATURES == "lxml":
+        results.append(("full soup (lxml)",) + measure(full_parse, pages, args.table, "lxml"))
+    results.append(("extract_table ({0})".format(FRAGMENT_FEATURES),) + measure(extract_table, pages, args.table))
+    if args.table == "receiving_and_rushing":
+        results.append(("WR summary, th walk + slices",) + measure(sliced_summary, pages))
+        results.append(("WR summary, table_specs",) + measure(spec_summary, pages))
+
+    baseline = results[0][1]
+    for label, took, peak, found in results:
+        print("{0:<28s} {1:7.3f}s cpu  {2:7.2f} ms/page  peak {3:8.1f} KB  found {4}/{5}  ({6:.1f}x)".format(
+            label, took, 1000 * took / len(pages), peak / 1024, found, len(pages), baseline / took))
+
+
+if __name__ == "__main__":
+    main()
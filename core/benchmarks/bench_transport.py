@@ -0,0 +1,81 @@
+"""Benchmarks the shared transport against a local StandInServer.
+
+keep-alive:  the same pages downloaded one after another with a bare requests.get per page (a new connection every
+             time) and through transport.Transport (one pooled connection)
+throttling:  a site that answers 429 to anything past --site-limit requests at once, fetched with --concurrency
+             threads through a Transport whose limit is fixed at the thread count and through one that adapts (AIMD)
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.bench_transport --pages 500 --latency 0.05 --site-limit 6 --concurrency 24
+"""
+import argparse
+import time
+
+from ..fetch import fetch_pages
+from ..transport import configure_transport, get_transport
+from .pages import nfl_player_page
+from .standin import StandInServer
+
+
+def make_pages(n):
+    return {"/players/X/Play{0:04d}.htm".format(i): nfl_player_page("Player {0}".format(i), seed=i) for i in range(n)}
+
+
+def keep_alive(pages, latency):
+    import requests
+    paths = list(pages)
+    results = {}
+    for label in ("requests.get", "transport"):
+        with StandInServer(pages, latency=latency) as server:
+            configure_transport()
+            start = time.perf_counter()
+            for path in paths:
+                if label == "requests.get":
+                    requests.get(server.url + path).content
+                else:
+                    get_transport().get(server.url + path)
+            seconds = time.perf_counter() - start
+            results[label] = (len(paths) / seconds, server.connections)
+    return results
+
+
+def throttling(pages, latency, site_limit, concurrency):
+    paths = list(pages)
+    results = {}
+    for label, minimum in (("fixed", concurrency), ("adaptive", 1)):
+        with StandInServer(pages, latency=latency, max_in_flight=site_limit) as server:
+            transport = configure_transport(concurrency=(4 if minimum == 1 else concurrency, concurrency),
+                                            min_concurrency=minimum, backoff=0.2, retries=6)
+            jobs = ((path, server.url + path) for path in paths)
+            start = time.perf_counter()
+            failed = sum(error is not None for _, _, _, error in fetch_pages(jobs, concurrency=concurrency, rate=None,
+                                                                             fetch=get_transport().get))
+            seconds = time.perf_counter() - start
+            limit = list(transport.stats().values())[0]["limit"]
+            results[label] = (len(paths) / seconds, server.throttled, failed, limit)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--site-limit", type=int, default=6, help="requests at once the stand-in allows")
+    parser.add_argument("--concurrency", type=int, default=24)
+    args = parser.parse_args(argv)
+    pages = make_pages(args.pages)
+
+    print("keep-alive, {0} pages one at a time".format(args.pages))
+    for label, (per_sec, connections) in keep_alive(pages, args.latency).items():
+        print("  {0:<13} {1:>8.1f} pages/s {2:>6} connections".format(label, per_sec, connections))
+
+    print("throttling site allowing {0} at once, {1} threads".format(args.site_limit, args.concurrency))
+    for label, (per_sec, throttled, failed, limit) in throttling(pages, args.latency, args.site_limit,
+                                                                 args.concurrency).items():
+        print("  {0:<13} {1:>8.1f} pages/s {2:>6} 429s {3:>4} failed   limit at the end {4:.1f}".format(
+            label, per_sec, throttled, failed, limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Records real Sports Reference pages into a directory once, so they can be replayed offline by StandInServer as
+often as needed. Pages are saved as <directory>/<host>/<path> (see standin.page_file), the layout
+player_scrape.redirect_to asks for, so the scrapers run against a replay without any changes.
+
+Run with the package installed (pip install -e .):
+
+    python -m sportscrape.benchmarks.corpus record fixtures --sport football --letters AB --players 25 --position WR
+    python -m sportscrape.benchmarks.corpus serve fixtures --latency 0.2 --jitter 0.1 --error-rate 0.02
+
+`record` goes through the same rate limiter as the scrapers, so keep --players modest. Pages already in the corpus
+aren't downloaded again. `serve` prints the url to hand to player_scrape.redirect_to.
+"""
+import argparse
+import os
+import time
+from urllib.parse import urlsplit
+
+from ..fetch import fetch_pages, DEFAULT_RATE
+from ..transport import get_transport
+from ..roster_parser import iter_roster
+from .standin import StandInServer, page_file
+
+
+SITES = {"football": "https://www.pro-football-reference.com", "baseball": "https://www.baseball-reference.com"}
+
+
+def corpus_file(directory, url):
+    """Where a page is kept in the corpus"""
+    parts = urlsplit(url)
+    return page_file(directory, "/" + parts.netloc + parts.path)
+
+
+def _download(url):
+    # straight to the transport, so a page that is in the page cache is still recorded. Error pages raise there, a
+    # throttled response recorded as a player page would be replayed forever
+    return get_transport().get(url)
+
+
+def record(urls, directory, rate=DEFAULT_RATE, overwrite=False):
+    """Downloads each url into the corpus. Returns {url: content} for every url, downloaded or already there, and
+    leaves out the ones that failed"""
+    pages, missing = {}, []
+    for url in urls:
+        path = corpus_file(directory, url)
+        if os.path.isfile(path) and not overwrite:
+            with open(path, "rb") as f:
+                pages[url] = f.read()
+        else:
+            missing.append(url)
+
+    for url, _, content, error in fetch_pages(((url, url) for url in missing), rate=rate, fetch=_download):
+        if error is not None:
+            print("Couldn't record {0}: {1!r}".format(url, error))
+            continue
+        path = corpus_file(directory, url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+        pages[url] = content
+    return pages
+
+
+def record_site(directory, sport="football", letters="a", players=25, position=None, rate=DEFAULT_RATE,
+                overwrite=False):
+    """Records the letter pages and the first `players` player pages listed on each of them, only players at
+    `position` if one is given (football, i.e. "WR" for a corpus the WR stat build can run on)"""
+    site = SITES[sport]
+    letters = [letter.upper() if sport == "football" else letter.lower() for letter in letters]
+    letter_pages = record([site + "/players/{0}/".format(letter) for letter in letters], directory, rate=rate,
+                          overwrite=overwrite)
+
+    player_urls = []
+    for content in letter_pages.values():
+        listed = [player for player in iter_roster(content, sport=sport)
+                  if position is None or player.position == position][:players]
+        player_urls.extend(site + player.href for player in listed if player.href)
+    player_pages = record(player_urls, directory, rate=rate, overwrite=overwrite)
+    return len(letter_pages), len(player_pages)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    record_parser = commands.add_parser("record", help="download letter and player pages into the corpus")
+    record_parser.add_argument("directory")
+    record_parser.add_argument("--sport", choices=sorted(SITES), default="football")
+    record_parser.add_argument("--letters", default="a")
+    record_parser.add_argument("--players", type=int, default=25, help="player pages per letter")
+    record_parser.add_argument("--position", default=None, help="only record players at this position")
+    record_parser.add_argument("--rate", type=float, default=DEFAULT_RATE)
+    record_parser.add_argument("--overwrite", action="store_true", help="download pages already in the corpus again")
+
+    serve_parser = commands.add_parser("serve", help="serve the corpus on localhost")
+    serve_parser.add_argument("directory")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--latency", type=float, default=0.0)
+    serve_parser.add_argument("--jitter", type=float, default=0.0)
+    serve_parser.add_argument("--error-rate", type=float, default=0.0)
+    serve_parser.add_argument("--error-status", type=int, default=503)
+    serve_parser.add_argument("--retry-after", type=int, default=None)
+    serve_parser.add_argument("--drop-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        letters, players = record_site(args.directory, args.sport, args.letters, args.players, args.position,
+                                       args.rate, args.overwrite)
+        print("{0} letter pages and {1} player pages in {2}".format(letters, players, args.directory))
+        return
+
+    with StandInServer(directory=args.directory, port=args.port, latency=args.latency, jitter=args.jitter,
+                       error_rate=args.error_rate, error_status=args.error_status, retry_after=args.retry_after,
+                       drop_rate=args.drop_rate) as server:
+        print("Serving {0} at {1}, use player_scrape.redirect_to({1!r})".format(args.directory, server.url))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Generates fake Sports Reference pages with the same layout as the real ones so the benchmarks can run without
+hitting the live sites. The pages are padded out with filler so they are roughly the size of a real player page.
+"""
+import random
+import re
+import string
+
+
+NFL_OVER_HEADERS = ["", "Games", "Receiving", "Rushing"]
+NFL_HEADERS = [("year_id", "Year"), ("age", "Age"), ("team", "Tm"), ("pos", "Pos"), ("g", "G"), ("gs", "GS"),
+               ("targets", "Tgt"), ("rec", "Rec"), ("rec_yds", "Yds"), ("rec_yds_per_rec", "Y/R"), ("rec_td", "TD"),
+               ("rec_first_down", "1D"), ("rec_long", "Lng"), ("rec_per_g", "R/G"), ("rec_yds_per_g", "Y/G"),
+               ("catch_pct", "Ctch%"), ("rec_yds_per_tgt", "Y/Tgt"), ("rush_att", "Rush"), ("rush_yds", "Yds"),
+               ("rush_td", "TD"), ("rush_first_down", "1D"), ("rush_long", "Lng"), ("rush_yds_per_att", "Y/A"),
+               ("rush_yds_per_g", "Y/G"), ("rush_att_per_g", "A/G"), ("yds_from_scrimmage", "YScm"),
+               ("rush_receive_td", "RRTD"), ("fumbles", "Fmb"), ("av", "AV")]
+
+TEAMS = ["GNB", "CHI", "DAL", "NYG", "SFO", "KAN", "DEN", "SEA", "PIT", "NWE", "MIA", "BUF"]
+# navigation/menu markup like the rest of a real page: lots of small tags, which is what makes a full parse slow
+FILLER = ('<div class="filler"><ul>' +
+          "".join('<li><a href="/teams/t{0}/">Team {0}</a> <span class="note">{0}</span></li>'.format(i)
+                  for i in range(40)) + "</ul></div>\n")
+
+
+def _nfl_season(rng, year, age):
+    g = rng.randint(1, 16)
+    tgt = rng.randint(0, 160)
+    rec = rng.randint(0, tgt)
+    yds = rec * rng.randint(5, 17)
+    rush = rng.randint(0, 10)
+    return [str(year), str(age), rng.choice(TEAMS), "WR", str(g), str(rng.randint(0, g)), str(tgt), str(rec),
+            str(yds), "{0:.1f}".format(yds / rec if rec else 0), str(rng.randint(0, 15)), str(rec // 2),
+            str(rng.randint(10, 90)), "{0:.1f}".format(rec / g), "{0:.1f}".format(yds / g),
+            "{0:.1f}%".format(100 * rec / tgt) if tgt else "", "{0:.1f}".format(yds / tgt) if tgt else "",
+            str(rush), str(rush * 4), "0", "0", str(rush and rng.randint(1, 30)), "4.0" if rush else "",
+            "{0:.1f}".format(rush * 4 / g), "{0:.1f}".format(rush / g), str(yds + rush * 4), "0", "0", "5"]
+
+
+def _nfl_career(seasons):
+    # career row of the tfoot. Only the counting stats are totalled, good enough for parsing purposes
+    total = [0] * 4 + [sum(float(s[i].rstrip("%") or 0) for s in seasons) for i in range(4, len(NFL_HEADERS))]
+    total = [int(t) for t in total]
+    row = ["Career", "", "", ""] + [str(total[i]) for i in range(4, len(NFL_HEADERS))]
+    g = max(total[4], 1)
+    rec = total[7]
+    tgt = total[6]
+    row[9] = "{0:.1f}".format(total[8] / rec if rec else 0)
+    row[13] = "{0:.1f}".format(rec / g)
+    row[14] = "{0:.1f}".format(total[8] / g)
+    row[15] = "{0:.1f}%".format(100 * rec / tgt) if tgt else ""
+    row[16] = "{0:.1f}".format(total[8] / tgt) if tgt else ""
+    return row
+
+
+def _cells(stats, values, first_tag="th"):
+    cells = []
+    for i, ((stat, _), value) in enumerate(zip(stats, values)):
+        tag = first_tag if i == 0 else "td"
+        cells.append('<{0} data-stat="{1}">{2}</{0}>'.format(tag, stat, value))
+    return "".join(cells)
+
+
+def commented_table(table_id, rows=10, columns=20):
+    """A filler stats table wrapped in an html comment, the way Sports Reference ships most of its secondary tables"""
+    head = "".join('<th data-stat="c{0}">C{0}</th>'.format(i) for i in range(columns))
+    row = "<tr>" + "".join('<td data-stat="c{0}">{0}</td>'.format(i) for i in range(columns)) + "</tr>"
+    return ('<div id="all_{0}"><!--\n<div class="table_container"><table class="stats_table" id="{0}">'
+            '<thead><tr>{1}</tr></thead><tbody>{2}</tbody></table></div>\n--></div>').format(table_id, head, row * rows)
+
+
+def nfl_player_page(name, seed=0, seasons=None, filler=20, extra_tables=4):
+    """Returns the html (bytes) of a fake pro-football-reference receiver page"""
+    rng = random.Random(seed)
+    seasons = seasons or rng.randint(1, 15)
+    first_year = rng.randint(1994, 2020 - seasons)
+    rows = [_nfl_season(rng, first_year + i, 22 + i) for i in range(seasons)]
+
+    over = "".join('<th class="over_header">{0}</th>'.format(h) for h in NFL_OVER_HEADERS)
+    head = "".join('<th data-stat="{0}" scope="col">{1}</th>'.format(stat, h) for stat, h in NFL_HEADERS)
+    body = "\n".join('<tr class="full_table">{0}</tr>'.format(_cells(NFL_HEADERS, row)) for row in rows)
+    foot = '<tr>{0}</tr>'.format(_cells(NFL_HEADERS, _nfl_career(rows)))
+
+    table = ('<table class="stats_table" id="receiving_and_rushing">\n<thead><tr class="over_header">{0}</tr>\n'
+             '<tr>{1}</tr></thead>\n<tbody>{2}</tbody>\n<tfoot>{3}</tfoot>\n</table>').format(over, head, body, foot)
+
+    page = ['<html><head><title>{0} Stats | Pro-Football-Reference.com</title></head><body>'.format(name),
+            FILLER * (filler // 2),
+            '<div id="all_receiving_and_rushing"><div class="table_container">', table, '</div></div>',
+            "\n".join(commented_table("extra_{0}".format(i)) for i in range(extra_tables)),
+            FILLER * (filler - filler // 2),
+            '</body></html>']
+    return "\n".join(page).encode("utf-8")
+
+
+FIRST_NAMES = ["John", "Mike", "Chris", "David", "James", "Robert", "Tony", "Steve", "Kevin", "Brian", "Marcus",
+               "Andre", "Tyler", "Josh", "Matt", "Ryan", "Jalen", "DeAndre", "Terrell", "Randy"]
+LAST_NAMES = ["Adams", "Brown", "Carter", "Davis", "Evans", "Fisher", "Green", "Harris", "Irvin", "Jones", "King",
+              "Lewis", "Moore", "Nelson", "Owens", "Price", "Rice", "Smith", "Thomas", "Williams"]
+NFL_POSITIONS = ["WR", "RB", "QB", "TE", "OT", "G", "C", "DE", "DT", "LB", "CB", "S", "K", "P", "WR-TE"]
+
+
+def fake_nfl_roster(n, seed=0, letter="A"):
+    """Returns n (position, name, first_year, last_year, hof, href) tuples shaped like all_nfl_players_table rows"""
+    rng = random.Random(seed)
+    roster = []
+    for i in range(n):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        start = rng.randint(1920, 2020)
+        href = "/players/{0}/{1}{2}{3:02d}.htm".format(letter, last[:4], first[:2], i % 100)
+        roster.append((rng.choice(NFL_POSITIONS), "{0} {1}".format(first, last), start,
+                       min(start + rng.randint(0, 15), 2020), "Yes" if rng.random() < 0.01 else "No", href))
+    return roster
+
+
+def nfl_letter_page(roster, filler=10):
+    """html of a pro-football-reference letter page (i.e. /players/A/) listing roster rows"""
+    entries = []
+    for position, name, first, last, hof, href in roster:
+        entry = '<a href="{0}">{1}</a>{2} ({3}) {4}-{5}'.format(href, name, "+" if hof == "Yes" else "", position,
+                                                                first, last)
+        if last >= 2020:
+            entry = "<b>{0}</b>".format(entry)  # active players are in bold
+        entries.append("<p>{0}</p>".format(entry))
+    return "\n".join(["<html><body>", FILLER * filler, '<div class="section_content" id="div_players">',
+                      "\n".join(entries), "</div>", FILLER * filler, "</body></html>"]).encode("utf-8")
+
+
+def mlb_letter_page(roster, filler=10):
+    """html of a baseball-reference letter page (i.e. /players/a/). Position is ignored, baseball doesn't list it"""
+    entries = []
+    for _, name, first, last, hof, href in roster:
+        entry = '<a href="{0}">{1}</a>{2} ({3}-{4})'.format(href.lower().replace(".htm", ".shtml"), name,
+                                                          "+" if hof == "Yes" else "", first, last)
+        if last >= 2020:
+            entry = "<b>{0}</b>".format(entry)
+        entries.append("<p>{0}</p>".format(entry))
+    return "\n".join(["<html><body>", FILLER * filler, '<div class="section_content" id="div_players_">',
+                      "\n".join(entries), "</div>", FILLER * filler, "</body></html>"]).encode("utf-8")
+
+
+class SyntheticSite:
+    """A made up pro-football-reference with n players spread over the 26 letter pages, for StandInServer(pages=...).
+    Pages are only generated when they are asked for, so 100k players don't have to sit in memory as html. Paths use
+    the host prefixed layout of player_scrape.redirect_to, so with redirect_to(server.url) the roster refresh and the
+    stat builders run against it unchanged.
+
+    positions limits the positions players are given, i.e. ["WR"] so every player is picked up by a WR stat build.
+    """
+
+    host = "www.pro-football-reference.com"
+    _player_path = re.compile(r"^/www\.pro-football-reference\.com/players/[A-Z]/[A-Za-z]*(\d{6})\.htm$")
+    _letter_path = re.compile(r"^/www\.pro-football-reference\.com/players/([A-Z])/$")
+
+    def __init__(self, n, seed=0, positions=None, filler=20, letter_filler=2):
+        self.n = n
+        self.seed = seed
+        self.filler = filler
+        self.letter_filler = letter_filler
+        self.players = []
+        self.letters = {letter: [] for letter in string.ascii_uppercase}
+
+        rng = random.Random(seed)
+        positions = positions or NFL_POSITIONS
+        for i in range(n):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            letter = string.ascii_uppercase[i % 26]
+            start = rng.randint(1920, 2019)
+            player = (rng.choice(positions), "{0} {1}".format(first, last), start,
+                      min(start + rng.randint(0, 15), 2020), "Yes" if rng.random() < 0.01 else "No",
+                      "/players/{0}/{1}{2}{3:06d}.htm".format(letter, last[:4], first[:2], i))
+            self.players.append(player)
+            self.letters[letter].append(player)
+
+    def _player(self, path):
+        match = self._player_path.match(path)
+        if match is None or int(match.group(1)) >= self.n:
+            return None
+        return int(match.group(1))
+
+    def __contains__(self, path):
+        return self._player(path) is not None or self._letter_path.match(path) is not None
+
+    def __getitem__(self, path):
+        i = self._player(path)
+        if i is not None:
+            return nfl_player_page(self.players[i][1], seed=self.seed + i, filler=self.filler)
+        match = self._letter_path.match(path)
+        if match is None:
+            raise KeyError(path)
+        return nfl_letter_page(self.letters[match.group(1)], filler=self.letter_filler)
@@ -0,0 +1,161 @@
+"""A local stand-in for the Sports Reference sites. Serves pages out of a dict (or a directory of saved pages) over
+real HTTP so the fetch code can be benchmarked without touching the network. It can also be made slow and flaky on
+purpose: random latency and a share of requests answered with an error status or a dropped connection, or a cap on
+concurrent requests past which everything is answered 429 like a site that throttles. Connections are kept alive
+(HTTP/1.1) and pages are gzipped for clients that ask, like the real sites.
+"""
+import gzip
+import os
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def page_file(directory, path):
+    """Where the page for a url path is saved under directory. Paths ending in / (the letter pages) are stored as
+    index.html inside the directory"""
+    path = path.split("?", 1)[0].lstrip("/")
+    if not path or path.endswith("/"):
+        path += "index.html"
+    return os.path.join(directory, *path.split("/"))
+
+
+class StandInServer:
+    """Serves `pages` ({path: bytes}) and/or files saved under `directory` (path -> page_file(directory, path)) on
+    localhost. `pages` only needs `in` and [], so it can generate pages on demand (see pages.SyntheticSite).
+
+    ---Arguments---
+
+    -latency:       seconds slept before every response to mimic the round trip to the real site
+    -jitter:        each response's latency is off by up to this many seconds either way
+    -error_rate:    share of requests answered with error_status instead of the page
+    -error_status:  status code for the injected errors, i.e. 429 or 503
+    -retry_after:   Retry-After header sent with the injected errors, None for no header
+    -drop_rate:     share of requests whose connection is closed without any response
+    -max_in_flight: requests beyond this many at once are answered error_status (with retry_after) like a throttling
+                    site would. None for no cap
+    -compress:      gzip pages for clients that send Accept-Encoding: gzip
+    -seed:          seed for the latency and error dice
+
+    Use as a context manager:
+
+        with StandInServer(pages, latency=0.2) as server:
+            get_page(server.url + "/players/A/AdamDa01.htm")
+    """
+
+    def __init__(self, pages=None, directory=None, latency=0.0, port=0, jitter=0.0, error_rate=0.0,
+                 error_status=503, retry_after=None, drop_rate=0.0, max_in_flight=None, compress=True, seed=0):
+        self.pages = pages if pages is not None else {}
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.drop_rate = drop_rate
+        self.max_in_flight = max_in_flight
+        self.compress = compress
+        self.requests = 0
+        self.errors = 0
+        self.dropped = 0
+        self.throttled = 0
+        self.connections = 0
+        self.in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def lookup(self, path):
+        if path in self.pages:
+            return self.pages[path]
+        if self.directory is not None:
+            file_path = page_file(self.directory, path)
+            if os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    return f.read()
+        return None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so clients reusing connections can be told apart
+            disable_nagle_algorithm = True  # headers and body are separate writes, Nagle would hold the body back
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    server.in_flight += 1
+                    latency = server.latency + server._random.uniform(-server.jitter, server.jitter)
+                    roll = server._random.random()
+                    over = server.max_in_flight is not None and server.in_flight > server.max_in_flight
+                    if roll < server.drop_rate:
+                        server.dropped += 1
+                    elif roll < server.drop_rate + server.error_rate:
+                        server.errors += 1
+                    elif over:
+                        server.throttled += 1
+                try:
+                    self._respond(latency, roll, over)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def _respond(self, latency, roll, over):
+                if latency > 0:
+                    time.sleep(latency)
+                if roll < server.drop_rate:
+                    self.close_connection = True  # the client sees the connection reset with nothing sent
+                    return
+                if roll < server.drop_rate + server.error_rate or over:
+                    self.send_response(429 if over else server.error_status)
+                    if server.retry_after is not None:
+                        self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = server.lookup(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, 1)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
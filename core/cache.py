@@ -0,0 +1,209 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+
+from .sessions import get_database
+from .metrics import get_metrics
+from .transport import get_transport
+
+
+DAY = 24 * 60 * 60
+
+# (regex, seconds) checked in order against each url. The letter index pages change whenever someone debuts so
+# they expire quickly, player pages only change once a week at most during the season.
+DEFAULT_TTL_RULES = [
+    (re.compile(r"/players/[A-Za-z]/?$"), 1 * DAY),
+    (re.compile(r"/players/[A-Za-z]/.+"), 7 * DAY),
+]
+DEFAULT_TTL = 1 * DAY
+RETIRED_TTL = 365 * DAY  # a retired player's page is basically never going to change
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def _download(url, headers):
+    # error statuses raise here, so only 200s and 304s reach the cache
+    return get_transport().request(url, headers=headers)
+
+
+class ResponseCache:
+    """On-disk cache of downloaded pages.
+
+    Bodies are zlib compressed and stored under their sha256 (so identical pages are only stored once), and an sqlite
+    index keeps track of which url points at which body along with its ETag/Last-Modified headers, when it expires
+    and when it was last used. Once an entry expires the next request is a conditional GET, so an unchanged page
+    costs a 304 instead of a full download. When the bodies take up more than max_bytes the least recently used
+    ones are deleted.
+
+    ---Arguments---
+
+    -directory:     where the cache lives. Created if it does not exist
+    -max_bytes:     size cap for the compressed bodies
+    -ttl_rules:     list of (compiled regex, seconds) pairs. The first regex that matches a url decides its ttl
+    -default_ttl:   ttl for urls that don't match any rule
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, ttl_rules=None, default_ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_rules = DEFAULT_TTL_RULES if ttl_rules is None else ttl_rules
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._lock = threading.RLock()
+        self._database = get_database(os.path.join(directory, "index.db"))
+        self._conn = self._database.checkout()
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                url TEXT PRIMARY KEY,
+                                digest TEXT NOT NULL,
+                                size INTEGER NOT NULL,
+                                etag TEXT,
+                                last_modified TEXT,
+                                fetched_at REAL NOT NULL,
+                                expires_at REAL NOT NULL,
+                                last_used REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_digest ON responses (digest)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM responses)").fetchone()[0]
+
+    def ttl_for(self, url):
+        for pattern, seconds in self.ttl_rules:
+            if pattern.search(url):
+                return seconds
+        return self.default_ttl
+
+    def _path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _entry(self, url):
+        return self._conn.execute("SELECT digest, etag, last_modified, expires_at FROM responses WHERE url = ?",
+                                  (url,)).fetchone()
+
+    def _read(self, digest):
+        try:
+            with open(self._path(digest), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def is_fresh(self, url):
+        """True if the url can be served without touching the network"""
+        with self._lock:
+            entry = self._entry(url)
+        return entry is not None and entry[3] > time.time()
+
+    def get(self, url, ttl=None, download=_download):
+        """Returns the body for url, from disk if possible. `ttl` overrides the ttl rules for this url (i.e. pass
+        RETIRED_TTL for players that are done playing). `download(url, headers)` must return a requests style
+        response and is only called on a miss or to revalidate an expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entry(url)
+            if entry is not None and entry[3] > now:
+                content = self._read(entry[0])
+                if content is not None:
+                    self.hits += 1
+                    get_metrics().inc("cache_requests_total", result="hit")
+                    self._conn.execute("UPDATE responses SET last_used = ? WHERE url = ?", (now, url))
+                    self._conn.commit()
+                    return content
+                entry = None  # the body went missing from disk, treat it as a miss
+
+        headers = {}
+        if entry is not None:
+            if entry[1]:
+                headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                headers["If-Modified-Since"] = entry[2]
+
+        response = download(url, headers)
+        ttl = self.ttl_for(url) if ttl is None else ttl
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                content = self._read(entry[0])
+                if content is not None:
+                    self.revalidated += 1
+                    get_metrics().inc("cache_requests_total", result="revalidated")
+                    self._conn.execute("UPDATE responses SET fetched_at = ?, expires_at = ?, last_used = ? "
+                                       "WHERE url = ?", (now, now + ttl, now, url))
+                    self._conn.commit()
+                    return content
+            # can't use the 304 without the old body. Downloaded outside the lock like the first request, so the
+            # other fetch threads aren't held up for a round trip
+            response = download(url, {})
+
+        with self._lock:
+            self.misses += 1
+            get_metrics().inc("cache_requests_total", result="miss")
+            content = response.content
+            if response.status_code == 200:  # errors and throttled pages are never cached
+                self._store(url, content, response.headers, now, ttl)
+            return content
+
+    def _store(self, url, content, headers, now, ttl):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        size = 0
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = zlib.compress(content, 6)
+            tmp = path + ".tmp{0}".format(threading.get_ident())
+            with open(tmp, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp, path)
+            size = len(compressed)
+            self._total_bytes += size
+        else:
+            size = os.path.getsize(path)
+
+        old = self._entry(url)
+        self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           (url, digest, size, headers.get("ETag"), headers.get("Last-Modified"), now, now + ttl, now))
+        if old is not None and old[0] != digest:
+            self._release(old[0])
+        self._conn.commit()
+
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _release(self, digest):
+        """Deletes a body once no url points at it anymore"""
+        if self._conn.execute("SELECT 1 FROM responses WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+            path = self._path(digest)
+            try:
+                self._total_bytes -= os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        # evict down to 90% so we aren't evicting again on the very next store
+        target = self.max_bytes * 0.9
+        cursor = self._conn.execute("SELECT url, digest FROM responses ORDER BY last_used")
+        for url, digest in cursor.fetchall():
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._release(digest)
+            self.evictions += 1
+            get_metrics().inc("cache_evictions_total")
+        self._conn.commit()
+
+    def stats(self):
+        requests_made = self.hits + self.misses + self.revalidated
+        return {"hits": self.hits, "misses": self.misses, "revalidated": self.revalidated,
+                "evictions": self.evictions, "bytes": self._total_bytes,
+                "hit_rate": (self.hits + self.revalidated) / requests_made if requests_made else 0.0}
+
+    def close(self):
+        with self._lock:
+            self._database.release(self._conn)
@@ -0,0 +1,143 @@
+"""sportscrape command line.
+
+    sportscrape roster football Databases/NFL.db
+    sportscrape stats Databases/NFL.db --position WR --last-year 1994 --table nfl_wrs_1994
+    sportscrape stats Databases/MLB.db --sport baseball --all-tables
+    sportscrape aggregates Databases/NFL.db nfl_receiving receiving_and_rushing
+    sportscrape export Databases/NFL.db nfl_wrs_1994 nfl_wrs_1994.parquet
+
+Only argparse is imported up front. pandas, requests, bs4 and the scraping modules are imported by the subcommand
+that needs them, so --help (and a typo) come back straight away.
+"""
+import argparse
+import sys
+
+
+def roster(args):
+    from .players_list import refresh_roster
+    print(refresh_roster(args.database, sport=args.sport, letters=args.letters, rate=args.rate, force=args.force))
+
+
+def stats(args):
+    from .player_scrape import enable_cache
+    from .metrics import configure
+    if args.cache_dir is not None:
+        enable_cache(args.cache_dir)
+    metrics = configure(profile=args.profile, profiler=args.profiler)
+    try:
+        _build(args)
+    finally:
+        _save_metrics(args, metrics)
+
+
+def _save_metrics(args, metrics):
+    from .metrics import write_metrics
+    if args.metrics is not None:
+        write_metrics(args.metrics, metrics)
+    for path in metrics.dump_profiles(args.profile_dir) if args.profile else []:
+        print("Profile written to {0}".format(path))
+
+
+def _build(args):
+    if args.sport == "baseball":
+        from .add_rows_to_db import mlb_create_annual_db, MLB_TABLE_DESTINATIONS
+        mlb_create_annual_db(abs_path=args.database, destination_table=args.table or "all_players_batting",
+                             flush_rows=args.flush_rows, reset=args.reset, concurrency=args.concurrency,
+                             rate=args.rate, processes=args.processes,
+                             tables=MLB_TABLE_DESTINATIONS if args.all_tables else None, refresh=args.refresh)
+        return
+
+    from .add_rows_to_db import nfl_stat_builder
+    errors = nfl_stat_builder(database=args.database, destination_table=args.table or "nfl_wrs_1994",
+                              position=args.position, last_year=args.last_year, concurrency=args.concurrency,
+                              rate=args.rate, flush_rows=args.flush_rows, reset=args.reset,
+                              processes=args.processes, refresh=args.refresh, columnar_dir=args.columnar_dir,
+                              seasons=args.seasons)
+    if errors:
+        print("{0} players failed: {1}".format(len(errors), ", ".join(errors)))
+
+
+def aggregates(args):
+    from .aggregates import materialize
+    updated = materialize(args.database, args.table, args.table_id, peak_seasons=args.peak_seasons, full=args.full)
+    for table, players in updated.items():
+        print("{0}: {1} players updated".format(table, players))
+
+
+def export(args):
+    from .exporters import export as export_chunks
+    from .read_from_db import iter_from_db
+    rows = export_chunks(iter_from_db(args.database, args.table, chunk_rows=args.chunk_rows), args.output,
+                         format=args.format)
+    print("Exported {0} rows of {1} to {2}".format(rows, args.table, args.output))
+
+
+def parser():
+    # the defaults are written out rather than imported from fetch/writers/read_from_db, which would import pandas
+    main_parser = argparse.ArgumentParser(prog="sportscrape", description="Scrapes sports statistics from Sports "
+                                                                           "Reference into sqlite")
+    commands = main_parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    roster_parser = commands.add_parser("roster", help="add new players to a roster table and update changed ones")
+    roster_parser.add_argument("sport", choices=["football", "baseball"])
+    roster_parser.add_argument("database")
+    roster_parser.add_argument("--letters", default=None, help="only these letters of the player index, i.e. abc")
+    roster_parser.add_argument("--rate", type=float, default=20 / 60, help="requests per second (default 1 per 3s)")
+    roster_parser.add_argument("--force", action="store_true", help="re-read letters whose page hasn't changed")
+    roster_parser.set_defaults(run=roster)
+
+    stats_parser = commands.add_parser("stats", help="scrape player stat tables into the database")
+    stats_parser.add_argument("database")
+    stats_parser.add_argument("--sport", choices=["football", "baseball"], default="football")
+    stats_parser.add_argument("--table", default=None, help="destination table")
+    stats_parser.add_argument("--position", default="WR", help="WR, TE, RB or QB, the ones table_specs has tables for")
+    stats_parser.add_argument("--last-year", type=int, default=0, help="players active in or after this year")
+    stats_parser.add_argument("--seasons", action="store_true", help="store every season instead of the career row")
+    stats_parser.add_argument("--refresh", action="store_true", help="re-scrape players active this season")
+    stats_parser.add_argument("--all-tables", action="store_true",
+                              help="baseball: batting, pitching, fielding, value and postseason tables")
+    stats_parser.add_argument("--reset", action="store_true", help="start the build over")
+    stats_parser.add_argument("--cache-dir", default=None, help="keep downloaded pages in an on-disk cache here")
+    stats_parser.add_argument("--columnar-dir", default=None, help="also write a parquet copy here")
+    stats_parser.add_argument("--concurrency", type=int, default=8)
+    stats_parser.add_argument("--rate", type=float, default=20 / 60)
+    stats_parser.add_argument("--processes", type=int, default=None, help="parser processes, 0 parses in-process")
+    stats_parser.add_argument("--flush-rows", type=int, default=500)
+    stats_parser.add_argument("--metrics", default=None,
+                              help="write the build's metrics here, Prometheus text for .prom and JSON otherwise")
+    stats_parser.add_argument("--profile", action="append", default=[], choices=["fetch", "parse", "write", "flush"],
+                              help="profile a stage, can be given more than once")
+    stats_parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile")
+    stats_parser.add_argument("--profile-dir", default="profiles", help="where --profile writes (default ./profiles)")
+    stats_parser.set_defaults(run=stats)
+
+    aggregates_parser = commands.add_parser("aggregates", help="update the career, peak and era tables of a season "
+                                                               "table")
+    aggregates_parser.add_argument("database")
+    aggregates_parser.add_argument("table", help="season table, i.e. one built with stats --seasons")
+    aggregates_parser.add_argument("table_id", choices=["receiving_and_rushing", "batting_standard",
+                                                        "pitching_standard"], help="the kind of table it is")
+    aggregates_parser.add_argument("--peak-seasons", type=int, default=3)
+    aggregates_parser.add_argument("--full", action="store_true", help="recompute every player")
+    aggregates_parser.set_defaults(run=aggregates)
+
+    export_parser = commands.add_parser("export", help="write a table to csv, jsonl or parquet in chunks")
+    export_parser.add_argument("database")
+    export_parser.add_argument("table")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], default=None,
+                               help="defaults to the output's extension")
+    export_parser.add_argument("--chunk-rows", type=int, default=10000)
+    export_parser.set_defaults(run=export)
+    return main_parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    args.run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
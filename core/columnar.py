@@ -0,0 +1,111 @@
+"""Optional Parquet copy of the stat tables for analysis work.
+
+SQLite is row oriented, so loading a stat table into pandas for StandardScaler/PCA/KMeans (see the wide receiver
+notebook) reads every column of every row and converts them one value at a time. ColumnarStore keeps the same tables
+as Arrow/Parquet datasets under a directory, hive partitioned by sport/position/season:
+
+    <root>/nfl_wrs_1994/sport=football/position=WR/part-0.parquet
+    <root>/nfl_receiving/sport=football/position=WR/season=1994/part-0.parquet
+
+Reads only touch the columns asked for (and only the partitions that match the filters), the files are memory mapped,
+and the result is an Arrow-backed DataFrame made without copying. read_from_db.read_all_from_db(db="parquet", ...)
+reads from here, so analysis code only has to change the db argument.
+
+Needs pyarrow, which is imported when a ColumnarStore is made.
+"""
+import os
+
+from .read_from_db import iter_from_db, DEFAULT_CHUNK_ROWS
+
+
+PARTITION_KEYS = ["sport", "position", "season"]
+
+
+class ColumnarStore:
+    """
+    ---Arguments---
+
+    -root:          directory holding one dataset (sub directory) per table
+    """
+
+    def __init__(self, root):
+        try:
+            import pyarrow
+            import pyarrow.dataset
+            import pyarrow.fs
+        except ImportError:
+            raise ImportError("The columnar store needs pyarrow, pip install pyarrow")
+        self._pa = pyarrow
+        self._ds = pyarrow.dataset
+        self._filesystem = pyarrow.fs.LocalFileSystem(use_mmap=True)  # reads map the files instead of copying them
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, dataset):
+        return os.path.join(self.root, dataset)
+
+    def datasets(self):
+        return sorted(name for name in os.listdir(self.root) if os.path.isdir(self.path(name)))
+
+    def write(self, chunks, dataset, sport, position=None, season_column=None):
+        """Writes DataFrames (one, or an iterable of chunks) as the sport/position partition of a dataset, replacing
+        whatever that partition held before. season_column names the column to split seasons on (i.e. "Year" for
+        season by season tables), summary tables don't have one. Returns the number of rows written"""
+        chunks = [chunks] if hasattr(chunks, "columns") else chunks
+        schema, rows = None, 0
+
+        def tables():
+            nonlocal schema, rows
+            for df in chunks:
+                df = df.astype({column: "string" for column, dtype in df.dtypes.items() if dtype == "category"})
+                df = df.assign(sport=sport, position=position or "all")
+                if season_column is not None:
+                    df = df.assign(season=df[season_column])
+                table = self._pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+                schema = table.schema  # every chunk gets the first chunk's types
+                rows += len(df)
+                yield table
+
+        batches = (batch for table in tables() for batch in table.to_batches())
+        first = next(batches, None)
+        if first is None:
+            return 0
+
+        def all_batches():
+            yield first
+            yield from batches
+
+        keys = PARTITION_KEYS if season_column is not None else PARTITION_KEYS[:2]
+        self._ds.write_dataset(self._pa.RecordBatchReader.from_batches(first.schema, all_batches()),
+                               self.path(dataset), format="parquet", partitioning=keys, partitioning_flavor="hive",
+                               existing_data_behavior="delete_matching")
+        return rows
+
+    def import_sqlite(self, abs_path, table, sport, position=None, season_column=None, dataset=None,
+                      chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Copies a stat table out of a sqlite database, chunk by chunk (read_from_db.iter_from_db)"""
+        return self.write(iter_from_db(abs_path, table, chunk_rows=chunk_rows), dataset or table, sport,
+                          position=position, season_column=season_column)
+
+    def to_arrow(self, dataset, columns=None, filters=None):
+        """pyarrow Table of the dataset. filters is a dict of column -> value or list of values, partition columns
+        (sport, position, season) included, and only matching partitions are read"""
+        data = self._ds.dataset(self.path(dataset), format="parquet", partitioning="hive",
+                                filesystem=self._filesystem)
+        return data.to_table(columns=columns, filter=self._expression(filters))
+
+    def read(self, dataset, columns=None, filters=None):
+        """DataFrame of the dataset backed by the Arrow buffers (pd.ArrowDtype columns), no conversion or copy"""
+        import pandas as pd
+        return self.to_arrow(dataset, columns, filters).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def _expression(self, filters):
+        expression = None
+        for column, value in (filters or {}).items():
+            field = self._ds.field(column)
+            if isinstance(value, (list, tuple, set)):
+                condition = field.isin(list(value))
+            else:
+                condition = field == value
+            expression = condition if expression is None else expression & condition
+        return expression
@@ -0,0 +1,105 @@
+"""Incremental CSV / JSONL / Parquet writers for streams of DataFrame chunks.
+
+Each exporter appends one chunk at a time to an open file, so together with the chunked readers
+(read_from_db.iter_from_db, RosterConnection.iter_select, players_list.iter_roster_chunks, pipeline.iter_stat_chunks)
+exporting a table never needs more than one chunk in memory:
+
+    export(iter_from_db("Databases/NFL.db", "nfl_wrs_1994"), "nfl_wrs_1994.parquet")
+
+Parquet needs pyarrow, which is only imported when a ParquetExporter is made.
+"""
+import os
+
+
+class CSVExporter:
+    """Writes the header with the first chunk and appends the rest"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self._file, header=self._header, index=False)
+        self._header = False
+        self.rows += len(df)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JSONLExporter(CSVExporter):
+    """One json object per row"""
+
+    def write(self, df):
+        if len(df):
+            self._file.write(df.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n") + "\n")
+        self.rows += len(df)
+
+
+class ParquetExporter:
+    """Each chunk becomes a row group of one parquet file. The schema is taken from the first chunk and later chunks
+    are cast to it. Categorical columns are written as plain strings (parquet dictionary encodes them anyway) since
+    their categories differ chunk to chunk"""
+
+    def __init__(self, path, compression="snappy"):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow, pip install pyarrow")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        self.compression = compression
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df):
+        df = df.astype({column: "string" for column, dtype in df.dtypes.items() if dtype == "category"})
+        if self._writer is None:
+            table = self._pa.Table.from_pandas(df, preserve_index=False)
+            self._writer = self._pq.ParquetWriter(self.path, table.schema, compression=self.compression)
+        else:
+            table = self._pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+EXPORTERS = {"csv": CSVExporter, "jsonl": JSONLExporter, "parquet": ParquetExporter}
+
+
+def exporter_for(path, format=None):
+    """Exporter for the format, which defaults to the file extension"""
+    format = (format or os.path.splitext(path)[1].lstrip(".")).lower()
+    if format == "json":
+        format = "jsonl"
+    try:
+        return EXPORTERS[format](path)
+    except KeyError:
+        raise ValueError("Unsupported export format {0}, use one of {1}".format(format, ", ".join(EXPORTERS)))
+
+
+def export(chunks, path, format=None):
+    """Writes every DataFrame in the chunks iterable to path and returns the number of rows written"""
+    with exporter_for(path, format) as exporter:
+        for df in chunks:
+            exporter.write(df)
+    return exporter.rows
@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+from .metrics import get_metrics
+
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 20 / 60  # Sports Reference blocks clients that make more than ~20 requests a minute
+DEFAULT_BURST = 1
+
+
+class TokenBucket:
+    """Simple thread safe token bucket. Each call to acquire() takes one token and blocks until it is available.
+    Tokens refill at `rate` per second up to `burst`. A rate of None means no limit at all (used for local testing).
+    """
+
+    def __init__(self, rate, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1  # the token is reserved now, so waiting threads queue up behind each other in order
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+
+class HostRateLimiter:
+    """Keeps one TokenBucket per host so that e.g. pro-football-reference and baseball-reference are throttled
+    separately"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.burst)
+            return self._buckets[host]
+
+    def acquire(self, url):
+        self.bucket(url).acquire()
+
+
+def fetch_pages(jobs, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, burst=DEFAULT_BURST, limiter=None,
+                fetch=None, ttl=None):
+    """Fetches many pages at once and yields them as they arrive so they can be parsed/inserted while the rest are
+    still downloading.
+
+    ---Arguments---
+
+    -jobs:          iterable of (key, url) tuples. The key is handed back with the result so the caller can match the
+                    page with its roster row
+    -concurrency:   number of pages that can be downloading at the same time
+    -rate:          requests per second allowed for each host. None turns off rate limiting
+    -burst:         number of requests a host can get in a row before the rate kicks in
+    -limiter:       optional HostRateLimiter to share between several calls. Overrides rate/burst
+    -fetch:         function that takes a url and returns the page content. Defaults to player_scrape.get_page
+    -ttl:           optional function that takes a job key and returns how long the page should stay in the page
+                    cache (see player_scrape.enable_cache). Pages that are already cached skip the rate limiter
+
+    Every download is timed into the metrics as stage_seconds{stage="fetch"}.
+
+    Yields (key, url, content, error) in completion order. error is None if the download worked, otherwise content
+    is None and error is the exception that was raised.
+    """
+    from .player_scrape import get_page, is_cached  # here so importing fetch doesn't load pandas
+    fetch = fetch or get_page
+    if limiter is None:
+        limiter = HostRateLimiter(rate, burst)
+    metrics = get_metrics()
+
+    def task(key, url):
+        if not is_cached(url):
+            limiter.acquire(url)
+        with metrics.stage("fetch"):  # after the limiter, so it is the download and not the wait for a token
+            if ttl is not None:
+                return fetch(url, ttl=ttl(key))
+            return fetch(url)
+
+    jobs = iter(jobs)
+    pending = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # only keep a couple of jobs queued per worker so a long roster isn't submitted all at once
+        for key, url in jobs:
+            pending[executor.submit(task, key, url)] = (key, url)
+            if len(pending) >= concurrency * 2:
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, url = pending.pop(future)
+                error = future.exception()
+                yield key, url, (None if error is not None else future.result()), error
+
+                next_job = next(jobs, None)
+                if next_job is not None:
+                    pending[executor.submit(task, *next_job)] = next_job
@@ -0,0 +1,205 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+
+from .sessions import get_database
+
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF = 10.0  # seconds before the first retry, doubled for every retry after that
+DEFAULT_STALE_AFTER = 15 * 60  # an in-flight claim older than this belongs to a worker that died
+
+Job = namedtuple("Job", ["key", "url", "name", "data", "attempts"])
+
+
+class JobQueue:
+    """Per-player work queue for the stat builders, stored in a table of the same sqlite database the stats go to.
+
+    Every player is a row keyed by (job, key) that moves pending -> in_flight -> done, or back to pending with an
+    exponential backoff when it fails, until it has failed max_attempts times and is marked failed. Claims happen
+    inside BEGIN IMMEDIATE transactions so several worker processes can pull from the same queue without getting
+    the same player. Rows that are done stay done, enqueueing them again is a no-op, so a re-run picks up exactly
+    where the last one stopped.
+
+    One JobQueue can be shared between threads (i.e. drain() feeding pipeline.run_pipeline's fetch thread while the
+    writer calls fail()), every use of the connection goes through a lock.
+
+    ---Arguments---
+
+    -abs_path:      path of the sqlite database
+    -job:           name of the build, i.e. the destination table. Lets several builds share the queue table
+    -max_attempts:  number of failures before a player is given up on
+    -backoff:       seconds to wait before the first retry
+    -worker:        name recorded on claimed rows. Defaults to host:pid
+    """
+
+    def __init__(self, abs_path, job, table="scrape_jobs", max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF,
+                 worker=None):
+        self.abs_path = abs_path
+        self.job = job
+        self.table = table
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.worker = worker or "{0}:{1}".format(socket.gethostname(), os.getpid())
+
+        # autocommit mode, transactions are started by hand so claims can use BEGIN IMMEDIATE
+        self._database = get_database(abs_path)
+        self.connection = self._database.checkout()
+        self.connection.isolation_level = None
+        self._lock = threading.RLock()
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS "{0}" (
+                                    job TEXT NOT NULL,
+                                    key TEXT NOT NULL,
+                                    url TEXT,
+                                    name TEXT,
+                                    data TEXT,
+                                    state TEXT NOT NULL DEFAULT '{1}',
+                                    attempts INTEGER NOT NULL DEFAULT 0,
+                                    next_attempt REAL NOT NULL DEFAULT 0,
+                                    worker TEXT,
+                                    claimed_at REAL,
+                                    error TEXT,
+                                    PRIMARY KEY (job, key))""".format(table, PENDING))
+        self.connection.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_claim" ON "{0}" (job, state, next_attempt)'.format(
+            table))
+
+    def enqueue(self, jobs):
+        """Adds (key, url, name, data) tuples. data is any json-able value handed back with the claimed Job. Players
+        that are already in the queue, in any state, are left alone"""
+        rows = ((self.job, str(key), url, name, json.dumps(data)) for key, url, name, data in jobs)
+        with self._transaction():
+            self.connection.executemany('INSERT OR IGNORE INTO "{0}" (job, key, url, name, data) VALUES (?, ?, ?, ?, ?)'
+                                        .format(self.table), rows)
+
+    def requeue(self, jobs):
+        """Like enqueue, but players already in the queue are put back to pending with a fresh set of attempts and the
+        new url/name/data, whatever state they were in. Used to re-scrape players whose stats have changed"""
+        rows = ((self.job, str(key), url, name, json.dumps(data)) for key, url, name, data in jobs)
+        with self._transaction("IMMEDIATE"):
+            self.connection.executemany(
+                'INSERT INTO "{0}" (job, key, url, name, data) VALUES (?, ?, ?, ?, ?) ON CONFLICT (job, key) DO UPDATE '
+                'SET url = excluded.url, name = excluded.name, data = excluded.data, state = ?, attempts = 0, '
+                'next_attempt = 0, worker = NULL, error = NULL'.format(self.table),
+                (row + (PENDING,) for row in rows))
+
+    def claim(self, n):
+        """Marks up to n pending players that are due as in flight for this worker and returns them as Jobs"""
+        now = time.time()
+        with self._transaction("IMMEDIATE"):
+            rows = self.connection.execute(
+                'SELECT key, url, name, data, attempts FROM "{0}" WHERE job = ? AND state = ? AND next_attempt <= ? '
+                'ORDER BY next_attempt, rowid LIMIT ?'.format(self.table), (self.job, PENDING, now, n)).fetchall()
+            self.connection.executemany(
+                'UPDATE "{0}" SET state = ?, worker = ?, claimed_at = ? WHERE job = ? AND key = ?'.format(self.table),
+                ((IN_FLIGHT, self.worker, now, self.job, row[0]) for row in rows))
+        return [Job(key, url, name, json.loads(data), attempts) for key, url, name, data, attempts in rows]
+
+    def mark_done(self, connection, keys):
+        """Marks players as done using someone else's connection, so it can happen in the same transaction that
+        wrote their rows (see writers.BufferedSink on_flush)"""
+        connection.executemany('UPDATE "{0}" SET state = ?, error = NULL WHERE job = ? AND key = ?'.format(self.table),
+                               ((DONE, self.job, key) for key in keys))
+
+    def complete(self, keys):
+        with self._transaction():
+            self.mark_done(self.connection, keys)
+
+    def fail(self, key, error=""):
+        """Puts the player back in the queue with a backoff, or marks it failed once it is out of attempts"""
+        with self._transaction("IMMEDIATE"):
+            row = self.connection.execute('SELECT attempts FROM "{0}" WHERE job = ? AND key = ?'.format(self.table),
+                                          (self.job, key)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            state = FAILED if attempts >= self.max_attempts else PENDING
+            next_attempt = time.time() + self.backoff * 2 ** (attempts - 1)
+            self.connection.execute('UPDATE "{0}" SET state = ?, attempts = ?, next_attempt = ?, error = ?, '
+                                    'worker = NULL WHERE job = ? AND key = ?'.format(self.table),
+                                    (state, attempts, next_attempt, str(error)[:500], self.job, key))
+
+    def release_stale(self, older_than=DEFAULT_STALE_AFTER):
+        """Puts in-flight players claimed more than older_than seconds ago back to pending (their worker crashed)"""
+        with self._transaction("IMMEDIATE"):
+            cursor = self.connection.execute(
+                'UPDATE "{0}" SET state = ?, worker = NULL WHERE job = ? AND state = ? AND claimed_at < ?'.format(
+                    self.table), (PENDING, self.job, IN_FLIGHT, time.time() - older_than))
+        return cursor.rowcount
+
+    def retry_failed(self):
+        """Gives players that ran out of attempts a fresh set"""
+        with self._transaction():
+            self.connection.execute('UPDATE "{0}" SET state = ?, attempts = 0, next_attempt = 0 WHERE job = ? AND '
+                                    'state = ?'.format(self.table), (PENDING, self.job, FAILED))
+
+    def drain(self, batch_size=50):
+        """Yields batches of claimed Jobs until nothing is left pending. When the only players left are waiting out a
+        backoff it sleeps until the first one is due"""
+        while True:
+            batch = self.claim(batch_size)
+            if batch:
+                yield batch
+                continue
+            wait = self.next_retry_in()
+            if wait is None:
+                return
+            time.sleep(wait)
+
+    def next_retry_in(self):
+        """Seconds until the next backed-off player is due, None if nothing is waiting on a retry"""
+        with self._lock:
+            row = self.connection.execute('SELECT MIN(next_attempt) FROM "{0}" WHERE job = ? AND state = ?'.format(
+                self.table), (self.job, PENDING)).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def counts(self):
+        with self._lock:
+            rows = self.connection.execute('SELECT state, COUNT(*) FROM "{0}" WHERE job = ? GROUP BY state'.format(
+                self.table), (self.job,)).fetchall()
+        counts = {PENDING: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+    def failures(self):
+        with self._lock:
+            return self.connection.execute('SELECT key, name, attempts, error FROM "{0}" WHERE job = ? AND state = ?'
+                                           .format(self.table), (self.job, FAILED)).fetchall()
+
+    def reset(self):
+        """Forgets everything about this job, the next run starts from scratch"""
+        with self._transaction():
+            self.connection.execute('DELETE FROM "{0}" WHERE job = ?'.format(self.table), (self.job,))
+
+    def close(self):
+        self._database.release(self.connection)
+
+    def _transaction(self, mode=""):
+        return _Transaction(self.connection, mode, self._lock)
+
+
+class _Transaction:
+
+    def __init__(self, connection, mode, lock):
+        self.connection = connection
+        self.mode = mode
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.connection.execute("BEGIN {0}".format(self.mode))
+        except BaseException:
+            self.lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self.lock.release()
@@ -0,0 +1,398 @@
+"""Counters, histograms and per-stage profiling for the scrapers.
+
+Everything records into one process-wide Metrics (get_metrics()): fetch latency and bytes downloaded, cache hits,
+parse time per table, flush time, rows written and errors by cause. At the end of a build it can be written out as
+JSON or in the Prometheus text format (write_metrics), and summary() boils it down to the few numbers worth printing.
+
+Parsing happens in worker processes, where the global Metrics is a copy nobody reads. pipeline._timed runs each parse
+inside collecting(), which swaps in a fresh Metrics for that thread and hands its snapshot() back with the result so
+the writer can merge() it.
+
+Stages can also be profiled: Metrics(profile=["parse"], profiler="cprofile") runs every parse under cProfile and
+adds the runs together, dump_profiles() writes one file per stage. Only one call is profiled at a time per process,
+fetch threads that start while another fetch is being profiled just run normally.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# seconds, covers a cached page read up to a slow download
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+                   float("inf"))
+PROFILERS = ("cprofile", "pyinstrument")
+
+_profiling = threading.Lock()  # neither profiler can have two runs going at once in one process
+
+
+def error_cause(error):
+    """Short label for why something failed: http_<status> for bad responses, the exception's `cause` attribute if
+    it has one (table_extract.MissingTable, schemas.SchemaMismatch) and the exception's class name otherwise"""
+    if isinstance(error, str):  # i.e. "Pitcher"/"Error" from the old mlb parse functions
+        return error.lower()
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return "http_{0}".format(status)
+    return getattr(error, "cause", None) or type(error).__name__
+
+
+def _key(name, labels):
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+class Histogram:
+    """Bucketed observations, quantiles are interpolated within a bucket"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other["counts"])]
+        self.count += other["count"]
+        self.sum += other["sum"]
+        self.max = max(self.max, other["max"])
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = self.buckets[i - 1] if i else 0.0
+                high = min(self.buckets[i], self.max)
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def as_dict(self):
+        return {"count": self.count, "sum": self.sum, "max": self.max, "counts": list(self.counts),
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99)}
+
+
+class _Profile:
+    """One stage's profile, every profiled call added together"""
+
+    def __init__(self, profiler):
+        if profiler not in PROFILERS:
+            raise ValueError("profiler has to be one of {0}".format(", ".join(PROFILERS)))
+        self.profiler = profiler
+        self.calls = 0
+        self.data = None  # cProfile stats dict or a pyinstrument Session
+
+    @contextmanager
+    def run(self):
+        if not _profiling.acquire(blocking=False):
+            yield  # something else in this process is being profiled already
+            return
+        try:
+            if self.profiler == "cprofile":
+                import cProfile
+                profiler = cProfile.Profile()
+                profiler.enable()
+                try:
+                    yield
+                finally:
+                    profiler.disable()
+                    profiler.create_stats()
+                    self.add(profiler.stats)
+            else:
+                from pyinstrument import Profiler
+                profiler = Profiler()
+                profiler.start()
+                try:
+                    yield
+                finally:
+                    self.add(profiler.stop())
+        finally:
+            _profiling.release()
+
+    def add(self, data, calls=1):
+        self.calls += calls
+        if self.data is None:
+            self.data = data
+        elif self.profiler == "cprofile":
+            self.data = _add_cprofile(self.data, data)
+        else:
+            from pyinstrument.session import Session
+            self.data = Session.combine(self.data, data)
+
+    def dump(self, path):
+        if self.profiler == "cprofile":
+            import marshal
+            with open(path + ".prof", "wb") as f:  # loads with pstats.Stats(path) / snakeviz
+                marshal.dump(self.data, f)
+            return path + ".prof"
+        from pyinstrument.renderers import HTMLRenderer
+        with open(path + ".html", "w") as f:
+            f.write(HTMLRenderer().render(self.data))
+        return path + ".html"
+
+
+def _add_cprofile(total, stats):
+    # same arithmetic as pstats.Stats.add, on the raw dicts so they can be pickled back from a worker process
+    total = dict(total)
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        if func not in total:
+            total[func] = (cc, nc, tt, ct, callers)
+            continue
+        old_cc, old_nc, old_tt, old_ct, old_callers = total[func]
+        merged = dict(old_callers)
+        for caller, value in callers.items():
+            merged[caller] = tuple(a + b for a, b in zip(merged[caller], value)) if caller in merged else value
+        total[func] = (old_cc + cc, old_nc + nc, old_tt + tt, old_ct + ct, merged)
+    return total
+
+
+class Metrics:
+    """Thread safe registry of counters, gauges and histograms, each one a name plus optional labels.
+
+    ---Arguments---
+
+    -profile:       names of the stages to profile, i.e. ["parse", "flush"]. See stage()
+    -profiler:      "cprofile" or "pyinstrument" (has to be installed)
+    """
+
+    def __init__(self, profile=(), profiler="cprofile"):
+        self.profile_stages = set(profile)
+        self.profiler = profiler
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.profiles = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def error(self, stage, error):
+        """Counts a failure under errors_total{stage, cause}, see error_cause"""
+        self.inc("errors_total", stage=stage, cause=error_cause(error))
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def stage(self, stage, **labels):
+        """Times the block into stage_seconds{stage} and profiles it if the stage was asked for"""
+        with self.timer("stage_seconds", stage=stage, **labels), self.profiled(stage):
+            yield
+
+    @contextmanager
+    def profiled(self, stage):
+        if stage not in self.profile_stages:
+            yield
+            return
+        with self._lock:
+            if stage not in self.profiles:
+                self.profiles[stage] = _Profile(self.profiler)
+            profile = self.profiles[stage]
+        with profile.run():
+            yield
+
+    def value(self, name, **labels):
+        """A counter's value, summed over every label set that includes the given labels"""
+        wanted = set(_key(name, labels)[1])
+        with self._lock:
+            return sum(value for (counter, counter_labels), value in self.counters.items()
+                       if counter == name and wanted <= set(counter_labels))
+
+    def histogram(self, name, **labels):
+        """The named histogram with every label set that includes the given labels merged into one"""
+        wanted = set(_key(name, labels)[1])
+        merged = Histogram()
+        with self._lock:
+            for (histogram, histogram_labels), h in self.histograms.items():
+                if histogram == name and wanted <= set(histogram_labels):
+                    merged.merge(h.as_dict())
+        return merged
+
+    def snapshot(self):
+        """Plain dicts and lists that can be pickled back from a worker process and merge()d"""
+        with self._lock:
+            return {"counters": list(self.counters.items()), "gauges": list(self.gauges.items()),
+                    "histograms": [(key, h.as_dict()) for key, h in self.histograms.items()],
+                    "profiles": [(stage, p.profiler, p.calls, p.data) for stage, p in self.profiles.items()
+                                 if p.data is not None]}
+
+    def merge(self, snapshot):
+        with self._lock:
+            for key, value in snapshot["counters"]:
+                self.counters[key] = self.counters.get(key, 0) + value
+            self.gauges.update(snapshot["gauges"])
+            for key, histogram in snapshot["histograms"]:
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram()
+                self.histograms[key].merge(histogram)
+            for stage, profiler, calls, data in snapshot["profiles"]:
+                if stage not in self.profiles:
+                    self.profiles[stage] = _Profile(profiler)
+                self.profiles[stage].add(data, calls)
+
+    def reset(self):
+        with self._lock:
+            self.counters, self.gauges, self.histograms, self.profiles = {}, {}, {}, {}
+            self.started = time.time()
+
+    def summary(self):
+        """The headline numbers: throughput, cache hit rate, fetch/parse/flush latency and errors by cause"""
+        elapsed = time.time() - self.started
+        rows = self.value("rows_written_total")
+        cache_hits = self.value("cache_requests_total", result="hit") + \
+            self.value("cache_requests_total", result="revalidated")
+        cache_requests = self.value("cache_requests_total")
+        fetch, parse, flush = (self.histogram("stage_seconds", stage=stage) for stage in ("fetch", "parse", "flush"))
+        with self._lock:
+            errors = {dict(labels)["stage"] + ":" + dict(labels)["cause"]: value
+                      for (name, labels), value in self.counters.items() if name == "errors_total"}
+        return {"seconds": elapsed, "pages": self.value("pages_total"), "rows": rows,
+                "rows_per_sec": rows / elapsed if elapsed else 0.0,
+                "bytes_downloaded": self.value("bytes_downloaded_total"),
+                "cache_hit_rate": cache_hits / cache_requests if cache_requests else 0.0,
+                "fetch_p50_ms": 1000 * fetch.quantile(0.5), "fetch_p95_ms": 1000 * fetch.quantile(0.95),
+                "parse_p50_ms": 1000 * parse.quantile(0.5), "parse_p95_ms": 1000 * parse.quantile(0.95),
+                "flush_mean_ms": 1000 * flush.sum / flush.count if flush.count else 0.0,
+                "errors": errors}
+
+    def to_json(self, indent=2):
+        with self._lock:
+            data = {"started": self.started,
+                    "counters": [dict(name=name, labels=dict(labels), value=value)
+                                 for (name, labels), value in self.counters.items()],
+                    "gauges": [dict(name=name, labels=dict(labels), value=value)
+                               for (name, labels), value in self.gauges.items()],
+                    "histograms": [dict(name=name, labels=dict(labels), buckets=list(h.buckets[:-1]), **h.as_dict())
+                                   for (name, labels), h in self.histograms.items()]}
+        data["summary"] = self.summary()
+        return json.dumps(data, indent=indent)
+
+    def to_prometheus(self, prefix="sportscrape_"):
+        """Prometheus text exposition format, i.e. for a node_exporter textfile collector"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in metrics}):
+                    lines.append("# TYPE {0}{1} {2}".format(prefix, name, kind))
+                    for (metric, labels), value in sorted(metrics.items()):
+                        if metric == name:
+                            lines.append("{0}{1}{2} {3}".format(prefix, name, _labels(labels), value))
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append("# TYPE {0}{1} histogram".format(prefix, name))
+                for (metric, labels), h in sorted(self.histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(h.buckets, h.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append("{0}{1}_bucket{2} {3}".format(prefix, name, _labels(labels + (("le", le),)),
+                                                                   cumulative))
+                    lines.append("{0}{1}_sum{2} {3}".format(prefix, name, _labels(labels), h.sum))
+                    lines.append("{0}{1}_count{2} {3}".format(prefix, name, _labels(labels), h.count))
+        return "\n".join(lines) + "\n"
+
+    def dump_profiles(self, directory):
+        """Writes each profiled stage to directory/<stage>.prof (cProfile) or .html (pyinstrument). Returns the
+        paths"""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            profiles = list(self.profiles.items())
+        return [profile.dump(os.path.join(directory, stage)) for stage, profile in profiles if profile.data is not None]
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join('{0}="{1}"'.format(label, value) for (label, _), value in zip(labels, escaped)) + "}"
+
+
+_metrics = Metrics()
+_local = threading.local()
+
+
+def get_metrics():
+    """The Metrics everything records into: the thread's own one inside collecting(), otherwise the process wide one"""
+    return getattr(_local, "metrics", None) or _metrics
+
+
+def configure(profile=(), profiler="cprofile"):
+    """Starts the process wide Metrics over, profiling the given stages"""
+    global _metrics
+    _metrics = Metrics(profile=profile, profiler=profiler)
+    return _metrics
+
+
+@contextmanager
+def collecting(profile=(), profiler="cprofile"):
+    """Records this thread's metrics into a fresh Metrics until the block ends, see pipeline._timed"""
+    previous = getattr(_local, "metrics", None)
+    _local.metrics = Metrics(profile=profile, profiler=profiler)
+    try:
+        yield _local.metrics
+    finally:
+        _local.metrics = previous
+
+
+def _wire_bytes(response):
+    # content is the decoded body, several times what a gzip/brotli page took to send. urllib3 counts what it
+    # actually read off the socket, Content-Length is the next best thing
+    try:
+        read = response.raw.tell()
+    except (AttributeError, OSError, ValueError):
+        read = None
+    if read:
+        return read
+    length = response.headers.get("Content-Length", "")
+    return int(length) if length.isdigit() else len(response.content)
+
+
+def record_response(response):
+    """Counts a downloaded page by status and its bytes, as sent (bytes_downloaded_total) and once decompressed
+    (bytes_decoded_total). Called by transport.Transport for every response, retried ones included. Cached pages
+    don't count"""
+    metrics = get_metrics()
+    metrics.inc("http_responses_total", status=response.status_code)
+    metrics.inc("bytes_downloaded_total", _wire_bytes(response))
+    metrics.inc("bytes_decoded_total", len(response.content))
+
+
+def write_metrics(path, metrics=None):
+    """Writes the metrics to path, Prometheus text if it ends in .prom and JSON otherwise"""
+    metrics = metrics or get_metrics()
+    with open(path, "w") as f:
+        f.write(metrics.to_prometheus() if path.endswith(".prom") else metrics.to_json())
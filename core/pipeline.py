@@ -0,0 +1,321 @@
+"""Three stage scrape pipeline: fetch threads -> parser processes -> one writer.
+
+Downloading is I/O bound but parsing a Sports Reference page is CPU bound and holds the GIL, so past a few fetch
+threads more threads stop helping. run_pipeline keeps the two apart: fetch_pages threads download raw bytes into a
+bounded queue, a ProcessPoolExecutor turns the bytes into plain row tuples, and the calling thread writes the results.
+Both queues are bounded so a slow stage holds the ones before it back instead of piling pages up in memory.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from .fetch import fetch_pages, HostRateLimiter, DEFAULT_CONCURRENCY, DEFAULT_RATE
+from .player_scrape import get_page, player_data_rows, table_rows, NFL
+from .schemas import frame_from_rows, SchemaMismatch
+from .metrics import get_metrics, collecting
+
+
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_CHUNK_ROWS = 5000
+_DONE = object()
+
+
+class StageStats:
+    """Item count, busy time, worst latency and queue depth for one stage. Thread safe"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.max_latency = 0.0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self.items += 1
+            self.errors += error
+            self.busy += seconds
+            self.max_latency = max(self.max_latency, seconds)
+
+    def sample_depth(self, depth):
+        with self._lock:
+            self.depth_samples += 1
+            self.depth_total += depth
+            self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self):
+        return {"items": self.items, "errors": self.errors,
+                "mean_latency_ms": 1000 * self.busy / self.items if self.items else 0.0,
+                "max_latency_ms": 1000 * self.max_latency,
+                "mean_queue_depth": self.depth_total / self.depth_samples if self.depth_samples else 0.0,
+                "max_queue_depth": self.max_depth}
+
+
+class PipelineStats:
+
+    def __init__(self):
+        self.fetch = StageStats("fetch")
+        self.parse = StageStats("parse")
+        self.write = StageStats("write")
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        items = self.write.items
+        return {"seconds": self.elapsed, "pages_per_sec": items / self.elapsed if self.elapsed else 0.0,
+                "fetch": self.fetch.as_dict(), "parse": self.parse.as_dict(), "write": self.write.as_dict()}
+
+
+class _InlineExecutor:
+    """Stands in for the process pool when processes=0, parses in the dispatcher thread. Handy for debugging"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+def parse_pool(processes=None):
+    """Executor for the parse stage. processes=None uses every core, 0 parses in-process"""
+    if processes == 0:
+        return _InlineExecutor()
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count())
+
+
+def _timed(parse, content, job, profile=((), "cprofile")):
+    # runs in the worker process, so the time is the parse itself and not time spent waiting in the queue. Whatever
+    # the parse records (i.e. parse_table_seconds) is collected here and shipped back to be merged in the writer
+    stages, profiler = profile
+    with collecting(stages, profiler) as metrics:
+        start = time.perf_counter()
+        with metrics.profiled("parse"):
+            result = parse(content, job)
+        seconds = time.perf_counter() - start
+    return result, seconds, metrics.snapshot()
+
+
+# Parse functions for the stat builders. Module level so the process pool can pickle them, and they only return plain
+# lists and strings: shipping a DataFrame back from a worker costs more than building it in the writer
+
+def parse_nfl_summary(content, job, position):
+    """Career summary row for an NFL player at position, in table_specs.summary_columns order (for WR that is
+    schemas.NFL_WR_SUMMARY_COLUMNS). job is a jobs.Job"""
+    return NFL(job.name, player_url=job.key, content=content).get_summary(position, job.data["HOF"])
+
+
+def parse_mlb_batting(content, job):
+    """(columns, rows) of a player's standard batting table with the name added as the last column, or
+    "Pitcher"/"Error" (see player_scrape.player_data_rows)"""
+    parsed = player_data_rows(content)
+    if isinstance(parsed, str):
+        return parsed
+    columns, rows = parsed
+    return _checked(columns + ["name"], [row + [job.name] for row in rows])
+
+
+def parse_mlb_tables(content, job, table_ids):
+    """{table id: (columns, rows)} for every one of table_ids on a baseball player's page, name added as the last
+    column. See player_scrape.table_rows"""
+    return {table_id: _checked(columns + ["name"], [row + [job.name] for row in rows])
+            for table_id, (columns, rows) in table_rows(content, table_ids).items()}
+
+
+def parse_nfl_seasons(content, job, position="WR"):
+    """(columns, rows) of an NFL player's season by season table for position, name added as the last column"""
+    player = NFL(job.name, player_url=job.key, content=content, position=position)
+    columns, rows = player.get_season_rows()
+    return _checked(columns + ["name"], [row + [player.name] for row in rows])
+
+
+def _checked(columns, rows):
+    # a row that doesn't line up with its columns (the table_specs extractors check rows against the page's header
+    # already). Raising makes it a failed job instead of a bad row that sinks the writer's whole flush
+    if any(len(row) != len(columns) for row in rows):
+        raise SchemaMismatch("rows don't match the {0} columns".format(len(columns)))
+    return columns, rows
+
+
+def iter_stat_chunks(jobs, parse, table_id, chunk_rows=DEFAULT_CHUNK_ROWS, concurrency=DEFAULT_CONCURRENCY,
+                     rate=DEFAULT_RATE, limiter=None, ttl=None, errors=None):
+    """Scrapes the (job, url) pairs and yields the parsed rows as typed DataFrames of about chunk_rows rows, so a
+    whole career stats export never holds more than one chunk (plus the pages being fetched) in memory.
+
+    parse is one of the (columns, rows) parse functions above. Pages are fetched concurrently but parsed in this
+    thread, use run_pipeline for parser processes. Jobs that fail to fetch or parse are skipped and appended to the
+    `errors` list if one is given.
+    """
+    metrics = get_metrics()
+    columns, buffered = None, []
+    for job, url, content, error in fetch_pages(jobs, concurrency=concurrency, rate=rate, limiter=limiter, ttl=ttl):
+        if error is None:
+            try:
+                with metrics.stage("parse"):
+                    parsed = parse(content, job)
+                if not isinstance(parsed, str):
+                    _checked(*parsed)
+            except Exception as e:
+                error = e
+                metrics.error("parse", e)
+        else:
+            metrics.error("fetch", error)
+        if error is not None or isinstance(parsed, str):  # a str is i.e. "Pitcher" from parse_mlb_batting
+            if errors is not None:
+                errors.append((job, error if error is not None else parsed))
+            continue
+
+        page_columns, rows = parsed
+        if columns is not None and page_columns != columns and buffered:
+            yield frame_from_rows(buffered, columns, table_id)  # a chunk can only have one set of columns
+            buffered = []
+        columns = page_columns
+        buffered.extend(rows)
+        if len(buffered) >= chunk_rows:
+            yield frame_from_rows(buffered, columns, table_id)
+            buffered = []
+
+    if buffered:
+        yield frame_from_rows(buffered, columns, table_id)
+
+
+def run_pipeline(jobs, parse, on_result, on_error, executor=None, processes=None, concurrency=DEFAULT_CONCURRENCY,
+                 rate=DEFAULT_RATE, limiter=None, ttl=None, queue_size=DEFAULT_QUEUE_SIZE, fetch=get_page):
+    """Fetches, parses and writes every job. Returns a PipelineStats.
+
+    ---Arguments---
+
+    -jobs:          iterable of (job, url). job is handed to parse and to the callbacks, so it has to be picklable
+    -parse:         parse(content, job) run in a worker process. Has to be a module level function (or a
+                    functools.partial of one) and should return something small like a list of row tuples
+    -on_result:     on_result(job, result) called in this thread for every parsed page. The only place writes happen
+    -on_error:      on_error(job, exception) called in this thread when the fetch or the parse failed
+    -executor:      executor to parse with, so one pool can be reused across calls. Otherwise one is made from
+                    `processes` (see parse_pool) and shut down at the end
+    -concurrency:   fetch threads
+    -rate:          requests per second per host, see fetch.fetch_pages. Ignored if limiter is given
+    -ttl:           page cache ttl function, see fetch.fetch_pages
+    -queue_size:    bound on both the fetched-page queue and the number of pages being parsed at once
+
+    Besides the PipelineStats, every stage records into metrics.get_metrics(): stage_seconds for fetch, parse and
+    write, errors_total by stage and cause, and whatever the parse function records in the worker
+    """
+    stats = PipelineStats()
+    metrics = get_metrics()
+    profile = (tuple(metrics.profile_stages), metrics.profiler)
+    fetched = queue.Queue(maxsize=queue_size)
+    parsed = queue.Queue(maxsize=queue_size)
+    in_flight = threading.BoundedSemaphore(queue_size)
+    stopping = threading.Event()  # set when the writer fails, the other stages wind down without doing more work
+    limiter = limiter or HostRateLimiter(rate)
+    own_executor = executor is None
+    executor = parse_pool(processes) if own_executor else executor
+
+    def timed_fetch(url, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fetch(url, **kwargs)  # fetch_pages times it into the metrics
+        finally:
+            stats.fetch.record(time.perf_counter() - start)
+
+    def fetcher():
+        try:
+            for job, url, content, error in fetch_pages(jobs, concurrency=concurrency, limiter=limiter,
+                                                        fetch=timed_fetch, ttl=ttl):
+                if stopping.is_set():
+                    break
+                fetched.put((job, content, error))
+                stats.fetch.sample_depth(fetched.qsize())
+                metrics.inc("pages_total")
+        except Exception as e:  # i.e. the jobs iterable itself blew up, the writer re-raises it
+            parsed.put((None, None, e))
+        finally:
+            fetched.put(_DONE)
+
+    def dispatcher():
+        pending = []
+
+        def parsed_callback(future, job):
+            error = future.exception()
+            if error is None:
+                result, seconds, snapshot = future.result()
+                stats.parse.record(seconds)
+                metrics.observe("stage_seconds", seconds, stage="parse")
+                metrics.merge(snapshot)
+            else:
+                result = None
+                stats.parse.record(0.0, error=True)
+                metrics.error("parse", error)
+            parsed.put((job, result, error))
+            stats.parse.sample_depth(parsed.qsize())
+            in_flight.release()
+
+        while True:
+            item = fetched.get()
+            if item is _DONE:
+                break
+            job, content, error = item
+            if stopping.is_set():
+                continue
+            if error is not None:
+                metrics.error("fetch", error)
+                parsed.put((job, None, error))
+                continue
+            in_flight.acquire()  # backpressure: no more than queue_size pages waiting on a parser
+            future = executor.submit(_timed, parse, content, job, profile)
+            future.add_done_callback(lambda f, job=job: parsed_callback(f, job))
+            pending.append(future)
+            pending = [f for f in pending if not f.done()]
+
+        for future in pending:
+            future.exception()  # wait for the stragglers, their callbacks put them on the queue
+        parsed.put(_DONE)
+
+    threads = [threading.Thread(target=fetcher, daemon=True), threading.Thread(target=dispatcher, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = parsed.get()
+            if item is _DONE:
+                break
+            job, result, error = item
+            if job is None:
+                raise error
+            start = time.perf_counter()
+            with metrics.stage("write"):
+                if error is None:
+                    on_result(job, result)
+                else:
+                    on_error(job, error)
+            stats.write.record(time.perf_counter() - start, error=error is not None)
+    except BaseException:
+        stopping.set()
+        while parsed.get() is not _DONE:  # unblock the other stages so they can finish
+            pass
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        if own_executor:
+            executor.shutdown()
+        stats.elapsed = time.perf_counter() - stats.started
+
+    return stats
@@ -0,0 +1,244 @@
+"""Player name -> page url, from the roster instead of guessed from the name.
+
+player_url used to build a baseball-reference url out of the first five letters of the last name, the first two of
+the first name and "01". That fetches the wrong page for the second player with a name (namesakes, fathers and sons)
+and a 404 for names the site shortens differently (hyphens, apostrophes, Jr.). PlayerIndex is built from the roster
+letter pages, or the roster table already made from them, and knows every player's real HREF.
+
+Names are matched after normalize_name (accents, case, punctuation and Jr./Sr./II dropped), so "Ken Griffey Jr."
+and "ken griffey" both find the two Ken Griffeys. When a name has more than one player, resolve() narrows it down
+with the years given or the Jr./Sr. in the name, and raises AmbiguousPlayer otherwise rather than picking one.
+
+    index = load_index("Databases/MLB.db", sport="baseball")   # also makes it player_url's index for baseball
+    index.url("Ken Griffey Jr.")                               # .../players/g/griffke02.shtml
+    index.search("griff")                                      # prefix and then fuzzy matches
+"""
+import bisect
+import difflib
+import json
+import re
+import unicodedata
+from collections import namedtuple, Counter
+
+
+SITES = {"baseball": "https://www.baseball-reference.com", "football": "https://www.pro-football-reference.com"}
+ROSTER_TABLES = {"baseball": "all_players_table", "football": "all_nfl_players_table"}
+
+FUZZY_CANDIDATES = 200  # names with the most trigrams in common with a query that difflib then ranks
+
+IndexEntry = namedtuple("IndexEntry", ["name", "first_year", "last_year", "hof", "href", "position"])
+
+# suffixes that aren't part of the name on the letter pages. Junior-ish ones point at the later career of two
+_JUNIOR = {"jr", "ii", "iii", "iv", "v"}
+_SENIOR = {"sr"}
+_punctuation = re.compile(r"[.'`’,]")
+_separators = re.compile(r"[-\s]+")
+
+
+class UnknownPlayer(LookupError):
+    """No player with that name. `suggestions` has the closest names there are"""
+    cause = "unknown_player"  # see metrics.error_cause
+
+    def __init__(self, name, suggestions=()):
+        super().__init__("no player named {0!r}{1}".format(
+            name, ", did you mean {0}?".format(" or ".join(map(repr, suggestions))) if suggestions else ""))
+        self.suggestions = list(suggestions)
+
+
+class AmbiguousPlayer(LookupError):
+    """More than one player with that name. `candidates` are their IndexEntries, pass a year to pick one"""
+    cause = "ambiguous_player"
+
+    def __init__(self, name, candidates):
+        super().__init__("{0} players named {1!r}: {2}".format(len(candidates), name, ", ".join(
+            "{0} ({1}-{2})".format(entry.href, entry.first_year, entry.last_year) for entry in candidates)))
+        self.candidates = list(candidates)
+
+
+def _words(name):
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).lower()
+    return _separators.sub(" ", _punctuation.sub("", name)).split()
+
+
+def normalize_name(name):
+    """Lower case, no accents, punctuation or Jr./Sr./II suffix and single spaces. "José Peña Jr." -> "jose pena",
+    "Karim Abdul-Jabbar" -> "karim abdul jabbar", "D.J. Moore" -> "dj moore\""""
+    words = _words(name)
+    while len(words) > 1 and words[-1] in _JUNIOR | _SENIOR:
+        words.pop()
+    return " ".join(words)
+
+
+def _suffix(name):
+    words = _words(name)
+    return words[-1] if len(words) > 1 and words[-1] in _JUNIOR | _SENIOR else None
+
+
+def _trigrams(key):
+    padded = "  " + key + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _last_first(key):
+    first, _, rest = key.partition(" ")
+    return rest + " " + first if rest else first
+
+
+class PlayerIndex:
+    """In memory index of one sport's roster: normalized name -> entries, plus sorted keys (first last and
+    last first) for prefix lookups. Build it with from_records / from_roster / from_letter_pages, or load() one
+    saved with save().
+    """
+
+    def __init__(self, entries, sport="baseball"):
+        self.sport = sport
+        self.entries = list(entries)
+        self._names = {}
+        for i, entry in enumerate(self.entries):
+            self._names.setdefault(normalize_name(entry.name), []).append(i)
+        self._keys = sorted(self._names)
+        self._last_keys = sorted((_last_first(key), key) for key in self._names)
+        # fuzzy matching only runs difflib on the names sharing the most trigrams with the query
+        self._trigrams = {}
+        for key in self._keys:
+            for trigram in _trigrams(key):
+                self._trigrams.setdefault(trigram, []).append(key)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self._names
+
+    @classmethod
+    def from_records(cls, records, sport="baseball"):
+        """From roster_parser.RosterRecords, i.e. iter_roster over the letter pages"""
+        return cls((IndexEntry(r.name, r.first_year, r.last_year, r.hof, r.href, r.position) for r in records
+                    if r.href), sport)
+
+    @classmethod
+    def from_roster(cls, abs_path, sport="baseball", table=None):
+        """From the roster table in the database (see players_list.refresh_roster), which is the on-disk copy of the
+        letter pages. Rows without an HREF (rosters from before it was stored) are left out"""
+        from .sessions import get_database
+        table = table or ROSTER_TABLES[sport]
+        with get_database(abs_path).connection() as connection:
+            columns = {row[1] for row in connection.execute('PRAGMA table_info("{0}")'.format(table))}
+            position = '"Position"' if "Position" in columns else "''"
+            rows = connection.execute('SELECT "Name", "First", "Last", "HOF", "HREF", {0} FROM "{1}" WHERE "HREF" IS '
+                                      'NOT NULL'.format(position, table)).fetchall()
+        return cls((IndexEntry(*row) for row in rows), sport)
+
+    @classmethod
+    def from_letter_pages(cls, sport="baseball", letters=None, rate=None):
+        """Downloads the letter pages (through the page cache if it is on) and indexes every player on them"""
+        from .fetch import fetch_pages, DEFAULT_RATE
+        from .roster_parser import iter_roster
+        letters = letters or "abcdefghijklmnopqrstuvwxyz"
+        letters = [letter.upper() if sport == "football" else letter.lower() for letter in letters]
+        records = []
+        jobs = ((letter, SITES[sport] + "/players/{0}/".format(letter)) for letter in letters)
+        for letter, url, content, error in fetch_pages(jobs, rate=rate or DEFAULT_RATE):
+            if error is not None:
+                raise error
+            records.extend(iter_roster(content, sport=sport))
+        return cls.from_records(records, sport)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"sport": self.sport, "entries": self.entries}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls((IndexEntry(*entry) for entry in data["entries"]), data["sport"])
+
+    def lookup(self, name):
+        """Every entry with that name, [] if there are none"""
+        return [self.entries[i] for i in self._names.get(normalize_name(name), ())]
+
+    def resolve(self, name, year=None, first_year=None, last_year=None):
+        """The one IndexEntry for name. year keeps players active that season, first_year/last_year players whose
+        career started/ended then. Without them a Jr./Sr. in the name picks the later/earlier career of two. Raises
+        UnknownPlayer or AmbiguousPlayer"""
+        candidates = self.lookup(name)
+        if not candidates:
+            raise UnknownPlayer(name, [entry.name for entry in self.search(name, limit=3)])
+        if year is not None:
+            candidates = [e for e in candidates if (e.first_year or 0) <= year <= (e.last_year or e.first_year or 0)]
+        if first_year is not None:
+            candidates = [e for e in candidates if e.first_year == first_year]
+        if last_year is not None:
+            candidates = [e for e in candidates if e.last_year == last_year]
+        if len(candidates) > 1:
+            suffix = _suffix(name)
+            by_debut = sorted(candidates, key=lambda e: e.first_year or 0)
+            if suffix in _JUNIOR and len(candidates) == 2:
+                candidates = by_debut[1:]
+            elif suffix in _SENIOR and len(candidates) == 2:
+                candidates = by_debut[:1]
+        if not candidates:
+            raise UnknownPlayer(name)
+        if len(candidates) > 1:
+            raise AmbiguousPlayer(name, candidates)
+        return candidates[0]
+
+    def url(self, name, **years):
+        """Full url of the player's page, see resolve"""
+        return SITES[self.sport] + self.resolve(name, **years).href
+
+    def search(self, text, limit=10, cutoff=0.75):
+        """Entries whose name starts with text (first or last name first), then the closest names by difflib
+        similarity, at most limit of them"""
+        key = normalize_name(text)
+        if not key:
+            return []
+        found = []
+        for keys, pick in ((self._keys, lambda k: k), (self._last_keys, lambda k: k[1])):
+            start = bisect.bisect_left(keys, key if keys is self._keys else (key,))
+            for i in range(start, len(keys)):
+                current = keys[i] if keys is self._keys else keys[i][0]
+                if not current.startswith(key) or len(found) >= limit:
+                    break
+                if pick(keys[i]) not in found:
+                    found.append(pick(keys[i]))
+        if len(found) < limit:
+            shared = Counter(candidate for trigram in _trigrams(key) for candidate in self._trigrams.get(trigram, ()))
+            candidates = [candidate for candidate, _ in shared.most_common(FUZZY_CANDIDATES)]
+            for close in difflib.get_close_matches(key, candidates, n=limit, cutoff=cutoff):
+                if close not in found and len(found) < limit:
+                    found.append(close)
+        return [self.entries[i] for key in found for i in self._names[key]][:limit]
+
+
+_indexes = {}
+_roster_indexes = {}
+
+
+def set_index(index):
+    """Makes index the one player_scrape.player_url resolves names with for its sport. None for a sport name
+    clears it"""
+    if isinstance(index, str):
+        _indexes.pop(index, None)
+    else:
+        _indexes[index.sport] = index
+
+
+def get_index(sport):
+    return _indexes.get(sport)
+
+
+def load_index(abs_path, sport="baseball", table=None):
+    """PlayerIndex.from_roster, kept in memory until the roster table changes (read_from_db.table_version, which
+    leaves the roster as it is), and made the sport's index for player_url"""
+    from .read_from_db import table_version
+    table = table or ROSTER_TABLES[sport]
+    version = table_version(abs_path, table)
+    key = (abs_path, table)
+    if key not in _roster_indexes or _roster_indexes[key][0] != version:
+        _roster_indexes[key] = (version, PlayerIndex.from_roster(abs_path, sport, table))
+    index = _roster_indexes[key][1]
+    set_index(index)
+    return index
@@ -1,77 +1,149 @@
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from abc import ABC
+from abc import ABC, abstractmethod
+from array import array
+from urllib.parse import urlsplit
 
+from .table_extract import first_table_id, find_tables, MissingTable
+from .table_specs import get_spec, extract_rows, any_table, SUMMARY
+from .schemas import frame_from_rows, coerce_frame
+from .transport import get_transport
+from .player_index import get_index, SITES
 
 
-def to_numeric(df):
-    """This should be split up so that it can take column names as arguments to make it more pythonic. Will most likely
-    make this a static method of the Athlete class at some point."""
-    columns = list(df.columns)
-    columns_to_numeric = columns[0:-2]
-    final_cols = columns_to_numeric[0:2]+columns_to_numeric[4:]
-    df[final_cols] = df[final_cols].apply(pd.to_numeric)
-    return df
 
+def to_numeric(df, table_id="batting_standard"):
+    """Converts a DataFrame of scraped strings to the column types declared for the table in schemas.TABLE_DTYPES.
+    Blank cells and things like "12.3%" no longer make it fail. New code should build the frame with
+    schemas.frame_from_rows instead so the strings are never stored in the first place."""
+    return coerce_frame(df, table_id)
 
-def get_soup(url):
 
-    """This function is just to reduce redundancy. It gets the soup with html parser functionality for a given url"""
-    website = requests.get(url)
-    content = website.content
-    soup = BeautifulSoup(content,features="html.parser")
-    return soup
+_cache = None
 
 
-class Athlete(ABC):
+def enable_cache(directory, **kwargs):
+    """Puts a cache.ResponseCache in front of every page download (get_page/get_soup and the roster letter pages).
+    Extra keyword arguments are passed to ResponseCache. Returns the cache so its stats() can be checked"""
+    global _cache
+    from .cache import ResponseCache
+    _cache = ResponseCache(directory, **kwargs)
+    return _cache
+
+
+def disable_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
 
-    def __init__(self, name, suffix):
-        if suffix != "01":  # Used to identify multiple players with the same name in the url
-            self.name = name + " " + suffix
-        else:
-            self.name = name
-        self.suffix = suffix
-        self.first_name = name.split(" ")[0]
-        self.last_name = name.split(" ")[1]
 
-    def get_table(self, soup, table_id, num_columns, classes=[], outer_level=0):
-        """Core functionality for all child classes. This function will the only web scraping funciton that will be
-        called automatically at the creation of each instance of the child classes.
+_redirect = None
 
-        It will be used to find the annual career statistics for each player and will return it in thw form of a pandas
-        DataFrame.
 
-        ---Arguments---
+def redirect_to(base_url):
+    """Sends every download to base_url instead of the real sites, with the site's host as the first part of the
+    path: https://www.pro-football-reference.com/players/A/ is fetched from base_url/www.pro-football-reference.com
+    /players/A/. That is how benchmarks.corpus lays out recorded pages and how benchmarks.standin serves them. None
+    goes back to the real sites"""
+    global _redirect
+    _redirect = base_url.rstrip("/") if base_url else None
 
-        -soup:          bs4 instance. un-parsed html from each player's web page
-        -table_id:      String variable. This will identify the type of table to grab based on the position each athlete
-                        plays in their respective sport
-        -num_columns:   specifies the number of columns each table will have based on the type of player and data table
-        -classes:       List variable. Some tables have different 'tr' classes based on mahor and minor leagues. This will
-                        specify which one should be grabbed.
-        """
-        table = soup.find('table', attrs={"id": table_id})
 
-        # Finds the "Career Statistics" Table
-        columns = table.find_all('th')
+def _redirected(url):
+    if _redirect is None:
+        return url
+    parts = urlsplit(url)
+    return "{0}/{1}{2}".format(_redirect, parts.netloc, parts.path + ("?" + parts.query if parts.query else ""))
 
-        all_headings = []
-        for entry in columns:
-            all_headings.append(entry.get_text())  # Gets the heading for each column
-            # Will be used to create the dataframe
 
-        column_headings = all_headings[outer_level:num_columns]
+def is_cached(url):
+    """True if the page can be served from the cache without any network I/O"""
+    return _cache is not None and _cache.is_fresh(_redirected(url))
 
-        majors_table_rows = table.find_all('tr',  attrs={"class": classes})
-        # selects the rows of the table
 
-        row_data = []
-        for tr in majors_table_rows:    # gets the data from each tr, essentially getting the stats for each year. Only gets major league data right now
-            row = [td.get_text() for td in tr]  # creates a list of each data entry in the given table row
-            row_data.append(row)
+def get_page(url, ttl=None):
+    """Downloads the raw html for a given url. Kept separate from get_soup so the fetching can be done ahead of time
+    (i.e. concurrently by fetch.fetch_pages) and the parsing done later. If the cache is enabled the page comes from
+    there when possible, `ttl` overrides how long it is kept. Downloads go through transport.get_transport(), so a
+    throttled or missing page raises transport.HTTPStatusError instead of being returned"""
+    url = _redirected(url)
+    if _cache is not None:
+        return _cache.get(url, ttl=ttl)
+    return get_transport().get(url)
 
-        pd_table = pd.DataFrame(row_data, columns=column_headings)
+
+def get_soup(url, content=None):
+
+    """This function is just to reduce redundancy. It gets the soup with html parser functionality for a given url.
+    If the page has already been downloaded its content can be passed in and no request is made"""
+    if content is None:
+        content = get_page(url)
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content,features="html.parser")
+    return soup
+
+
+class Athlete(ABC):
+    """Making one does no I/O. The page is downloaded the first time content (or a stat read from it) is asked for,
+    and once the stats are read out of it release() drops the page and any soup built from it, so a long list of
+    players only holds their stats. __slots__ keep each object down to the attributes it has. For thousands of
+    players at once use from_roster"""
+    __slots__ = ("name", "suffix", "first_name", "last_name", "url", "init_stats", "_content", "_soup")
+    sport = None
+
+    def __init__(self, name, suffix, content=None):
+        if suffix != "01":  # Used to identify multiple players with the same name in the url
+            self.name = name + " " + suffix
+        else:
+            self.name = name
+        self.suffix = suffix
+        self.first_name = name.split(" ")[0]
+        self.last_name = name.split(" ")[1]
+        self._content = content  # raw html of the player's page, tables are pulled out of it with table_extract
+        self._soup = None
+
+    @property
+    def content(self):
+        """Raw html of the player's page, downloaded the first time it is needed"""
+        if self._content is None:
+            self._content = get_page(self.url)
+        return self._content
+
+    @content.setter
+    def content(self, content):
+        self._content = content
+        self._soup = None
+
+    @property
+    def soup(self):
+        """Full BeautifulSoup tree of the page. Only built if something asks for it, the stat methods parse just the
+        table they need out of self.content"""
+        if self._soup is None:
+            self._soup = get_soup(self.url, content=self.content)
+        return self._soup
+
+    def release(self):
+        """Drops the page and its soup. Stats already read are kept, anything read from the page after this
+        downloads it again (from the page cache if it is on)"""
+        self._content = None
+        self._soup = None
+
+    @classmethod
+    def from_roster(cls, rows):
+        """An AthleteBatch of the players in rows: roster_parser.RosterRecords, player_index.IndexEntries or a
+        DataFrame of a roster table (Name, First, Last, HOF, HREF and Position columns)"""
+        return AthleteBatch.from_rows(cls, rows)
+
+    @classmethod
+    @abstractmethod
+    def from_href(cls, name, href, hof="No", position=""):
+        """One player from their roster entry, see AthleteBatch"""
+
+    def get_table(self, spec):
+        """Core functionality for all child classes. Returns the rows a table_specs.TableSpec picks out of the
+        player's page as a typed DataFrame (see schemas.TABLE_DTYPES) with the player's name as the last column"""
+        column_headings, row_data = self.get_table_rows(spec)
+
+        pd_table = frame_from_rows(row_data, column_headings, spec.name)  # typed columns, see schemas.TABLE_DTYPES
 
 
         names_list = [self.name]*len(row_data)
@@ -79,68 +151,118 @@ class Athlete(ABC):
 
         return pd_table
 
-    def get_column_headings(self, cols, num_columns): #Gets the column heading from the columsn and the number of columns we want
-        all_headings = []
-        for entry in cols:
-            all_headings.append(entry.get_text())  # Gets the heading for each column
-            # Will be used to create the dataframe
-
-        df_columns = all_headings[:num_columns]
-        return df_columns
+    def get_table_rows(self, spec):
+        """The scraping half of get_table: returns (column headings, rows of cell strings) without building a
+        DataFrame, for callers that stream rows somewhere else (see pipeline.iter_stat_chunks)"""
+        return extract_rows(self.content, spec)
 
 
 class MLB(Athlete):
-
-    def __init__(self, name, init_stats=False, suffix="01"):
+    """init_stats=True downloads the page and reads the player's first table (batting or pitching) into
+    career_stats. tables, a list of table ids (i.e. MLB_TABLES), also reads those from the same download into
+    self.tables, so a two way player's batting and pitching come from one visit
+
+    The page is `url` if given, otherwise the baseball player index's (player_index.load_index, year picks between
+    namesakes), looked up the first time the url is needed. It is guessed from the name and suffix if a suffix is
+    passed, no index is loaded or the index can't tell which player it is
+
+    Nothing is downloaded until career_stats, tables or id is first used, init_stats only stays for older callers.
+    All of them are read from the one download, which is then released"""
+    __slots__ = ("url_last_name", "url_first_name", "_base_url", "_url", "_year", "_table_ids", "_tables", "_id",
+                 "_career_stats")
+    positions = {"batting_standard": "batter", "pitching_standard": "pitcher"}  # table_specs position by first table
+    sport = "baseball"
+
+    def __init__(self, name, init_stats=False, suffix="01", tables=None, url=None, year=None):
         super(MLB, self).__init__(name, suffix)
         self.url_last_name = self.last_name[0:5].lower() if len(self.last_name) >= 5 else self.last_name.lower()
         self.url_first_name = self.first_name[0:2].lower()
         self._base_url = "https://www.baseball-reference.com/players/{0}/{1}{2}.shtml"
-        self.url = "https://www.baseball-reference.com/players/{0}/{1}{2}.shtml".format(
-                    self.url_last_name[0], self.url_last_name + self.url_first_name, self.suffix)
+        self._url = url
+        self._year = year
         self.init_stats = init_stats
-
-        if self.init_stats:
-
-            self.soup = get_soup(self.url)
-
-            if self.soup.find_all('table')[0].get('id') == "batting_standard":
-                self.id = "batting_standard"
-                self.num_columns = 30
-                self.career_stats = self.get_hitting()
-
-            if self.soup.find_all('table')[0].get('id') == "pitching_standard":
-                self.id = "pitching_standard"
-                self.num_columns = 35
-                self.career_stats = self.get_pitching()
-
+        self._table_ids = tables
+        self._tables = None  # None until _load has run
+        self._id = None
+        self._career_stats = None
+
+    @property
+    def url(self):
+        if self._url is None:
+            index = get_index("baseball") if self.suffix == "01" else None
+            try:
+                self._url = index.url(self.name, year=self._year) if index is not None else None
+            except LookupError:  # player_index.UnknownPlayer or AmbiguousPlayer, the guess is all there is
+                pass
+            self._url = self._url or self._base_url.format(self.url_last_name[0],
+                                                           self.url_last_name + self.url_first_name, self.suffix)
+        return self._url
+
+    @url.setter
+    def url(self, url):
+        self._url = url
+
+    @classmethod
+    def from_href(cls, name, href, hof="No", position=""):
+        return cls(name, url=SITES[cls.sport] + href)
+
+    def _load(self):
+        content = self.content
+        tables = {}
+        if self._table_ids:
+            tables = {table_id: frame_from_rows(rows, columns, table_id)
+                      for table_id, (columns, rows) in table_rows(content, self._table_ids).items()}
+        first_table = first_table_id(content)
+
+        if first_table == "batting_standard":
+            self._id = "batting_standard"
+            self._career_stats = self.get_hitting()
+
+        if first_table == "pitching_standard":
+            self._id = "pitching_standard"
+            self._career_stats = self.get_pitching()
+
+        self._tables = tables
+        self.release()
+
+    @property
+    def tables(self):
+        """{table id: DataFrame} for the table ids passed in, the ones the page has"""
+        if self._tables is None:
+            self._load()
+        return self._tables
+
+    @property
+    def id(self):
+        """Id of the player's first table, batting_standard or pitching_standard"""
+        if self._tables is None:
+            self._load()
+        return self._id
+
+    @property
+    def career_stats(self):
+        if self._tables is None:
+            self._load()
+        return self._career_stats
 
     def get_hitting(self):
-        return self.get_table(self.soup, "batting_standard", self.num_columns, classes=["full", ""])
+        return self.get_table(get_spec("baseball", "batter"))
 
     def get_pitching(self):
-        return self.get_table(self.soup, "pitching_standard", self.num_columns, classes=["full", ""])
+        return self.get_table(get_spec("baseball", "pitcher"))
 
     def get_summary(self):
-        table = self.soup.find('table', attrs={"id": self.id})
-        # Finds the "Career Statistics" Table
-        columns = table.find_all('th')
-
-        all_headings = []
-        for entry in columns:
-            all_headings.append(entry.get_text())  # Gets the heading for each column
-            # Will be used to create the dataframe
-
-        column_headings = ["Summary"] + all_headings[4:self.num_columns]
+        """The tfoot rows of the player's first table (career totals, 162 game average and so on), the first column
+        being which one it is. Raises table_extract.MissingTable if that is neither batting nor pitching"""
+        # the table id comes from the same download as the rows. Going through self.id would run _load, which
+        # releases the page, and the rows would then need a second download
+        content = self.content
+        table_id = self._id if self._tables is not None else first_table_id(content)
+        if table_id not in MLB.positions:
+            raise MissingTable("batting_standard or pitching_standard (first table: {0})".format(table_id))
+        column_headings, row_data = extract_rows(content, get_spec("baseball", MLB.positions[table_id], SUMMARY))
 
-        majors_table_rows = table.find('tfoot').find_all('tr')
-
-        row_data = []
-        for tr in majors_table_rows:    # gets the data from each tr, essentially getting the stats for each year. Only gets major league data right now
-            row = [td.get_text() for td in tr]  # creates a list of each data entry in the given table row
-            row_data.append(row)
-
-        pd_table = pd.DataFrame(row_data, columns=column_headings)
+        pd_table = frame_from_rows(row_data, column_headings, table_id)
 
 
         names_list = [self.name]*len(row_data)
@@ -152,51 +274,177 @@ class MLB(Athlete):
 
 
 class NFL(Athlete):
-    """Not active"""
-    table_names = {"WR": "receiving_and_rushing"}
-
-    def __init__(self, name, init_stats=False, suffix="01", player_url="", ):
-        super(NFL, self).__init__(name, suffix)
+    """Nothing is downloaded until career_stats or career_summary is first used (content can be passed in when the
+    page was already fetched, i.e. by fetch.fetch_pages). Both come out of the one download, which is then
+    released. init_stats only stays for older callers"""
+    __slots__ = ("url_last_name", "_base_url", "id", "position", "hof", "_career_stats", "_career_summary")
+    sport = "football"
+    base_url = "https://www.pro-football-reference.com"
+
+    def __init__(self, name, init_stats=False, suffix="01", player_url="", content=None, position="WR", hof="No"):
+        super(NFL, self).__init__(name, suffix, content=content)
         self.url_last_name = self.last_name[0].upper() + self.last_name[1:4].lower() if len(self.last_name) >= 5 \
             else self.last_name[0].upper()+ self.last_name[1:].lower()
 
-        self._base_url = "https://www.pro-football-reference.com"
+        self._base_url = NFL.base_url
         self.url = self._base_url.format(self.url_last_name[0]) + player_url
-        self.num_columns = 26
         self.init_stats = init_stats
-        self.soup = get_soup(self.url)
+        self.id = "receiver"
+        self.position = position
+        self.hof = hof
+        self._career_stats = None
+        self._career_summary = None
+
+    @classmethod
+    def from_href(cls, name, href, hof="No", position=""):
+        return cls(name, player_url=href, hof=hof, position=position or "WR")
+
+    def _load(self):
+        self._career_stats = self.get_season_stats()
+        self._career_summary = self.get_summary(self.position, self.hof)
+        self.release()
+
+    @property
+    def career_stats(self):
+        """Season by season receiving table as a DataFrame"""
+        if self._career_stats is None:
+            self._load()
+        return self._career_stats
+
+    @property
+    def career_summary(self):
+        """Career totals row, see get_summary"""
+        if self._career_summary is None:
+            self._load()
+        return self._career_summary
 
-        if self.init_stats:
+    def get_summary(self, position, HOF):
+        """Career row of the position's table (table_specs.get_spec("football", position, "summary")) followed by the
+        name and HOF, in schemas.TABLE_DTYPES["nfl_<position>_summary"] order"""
+        column_headings, row_data = extract_rows(self.content, get_spec("football", position, SUMMARY))
+        final_row = row_data[0] + [self.name] + [HOF]
 
-            self.id = "receiver"
-            self.career_stats = self.get_receiver_stats()
-            self.career_summary = self.get_summary(self.id)
+        return final_row
 
-    def get_summary(self, position, HOF):
-        table = self.soup.find('table', attrs={"id": NFL.table_names[position]})
+    def get_season_stats(self):
+        """Season by season table for the player's position as a DataFrame"""
+        return self.get_table(get_spec("football", self.position))
 
-        # Finds the "Career Statistics" Table
-        columns = table.find_all('th')
+    def get_season_rows(self):
+        return self.get_table_rows(get_spec("football", self.position))
 
-        all_headings = []
-        for entry in columns:
-            all_headings.append(entry.get_text())  # Gets the heading for each column
-            # Will be used to create the dataframe
+    # the WR table was the only one there was at first
+    get_receiver_stats = get_season_stats
+    get_receiver_rows = get_season_rows
 
-        column_headings = all_headings[9:21]
-        majors_table_rows = table.find('tfoot').find_all('tr')
 
-        row_data = []
-        for tr in majors_table_rows:   # gets the data from each tr, essentially getting the stats for each year. Only gets major league data right now
-            row = [td.get_text() for td in tr]  # creates a list of each data entry in the given table row
-            row_data.append(row)
+def _pack(strings):
+    # one str plus the offset each one ends at, instead of a str object (49+ bytes of overhead) per value
+    ends, total, parts = array("L"), 0, []
+    for string in strings:
+        string = "" if string is None or string != string else str(string)  # None and NaN are stored as ""
+        parts.append(string)
+        total += len(string)
+        ends.append(total)
+    return "".join(parts), ends
 
-        final_row = row_data[0][5:17] + [self.name] + [HOF]
 
-        return final_row
+def _year(value):
+    return 0 if value is None or value != value else int(value)
+
+
+class AthleteBatch:
+    """A whole roster or position group in a handful of flat arrays rather than an object per player, which is what
+    Athlete.from_roster returns. Names and HREFs are each joined into one string with an array of offsets, years
+    are array("h"), HOF a bytearray and positions one byte codes into `positions`. The whole NFL roster takes about
+    60 bytes a player this way, text included, against about 100 as RosterRecords and 440 as NFL objects (see
+    benchmarks/bench_athletes.py).
+
+    batch[i] (and iterating) makes that player's Athlete on the spot, which doesn't download anything until its
+    stats are used, so only the players being worked on exist as objects. record(i) gives the roster entry back
+    as a roster_parser.RosterRecord, and jobs() (href, url) pairs for fetch.fetch_pages.
+
+    ---Arguments---
+
+    -athlete:       Athlete subclass the players are, i.e. NFL
+    -names, hrefs, first_years, last_years, hofs, positions:    one sequence per field, in the same player order
+    """
+    __slots__ = ("athlete", "_names", "_name_ends", "_hrefs", "_href_ends", "first_years", "last_years", "_hof",
+                 "positions", "_position_codes")
+
+    def __init__(self, athlete, names, hrefs, first_years, last_years, hofs, positions):
+        self.athlete = athlete
+        self._names, self._name_ends = _pack(names)
+        self._hrefs, self._href_ends = _pack(hrefs)
+        self.first_years = array("h", map(_year, first_years))
+        self.last_years = array("h", map(_year, last_years))
+        self._hof = bytearray(hof == "Yes" for hof in hofs)
+        positions = ["" if position is None or position != position else position for position in positions]
+        self.positions = sorted(set(positions))
+        codes = {position: i for i, position in enumerate(self.positions)}
+        self._position_codes = array("B" if len(codes) < 256 else "H", (codes[position] for position in positions))
+
+    @classmethod
+    def from_rows(cls, athlete, rows):
+        """See Athlete.from_roster"""
+        if hasattr(rows, "columns"):  # a roster table DataFrame
+            blank = [None] * len(rows)
+            column = lambda name: rows[name].tolist() if name in rows.columns else blank
+            return cls(athlete, column("Name"), column("HREF"), column("First"), column("Last"), column("HOF"),
+                       column("Position"))
+        names, hrefs, first_years, last_years, hofs, positions = [], [], [], [], [], []
+        for row in rows:
+            names.append(row.name)
+            hrefs.append(row.href)
+            first_years.append(row.first_year)
+            last_years.append(row.last_year)
+            hofs.append(row.hof)
+            positions.append(row.position)
+        return cls(athlete, names, hrefs, first_years, last_years, hofs, positions)
+
+    def __len__(self):
+        return len(self._name_ends)
+
+    def _text(self, packed, ends, i):
+        return packed[ends[i - 1] if i else 0:ends[i]]
+
+    def name(self, i):
+        return self._text(self._names, self._name_ends, i)
+
+    def href(self, i):
+        return self._text(self._hrefs, self._href_ends, i)
+
+    def url(self, i):
+        return SITES[self.athlete.sport] + self.href(i)
+
+    def hof(self, i):
+        return "Yes" if self._hof[i] else "No"
+
+    def position(self, i):
+        return self.positions[self._position_codes[i]]
+
+    def record(self, i):
+        """The player's roster entry as a roster_parser.RosterRecord, None for years that weren't known"""
+        from .roster_parser import RosterRecord
+        return RosterRecord(self.name(i), self.position(i), self.first_years[i] or None, self.last_years[i] or None,
+                            self.hof(i), self.href(i))
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.athlete.from_href(self.name(i), self.href(i), hof=self.hof(i), position=self.position(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def jobs(self):
+        """(href, url) for every player, the form fetch.fetch_pages takes"""
+        for i in range(len(self)):
+            yield self.href(i), self.url(i)
 
-    def get_receiver_stats(self):
-        return self.get_table(self.soup, "receiving_and_rushing", self.num_columns, classes=["full_table", ""], outer_level=8)
 
 #davante = NFL("Davante Adams", player_url= "/players/A/AdamDa01.htm")
 #table = davante.get_summary("WR", "No")
@@ -209,66 +457,107 @@ class NFL(Athlete):
 
 
 
-def get_player_data_pandas(name, sport="baseball", return_list=True):
+def player_url(name, sport="baseball", year=None, first_year=None, last_year=None):
+    """The url of a player's page. If a player_index.PlayerIndex has been loaded for the sport (see
+    player_index.load_index) it comes from there, and player_index.UnknownPlayer/AmbiguousPlayer are raised when
+    the name can't be pinned down to one page (the years help with that, see PlayerIndex.resolve). Otherwise it is
+    guessed from the name, which is the first player with that name at best. None if the sport isn't supported"""
+    index = get_index(sport)
+    if index is not None:
+        return index.url(name, year=year, first_year=first_year, last_year=last_year)
 
-    """Currently supplies the functionality to the other modules. Will eventually be phased out and functionality will
-    be taken over by the 'Athlete' family of classes
-
-    """
     sport_urls = {"football": "https://www.football-reference.com/players/{0}/{1}01.shtml",
                   "baseball":"https://www.baseball-reference.com/players/{0}/{1}01.shtml"}
     try:
         url = sport_urls[sport]
     except KeyError:
-        return "That sport is not currently supported"   ###cheking to see that it is scraping form a valid source
+        return None
 
     split_name = name.split(" ")
     first, last = split_name[0].lower(), split_name[1].lower()
     url_1 = last[0]
     url_2 = last[0:5] + first[0:2]
 
-    full_url = url.format(url_1, url_2) ### Creates a specific URL based on the player's name
+    return url.format(url_1, url_2) ### Creates a specific URL based on the player's name
     ##this is baseball specific. We are finding the url based on the player's name
 
-    soup = get_soup(full_url)
-    ### Gets the soup for the given player.
-
-    try:
-        table = soup.find_all('table')[0]  # Finds the "Career Statistics" Table
-        columns = table.find_all('th')
 
-        all_headings = []
-        for entry in columns:
-            all_headings.append(entry.get_text())  # Gets the heading for each column
-                                                   # Will be used to create the dataframe
+# every table worth keeping from a baseball-reference player page. The fielding, value and postseason tables are
+# inside html comments on the page, table_extract finds them anyway
+MLB_TABLES = ["batting_standard", "pitching_standard", "standard_fielding", "batting_value", "pitching_value",
+              "batting_postseason", "pitching_postseason"]
+
+
+def table_rows(content, table_ids, classes=("full", "")):
+    """(column headings, rows of cell strings) for each of table_ids the page has, from one pass over the page (see
+    table_extract.find_tables). Every column of the table is kept (table_specs.any_table), headed by the last row of
+    its thead, so nothing depends on a table having a particular number of columns. Only body rows whose class is in
+    classes are kept, ("full", "") being the major league seasons. Plain lists like player_data_rows. Each table's
+    parse time goes to metrics"""
+    return {table_id: extract_rows(fragment, any_table(table_id, classes))
+            for table_id, fragment in find_tables(content, table_ids).items()}
+
+
+def get_player_tables(name, table_ids=MLB_TABLES, sport="baseball", year=None):
+    """Every table in table_ids the player's page has, as {table id: typed DataFrame with a name column}, from a
+    single download. Pitchers and two way players included, unlike get_player_data_pandas. year picks between
+    namesakes, see player_url"""
+    full_url = player_url(name, sport, year=year)
+    if full_url is None:
+        return "That sport is not currently supported"
+
+    tables = {}
+    for table_id, (columns, rows) in table_rows(get_page(full_url), table_ids).items():
+        pd_table = frame_from_rows(rows, columns, table_id)
+        pd_table["name"] = [name] * len(rows)
+        tables[table_id] = pd_table
+    return tables
+
+
+def player_data_rows(content):
+    """The parsing half of get_player_data_pandas. Returns (column headings, rows of cell strings) for the standard
+    batting table, or "Pitcher"/"Error" like get_player_data_pandas. Only plain lists and strings come back so it can
+    run in a worker process (see pipeline.py)"""
+    table_id = first_table_id(content)  # Finds the "Career Statistics" Table
+    if table_id is None:
+        return "Error"
+    if table_id != "batting_standard":  # Exception handling for if the the player us a pitcher
+        return "Pitcher"  # ***ADD FUNCTIONALITY FOR PITCHERS***
 
-        df_columns = all_headings[0:30]
+    # Only the rows with the "full" or "" class, which filters out minor league statistics. See table_specs
+    return extract_rows(content, get_spec("baseball", "batter"))
 
-        if table.get('id') != "batting_standard":  # Exception handling for if the the player us a pitcher
-            return "Pitcher"  # ***ADD FUNCTIONALITY FOR PITCHERS***
 
-    except IndexError:
-        return "Error"
+def get_player_data_pandas(name, sport="baseball", return_list=True, year=None):
 
-    table_rows = table.find_all('tr',  attrs={"class":["full", ""]})  #Finds the rows that are demarcated with the "full""
-    # or "" class. this is to filter out minor league statistics. This is another oppurtunity for expanding functionality
+    """Currently supplies the functionality to the other modules. Will eventually be phased out and functionality will
+    be taken over by the 'Athlete' family of classes
 
-    total_rows = []  # this will collect all of the row data in the form of lists
+    With a player index loaded (player_index.load_index) the page comes from the roster's HREF, year picks between
+    namesakes. A name the index can't pin down to one player returns "Error" without downloading anything.
+    """
+    try:
+        full_url = player_url(name, sport, year=year)
+    except LookupError:  # player_index.UnknownPlayer / AmbiguousPlayer
+        return "Error"
+    if full_url is None:
+        return "That sport is not currently supported"   ###cheking to see that it is scraping form a valid source
 
-    for tr in table_rows: #gets the data from each tr, essentially getting the stats for each year
-        row = [td.get_text() for td in tr]  # creates a list of each data entry in the given table row
-        total_rows.append(row)
+    try:
+        content = get_page(full_url)
+    except LookupError:  # transport.PageNotFound, the 404 page used to be parsed into "Error" below
+        return "Error"
+    ### Gets the html for the given player. Only the stats table gets parsed, not the whole page
 
-    pd_table = pd.DataFrame(total_rows, columns=df_columns)
+    parsed = player_data_rows(content)
+    if isinstance(parsed, str):
+        return parsed
+    df_columns, total_rows = parsed
 
-    pd_table = to_numeric(pd_table)
+    pd_table = frame_from_rows(total_rows, df_columns, "batting_standard")
 
     names_list = [name]*len(total_rows)
     pd_table["name"] = names_list  # this simply adds a column to the dataframe of the name of the player
     # This handles the issue of creating a dataframe that has the annual statistics of multiple players
 
     return pd_table
-
-
-
-
@@ -1,15 +1,21 @@
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-import re
 import string
+import time
+from datetime import datetime
 
 
-from add_rows_to_db import mlb_add_to_all_players_db, nfl_add_to_all_players_db
+from .writers import mlb_roster_writer, nfl_roster_writer, MLB_ROSTER_TABLE, NFL_ROSTER_TABLE
+from .player_scrape import get_soup, get_page
+from .roster_parser import iter_roster, stable_id, roster_digest, RosterRecord
+from .fetch import fetch_pages, DEFAULT_RATE
+from .sessions import get_database
+from .metrics import get_metrics
 
 
 alphabet = list(string.ascii_lowercase)
 
+ROSTER_PAGES_TABLE = "roster_pages"  # digest of every letter page as of the last refresh
+
 
 def mlb_get_players_table_by_letter(letter):
     """This searches all of the players that have profiles on ProBaseballReference.com
@@ -20,72 +26,51 @@ def mlb_get_players_table_by_letter(letter):
 
     url = "https://www.baseball-reference.com/players/{0}/".format(letter)
 
-    website = requests.get(url)
-    content = website.content
-    soup = BeautifulSoup(content,features="html.parser")
+    soup = get_soup(url)  # goes through the page cache if it is enabled
 
     player_data_div = soup.find("div", {"id": "div_players_"})#Selects the div containing the list of all players
     return player_data_div
 
 
 
-def mlb_get_player_list(letter, abs_path, output="db", start_index=0):
+def mlb_get_roster_records(letter):
+    """Yields a roster_parser.RosterRecord for every player on the letter page. Each <p> tag is only visited once"""
+    url = "https://www.baseball-reference.com/players/{0}/".format(letter)
+    return iter_roster(get_page(url), sport="baseball")
+
+
+def mlb_roster_row(record):
+    return [stable_id(record.href), record.name, record.first_year, record.last_year, record.hof, record.href]
+
+
+def mlb_get_player_list(letter, abs_path, output="db", start_index=0, writer=None):
     """Fetches the list of players based on the starting letter of their last name. Users will have the option to
     output the data to a database or to pandas dataframe.
+
+    Rows go through `writer` (a writers.RosterWriter) if one is passed in, so that loading every letter can share one
+    connection. Otherwise a writer is opened just for this letter, after rekey_roster has moved a roster with counter
+    Ids over to the url based ones (a writer passed in should be on a roster that was already rekeyed). A player's Id
+    comes from their url (roster_parser.stable_id), start_index only counts the rows.
     """
 
-    player_data_div = mlb_get_players_table_by_letter(letter)
+    records = mlb_get_roster_records(letter)
 
     if output == "db":
-        x = 0
-        while x < len(player_data_div.find_all("p")): #each <p> tag corresponds to an individual player
-            #the following code is going to parse the raw values taken from the html
-            #yyyy-yyyy becomes yyyy and yyyy
-            raw_year = player_data_div.find_all("p")[x].text[-10:-1]
-            first_year = raw_year[0:4]
-            last_year = raw_year[-4:]
-
-            name = player_data_div.find_all("p")[x].find_all("a")[0].text  #name of the player
-            HOF = "Yes" if "+" in player_data_div.find_all("p") else "No"  # whether the player is in the HOF
-
-            data = [start_index, name, first_year, last_year, HOF] #corresponds with the row to be added to the db
-            mlb_add_to_all_players_db(abs_path=abs_path, row_vals=data)
-            x += 1
+        own_writer = writer is None
+        if own_writer:
+            rekey_roster(abs_path, "baseball")  # or the players of a roster with counter Ids are all inserted again
+            writer = mlb_roster_writer(abs_path)
+        for record in records:
+            data = mlb_roster_row(record) #corresponds with the row to be added to the db
+            writer.add(data)
             start_index += 1
+        if own_writer:
+            writer.close()
         return start_index
 
     elif output == "df":  # This will have the same functionality as above except it will return lists that are stored
         # in memory instead of being added to a table as rows
-
-        raw_years = [p.text[-10:-1] for p in player_data_div.find_all("p")]
-        HOF = []
-        raw_players = []
-
-
-        for p in player_data_div.find_all("p"):
-            for player in p.find_all("a"):
-                raw_players.append(player.text)
-
-
-        for p in player_data_div.find_all("p"):
-            #raw_years.append(p.text[-10:-1])
-            if "+" in p.text:
-                HOF.append("Yes")
-            else:
-                HOF.append("No")
-
-
-        start_list = [start[0:4] for start in raw_years]
-        end_list = [end[-4:] for end in raw_years]
-        x = 0
-        full_list = []
-
-        while x < len(raw_players):
-
-            full_list.append([raw_players[x],int(start_list[x]), int(end_list[x]), HOF[x]])
-            x += 1
-
-        return full_list
+        return [[record.name, record.first_year, record.last_year, record.hof] for record in records]
 
 
 def get_all_mlb_players(abs_path, output='db'):
@@ -94,97 +79,77 @@ def get_all_mlb_players(abs_path, output='db'):
     """
     index = 0
     if output == "db":
-        for letter in alphabet:
-            end_index = mlb_get_player_list(letter, abs_path, start_index=index)
-            index = end_index
+        rekey_roster(abs_path, "baseball")
+        with mlb_roster_writer(abs_path) as writer:  # one connection for all 26 letters
+            for letter in alphabet:
+                end_index = mlb_get_player_list(letter, abs_path, start_index=index, writer=writer)
+                index = end_index
 
     elif output == "df":
         full_list = []
         for letter in alphabet:
-            full_list = full_list + mlb_get_player_list(letter)
+            full_list.extend(mlb_get_player_list(letter, abs_path, output="df"))  # extend, not + (copies every time)
 
         return pd.DataFrame(full_list, columns = ["Name", "Start", "End", "HOF?"])
 
 
+def iter_all_mlb_players(letters=None):
+    """Yields a roster_parser.RosterRecord for every player, one letter page at a time"""
+    for letter in letters or alphabet:
+        yield from mlb_get_roster_records(letter)
+
+
 
 def nfl_get_players_table_by_letter(letter):
 
     url = "https://www.pro-football-reference.com/players/{0}/".format(letter.upper())
 
-    website = requests.get(url)
-    content = website.content
-    soup = BeautifulSoup(content,features="html.parser")
+    soup = get_soup(url)  # goes through the page cache if it is enabled
 
     player_data_div = soup.find("div", {"id": "div_players"})#Selects the div containing the list of all players
     return player_data_div
 
 
-def nfl_get_player_list(letter, abs_path, output="db", start_index=0):
-    """Fetches the list of players based on the starting letter of their last name. Users will have the option to
-    output the data to a database or to pandas dataframe.
-    """
+def nfl_get_roster_records(letter):
+    """Yields a roster_parser.RosterRecord for every player on the letter page. Each <p> tag is only visited once"""
+    url = "https://www.pro-football-reference.com/players/{0}/".format(letter.upper())
+    return iter_roster(get_page(url), sport="football")
 
-    player_data_div = nfl_get_players_table_by_letter(letter)
 
-    if output == "db":
-        x = 0
-        while x < len(player_data_div.find_all("p")): #each <p> tag corresponds to an individual player
-            #the following code is going to parse the raw values taken from the html
-            #yyyy-yyyy becomes yyyy and yyyy
-            entry = player_data_div.find_all("p")[x].text
-            raw_year = entry[-10:]
-            first_year = raw_year[0:5]
-            last_year = raw_year[-4:]
+def nfl_roster_row(record):
+    return [stable_id(record.href), record.position, record.name, record.first_year, record.last_year, record.hof,
+            record.href]
 
-            try:  # regex to find the text from each <p> tag that is inside parentheses i.e. the position the player plays
-                position = re.findall(r'\(([^)]+)\)', entry)[0]
-            except IndexError:
-                position = ""
 
-            name = player_data_div.find_all("p")[x].find_all("a")[0].text  #name of the player
-            HOF = "Yes" if "+" in entry else "No"
-            url = player_data_div.find_all("p")[x].find_all('a', href=True)[0]['href'] # returns the href of each player
+def nfl_get_player_list(letter, abs_path, output="db", start_index=0, writer=None):
+    """Fetches the list of players based on the starting letter of their last name. Users will have the option to
+    output the data to a database or to pandas dataframe.
 
+    Rows go through `writer` (a writers.RosterWriter) if one is passed in, so that loading every letter can share one
+    connection. Otherwise a writer is opened just for this letter, after rekey_roster has moved a roster with counter
+    Ids over to the url based ones (a writer passed in should be on a roster that was already rekeyed). A player's Id
+    comes from their url (roster_parser.stable_id), start_index only counts the rows.
+    """
 
-            data = [start_index, position, name, first_year, last_year, HOF, url] #corresponds with the row to be added to the db
-            nfl_add_to_all_players_db(abs_path=abs_path, row_vals=data)
+    records = nfl_get_roster_records(letter)
 
-            x += 1
+    if output == "db":
+        own_writer = writer is None
+        if own_writer:
+            rekey_roster(abs_path, "football")  # or the players of a roster with counter Ids are all inserted again
+            writer = nfl_roster_writer(abs_path)
+        for record in records:
+            data = nfl_roster_row(record) #corresponds with the row to be added to the db
+            writer.add(data)
             start_index += 1
+        if own_writer:
+            writer.close()
         return start_index
 
     elif output == "df":    # This will have the same functionality as above except it will return lists that are stored
                             # in memory instead of being added to a table as rows
-
-        raw_years = [p.text[-10:-1] for p in player_data_div.find_all("p")]
-        HOF = []
-        raw_players = []
-
-
-        for p in player_data_div.find_all("p"):
-            for player in p.find_all("a"):
-                raw_players.append(player.text)
-
-
-        for p in player_data_div.find_all("p"):
-            #raw_years.append(p.text[-10:-1])
-            if "+" in p.text:
-                HOF.append("Yes")
-            else:
-                HOF.append("No")
-
-
-        start_list = [start[0:4] for start in raw_years]
-        end_list = [end[-4:] for end in raw_years]
-        x = 0
-        full_list = []
-
-        while x < len(raw_players):
-
-            full_list.append([raw_players[x],int(start_list[x]), int(end_list[x]), HOF[x]])
-            x += 1
-
-        return full_list
+        return [[record.name, record.position, record.first_year, record.last_year, record.hof, record.href]
+                for record in records]
 
 
 def get_all_nfl_players(abs_path, output='db'):
@@ -193,16 +158,149 @@ def get_all_nfl_players(abs_path, output='db'):
     """
     index = 0
     if output == "db":
-        for letter in alphabet:
-            end_index = nfl_get_player_list(letter, abs_path, start_index=index)
-            index = end_index
+        rekey_roster(abs_path, "football")
+        with nfl_roster_writer(abs_path) as writer:  # one connection for all 26 letters
+            for letter in alphabet:
+                end_index = nfl_get_player_list(letter, abs_path, start_index=index, writer=writer)
+                index = end_index
 
     elif output == "df":
         full_list = []
         for letter in alphabet:
-            full_list = full_list + nfl_get_player_list(letter)
-
-        return pd.DataFrame(full_list, columns = ["Name", "Position" "Start", "End", "HOF?", "HREF"])
+            full_list.extend(nfl_get_player_list(letter, abs_path, output="df"))  # extend, not + (copies every time)
+
+        return pd.DataFrame(full_list, columns = ["Name", "Position", "Start", "End", "HOF?", "HREF"])
+
+
+def iter_all_nfl_players(letters=None):
+    """Yields a roster_parser.RosterRecord for every player, one letter page at a time"""
+    for letter in letters or alphabet:
+        yield from nfl_get_roster_records(letter)
+
+
+def iter_roster_chunks(records, chunk_rows=1000):
+    """Groups RosterRecords (i.e. from iter_all_nfl_players) into DataFrames of chunk_rows rows for the exporters"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_rows:
+            yield pd.DataFrame.from_records(chunk, columns=RosterRecord._fields)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame.from_records(chunk, columns=RosterRecord._fields)
+
+
+### Incremental refresh
+
+_ROSTERS = {
+    # sport: (letter page url, roster table, writer, row builder)
+    "baseball": ("https://www.baseball-reference.com/players/{0}/", MLB_ROSTER_TABLE, mlb_roster_writer,
+                 mlb_roster_row),
+    "football": ("https://www.pro-football-reference.com/players/{0}/", NFL_ROSTER_TABLE, nfl_roster_writer,
+                 nfl_roster_row),
+}
+
+
+def current_season(sport="football", today=None):
+    """The season that is being played (or was just played) on `today`. An NFL season runs September to February
+    and is named after the year it starts in, an MLB season runs March to November"""
+    today = today or datetime.now()
+    first_month = 9 if sport == "football" else 3
+    return today.year if today.month >= first_month else today.year - 1
+
+
+def _create_pages_table(connection):
+    connection.execute('CREATE TABLE IF NOT EXISTS "{0}" (roster TEXT, letter TEXT, digest TEXT, checked_at REAL, '
+                       'PRIMARY KEY (roster, letter))'.format(ROSTER_PAGES_TABLE))
+
+
+def rekey_roster(abs_path, sport="football", table=None):
+    """Moves a roster built with running-counter Ids over to roster_parser.stable_id Ids, updating the player_id of
+    every stat table that points at it. Rows without an HREF (MLB rosters from before the column existed) can't be
+    rekeyed, so they are deleted and the letter page digests forgotten, which makes the next refresh re-read every
+    letter. Returns the number of rows that changed Id"""
+    table = table or _ROSTERS[sport][1]
+    pooled = get_database(abs_path)
+    connection = pooled.checkout()
+    try:
+        columns = {row[1] for row in connection.execute('PRAGMA table_info("{0}")'.format(table))}
+        if not columns:
+            return 0
+        if "HREF" not in columns:
+            connection.execute('ALTER TABLE "{0}" ADD COLUMN "HREF" VARCHAR'.format(table))
+        rows = connection.execute('SELECT Id, HREF FROM "{0}"'.format(table)).fetchall()
+        moves = [(stable_id(href), id_) for id_, href in rows if href and stable_id(href) != id_]
+        orphans = [(id_,) for id_, href in rows if not href]
+
+        stat_tables = [name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                       if "player_id" in {row[1] for row in connection.execute('PRAGMA table_info("{0}")'.format(
+                           name))}]
+        with connection:
+            # new Ids are 63 bit hashes and the old ones small counters, so they can't collide part way through
+            connection.executemany('UPDATE "{0}" SET Id = ? WHERE Id = ?'.format(table), moves)
+            for stat_table in stat_tables:
+                connection.executemany('UPDATE "{0}" SET player_id = ? WHERE player_id = ?'.format(stat_table),
+                                       moves)
+            if orphans:
+                connection.executemany('DELETE FROM "{0}" WHERE Id = ?'.format(table), orphans)
+                _create_pages_table(connection)
+                connection.execute('DELETE FROM "{0}" WHERE roster = ?'.format(ROSTER_PAGES_TABLE), (table,))
+        return len(moves)
+    finally:
+        pooled.release(connection)
+
+
+def refresh_roster(abs_path, sport="football", letters=None, rate=DEFAULT_RATE, force=False):
+    """Brings a roster table up to date without rewriting it.
+
+    Every letter page is downloaded (a conditional request if the page cache is enabled, see
+    player_scrape.enable_cache) and the player list on it hashed with roster_parser.roster_digest. Letters whose hash
+    is the same as last time are skipped, the rest are parsed and upserted, and only players whose row actually
+    differs are written (see writers.RosterWriter). Ids come from the player's url so they stay put when players
+    are added. A roster built with counter Ids is rekeyed first (rekey_roster). force=True re-reads every letter.
+
+    Returns a dict with the number of letters fetched and changed, the letters that couldn't be downloaded and rows
+    written.
+    """
+    url, table, make_writer, make_row = _ROSTERS[sport]
+    letters = letters or alphabet
+    rekey_roster(abs_path, sport, table)
+
+    with make_writer(abs_path) as writer:
+        connection = writer.connection
+        _create_pages_table(connection)
+        known = dict(connection.execute('SELECT letter, digest FROM "{0}" WHERE roster = ?'.format(
+            ROSTER_PAGES_TABLE), (table,)).fetchall())
+        connection.commit()
+
+        jobs = ((letter, url.format(letter.upper() if sport == "football" else letter)) for letter in letters)
+        fetched, failed, changed = 0, [], []
+        for letter, page_url, content, error in fetch_pages(jobs, rate=rate):
+            if error is not None:
+                get_metrics().error("roster", error)
+                failed.append(letter)
+                continue
+            fetched += 1
+            digest = roster_digest(content, sport)
+            if digest == known.get(letter) and not force:
+                continue
+            writer.add_many(make_row(record) for record in iter_roster(content, sport=sport))
+            writer.flush()
+            with connection:  # only remembered once the letter's rows are in
+                connection.execute('INSERT OR REPLACE INTO "{0}" (roster, letter, digest, checked_at) VALUES '
+                                   '(?, ?, ?, ?)'.format(ROSTER_PAGES_TABLE), (table, letter, digest, time.time()))
+            changed.append(letter)
+
+    return {"letters_fetched": fetched, "letters_changed": len(changed), "letters_failed": failed,
+            "rows_written": writer.rows_changed}
+
+
+def refresh_nfl_roster(abs_path, **kwargs):
+    return refresh_roster(abs_path, sport="football", **kwargs)
+
+
+def refresh_mlb_roster(abs_path, **kwargs):
+    return refresh_roster(abs_path, sport="baseball", **kwargs)
 
 
 #get_all_nfl_players(abs_path="/Users/nickblackmore/personal_projects/sportscrape/_database_creation/core/Databases/NFL.db")
@@ -1,50 +1,254 @@
-from sqlalchemy import create_engine
+import os
 import pandas as pd
 import sqlite3
+from collections import OrderedDict
 from datetime import datetime
 
+from .sessions import get_database, engine
+
 
 def read_all_from_db(db="sqlite", abs_path= "/core/Databases/NFL.db",
-                     table="all_nfl_players_table"):
+                     table="all_nfl_players_table", columns=None, filters=None):
     """Reads data from a locally stored sqlite database. For the remainder of this module we will use the sqlite3 library
     as this is the only type of database supported at this time.
+
+    db="parquet" reads the table from a columnar.ColumnarStore rooted at abs_path instead, only loading `columns`
+    (all by default) from the partitions matching `filters` (i.e. {"position": "WR"}). columns/filters only apply
+    to parquet.
     """
-    if not abs_path == "":
-        sql_engine = create_engine(db + ":///" + abs_path)
-    else:
-        sql_engine = create_engine(db + ":///" + abs_path )
+    if db == "parquet":
+        from .columnar import ColumnarStore
+        return ColumnarStore(abs_path).read(table, columns=columns, filters=filters)
+
+    sql_engine = engine(abs_path, db)  # one engine per database, shared by every call
     query = "select * from {0}".format(table)
     df = pd.read_sql_query(query, sql_engine)
     return df
 
 
+DEFAULT_CHUNK_ROWS = 10000
+
+
+def iter_from_db(abs_path, table, chunk_rows=DEFAULT_CHUNK_ROWS, columns=None):
+    """Like read_all_from_db but yields DataFrames of at most chunk_rows rows, read off one cursor with fetchmany, so
+    a table of any size can be exported in constant memory"""
+    # whoever consumes the generator may pull chunks from another thread (pyarrow's dataset writer does), pooled
+    # connections allow that
+    with get_database(abs_path).connection() as connection:
+        projection = "*" if not columns else ", ".join('"{0}"'.format(column) for column in columns)
+        cursor = connection.execute('SELECT {0} FROM "{1}"'.format(projection, table))
+        yield from _iter_cursor(cursor, chunk_rows, _integer_columns(connection, table))
+
+
+def _integer_columns(connection, table):
+    return {row[1] for row in connection.execute('PRAGMA table_info("{0}")'.format(table))
+            if "INT" in (row[2] or "").upper()}
+
+
+def _iter_cursor(cursor, chunk_rows, integer_columns=()):
+    # INTEGER columns become nullable Int64, otherwise a chunk with a NULL in it turns the column into floats and
+    # chunks stop agreeing on their types
+    names = [description[0] for description in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            return
+        df = pd.DataFrame.from_records(rows, columns=names)
+        for name in names:
+            if name in integer_columns:
+                try:
+                    df[name] = df[name].astype("Int64")
+                except (TypeError, ValueError):
+                    pass  # text left in an old untyped table, keep whatever pandas made of it
+        yield df
+
+
 def select_all_from_db(table, db_file):
 
-    conn = sqlite3.connect(db_file)
-    df = pd.read_sql_query("SELECT * FROM {0}".format(table), conn)
-    return df
+    with get_database(db_file).connection() as conn:
+        return pd.read_sql_query('SELECT * FROM "{0}"'.format(table), conn)
+
+
+VERSIONS_TABLE = "table_versions"
+DEFAULT_RESULT_CACHE = 128
+
+# indexes made for the roster tables when a RosterConnection opens them, skipped for columns a table doesn't have.
+# (Position, Last, First) serves the special_select position + era lookups, Name and HREF single player lookups
+ROSTER_INDEXES = [("Position", "Last", "First"), ("Name",), ("HREF",)]
+
+_OPERATORS = {"=", "!=", "<", "<=", ">", ">=", "like", "in"}
+
+
+def table_version(abs_path, table):
+    """Something that changes whenever a table's rows do, found without writing to the database (unlike
+    RosterConnection, which puts its version triggers on the table). Good for keying caches of tables from databases
+    that may be read only or written by other programs.
+
+    If the table has RosterConnection's triggers its table_versions counter is used. Without them there is nothing
+    in sqlite that moves with every write to one table (rowids are reused, updates change neither count nor rowids),
+    so the size and modification time of the database file and its WAL are used along with the row count: any write
+    to the database moves them, which can only make a cache rebuild more often than it needs to, never go stale.
+    """
+    with get_database(abs_path).connection() as connection:
+        schema = connection.execute("PRAGMA schema_version").fetchone()[0]
+        if connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                              ("{0}_version_update".format(table),)).fetchone():
+            row = connection.execute('SELECT version FROM "{0}" WHERE name = ?'.format(VERSIONS_TABLE),
+                                     (table,)).fetchone()
+            if row is not None:
+                return ["triggers", schema, row[0]]
+        rows, high = connection.execute('SELECT COUNT(*), MAX(rowid) FROM "{0}"'.format(table)).fetchone()
+    files = []
+    for path in (abs_path, abs_path + "-wal"):
+        stat = os.stat(path) if os.path.exists(path) else None
+        if stat is not None and stat.st_size:  # an empty WAL is made by every connection that opens the database
+            files.append([stat.st_size, stat.st_mtime_ns])
+    return ["files", schema, rows, high, files]
 
 
 class RosterConnection():
+    """Queries against one roster table.
 
+    select() binds every value as a parameter (column names are checked against the table instead, since sqlite
+    can't bind identifiers), so the same query shape reuses sqlite's compiled statement and nothing from the caller
+    ends up inside the sql. The ROSTER_INDEXES are created on first use, which turns the position/era lookups into
+    index seeks instead of scans of the whole roster.
 
-    def __init__(self, db, table):
+    Results are kept in an LRU cache of cache_size queries (0 turns it off). The table gets triggers that bump its
+    row in table_versions on every insert/update/delete, and a cached result is only used while that version hasn't
+    moved, so writes from any connection invalidate it.
+    """
+
+    def __init__(self, db, table, cache_size=DEFAULT_RESULT_CACHE):
 
         self.db = db
-        self.connection = sqlite3.connect(db)
+        self._database = get_database(db)
+        self.connection = self._database.checkout()  # held until close(), then back to the pool
         self.table = table
+        self.cache_size = cache_size
+        self._results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
-    def select_all(self):
-        return select_all_from_db(self.table, self.db)
+        self.columns = [row[1] for row in self.connection.execute('PRAGMA table_info("{0}")'.format(table))]
+        self.integer_columns = _integer_columns(self.connection, table)
+        try:
+            self._prepare()
+        except sqlite3.OperationalError:
+            pass  # read only database, queries still work, just without the indexes and the cache
+
+    def _prepare(self):
+        with self.connection:
+            for columns in ROSTER_INDEXES:
+                if all(column in self.columns for column in columns):
+                    self.connection.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" ON "{0}" ({2})'.format(
+                        self.table, "_".join(columns).lower(), ", ".join('"{0}"'.format(c) for c in columns)))
+
+            self.connection.execute('CREATE TABLE IF NOT EXISTS "{0}" (name TEXT PRIMARY KEY, version INTEGER NOT '
+                                    'NULL DEFAULT 0)'.format(VERSIONS_TABLE))
+            self.connection.execute('INSERT OR IGNORE INTO "{0}" (name) VALUES (?)'.format(VERSIONS_TABLE),
+                                    (self.table,))
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                self.connection.execute(
+                    'CREATE TRIGGER IF NOT EXISTS "{0}_version_{1}" AFTER {2} ON "{0}" BEGIN '
+                    'UPDATE "{3}" SET version = version + 1 WHERE name = \'{0}\'; END'.format(
+                        self.table, event.lower(), event, VERSIONS_TABLE))
 
-    def special_select(self, column="", value="", first_year=None, last_year=None, HOF=False):
+    def version(self):
+        """Changes whenever the table's rows (or its schema, i.e. it was dropped and made again) change"""
+        try:
+            row = self.connection.execute('SELECT version FROM "{0}" WHERE name = ?'.format(VERSIONS_TABLE),
+                                          (self.table,)).fetchone()
+        except sqlite3.OperationalError:
+            row = None
+        schema = self.connection.execute("PRAGMA schema_version").fetchone()[0]
+        return (None if row is None else row[0]), schema
 
-        df = pd.read_sql_query("SELECT * FROM {0} WHERE {1} == '{2}' AND First >= {3} AND Last >= {4} ".format(
-                self.table, column, value, "0" if first_year is None else first_year, str(datetime.now().year) if
-                last_year is None else last_year), con=self.connection)
+    def select(self, columns=None, where=None, order_by=None, limit=None):
+        """Returns a DataFrame of the roster rows matching `where`.
 
+        ---Arguments---
+
+        -columns:   list of columns to return, all of them by default
+        -where:     dict of column -> value (equality) or column -> (operator, value), operator being one of
+                    =, !=, <, <=, >, >=, like and in (value is a list for in). Conditions are ANDed
+        -order_by:  column or list of columns
+        -limit:     max number of rows
+        """
+        sql, params = self._build(columns, where, order_by, limit)
+        key = (sql, tuple(params))
+
+        if self.cache_size:
+            version = self.version()
+            cached = self._results.get(key)
+            if cached is not None and cached[0] == version:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return cached[1].copy()  # a copy so whoever gets it can't change the cached frame
+            self.misses += 1
+
+        df = pd.read_sql_query(sql, self.connection, params=params)
+
+        if self.cache_size:
+            self._results[key] = (version, df.copy())
+            self._results.move_to_end(key)
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
         return df
 
+    def iter_select(self, columns=None, where=None, order_by=None, limit=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """select() as a generator of DataFrames of at most chunk_rows rows. Not cached"""
+        sql, params = self._build(columns, where, order_by, limit)
+        yield from _iter_cursor(self.connection.execute(sql, params), chunk_rows, self.integer_columns)
+
+    def _build(self, columns, where, order_by, limit):
+        projection = "*" if not columns else ", ".join(self._column(c) for c in columns)
+        conditions, params = [], []
+        for column, condition in (where or {}).items():
+            operator, value = condition if isinstance(condition, tuple) else ("=", condition)
+            operator = operator.lower()
+            if operator not in _OPERATORS:
+                raise ValueError("Unsupported operator {0}".format(operator))
+            if operator == "in":
+                value = list(value)
+                conditions.append("{0} IN ({1})".format(self._column(column), ", ".join("?" * len(value))))
+                params.extend(value)
+            else:
+                conditions.append("{0} {1} ?".format(self._column(column), operator.upper()))
+                params.append(value)
+
+        sql = 'SELECT {0} FROM "{1}"'.format(projection, self.table)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if order_by:
+            order_by = [order_by] if isinstance(order_by, str) else order_by
+            sql += " ORDER BY " + ", ".join(self._column(c) for c in order_by)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return sql, params
+
+    def _column(self, column):
+        if column not in self.columns:
+            raise ValueError("{0} has no column {1}".format(self.table, column))
+        return '"{0}"'.format(column)
+
+    def clear_cache(self):
+        self._results.clear()
+
+    def select_all(self):
+        return self.select()
+
+    def special_select(self, column="", value="", first_year=None, last_year=None, HOF=False, columns=None):
+
+        return self.select(columns=columns, where={column: value,
+                                                   "First": (">=", 0 if first_year is None else first_year),
+                                                   "Last": (">=", datetime.now().year if last_year is None
+                                                            else last_year)})
+
+    def close(self):
+        self._database.release(self.connection)
+
 
 
 
@@ -0,0 +1,111 @@
+import hashlib
+import re
+from collections import namedtuple
+from importlib.util import find_spec
+
+# the optional parsers are checked for without importing them, selectolax is only imported once a page is parsed
+# with it and lxml only by BeautifulSoup
+SELECTOLAX = find_spec("selectolax") is not None
+BS4_FEATURES = "lxml" if find_spec("lxml") is not None else "html.parser"
+
+
+RosterRecord = namedtuple("RosterRecord", ["name", "position", "first_year", "last_year", "hof", "href"])
+
+# id of the div holding the <p> tag for every player on a letter page
+ROSTER_DIVS = {"baseball": "div_players_", "football": "div_players"}
+
+_years = re.compile(r"(\d{4})(?:\s*-\s*(\d{4}))?\)?\s*$")
+_position = re.compile(r"\(([^)0-9]+)\)")  # the parentheses with no digits in them, years are also in () for mlb
+
+
+def parse_entry(text, name, href):
+    """Turns the text of one <p> tag into a RosterRecord. i.e.
+
+    football: "Isaako Aaitui (NT) 2013-2014"
+    baseball: "Hank Aaron+ (1954-1976)"
+    """
+    years = _years.search(text)
+    if years is None:
+        first_year = last_year = None
+    else:
+        first_year = int(years.group(1))
+        last_year = int(years.group(2) or years.group(1))
+
+    position = _position.search(text)
+    position = position.group(1) if position is not None else ""
+
+    hof = "Yes" if "+" in text else "No"  # hall of famers have a + after their name
+    return RosterRecord(name, position, first_year, last_year, hof, href)
+
+
+def _html_parser():
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser
+    except ImportError:
+        from selectolax.parser import HTMLParser  # older selectolax without the lexbor backend
+        return HTMLParser
+
+
+def _iter_selectolax(content, div_id):
+    tree = _html_parser()(content)
+    for p in tree.css("div#{0} p".format(div_id)):
+        a = p.css_first("a")
+        if a is None:
+            continue
+        yield parse_entry(p.text(), a.text(), a.attributes.get("href"))
+
+
+def _iter_bs4(content, div_id, features):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, features=features)
+    div = soup.find("div", {"id": div_id})
+    if div is None:
+        return
+    for p in div.find_all("p"):  # each <p> tag corresponds to an individual player, and each one is visited once
+        a = p.find("a")
+        if a is None:
+            continue
+        yield parse_entry(p.get_text(), a.get_text(), a.get("href"))
+
+
+def iter_roster(content, sport="football", backend=None):
+    """Yields a RosterRecord for every player on a roster letter page, in page order.
+
+    ---Arguments---
+
+    -content:       raw html of the letter page (i.e. from player_scrape.get_page)
+    -sport:         "football" or "baseball"
+    -backend:       "selectolax", "lxml" or "html.parser". Defaults to the fastest one that is installed
+    """
+    div_id = ROSTER_DIVS[sport]
+    if backend is None:
+        backend = "selectolax" if SELECTOLAX else BS4_FEATURES
+
+    if backend == "selectolax":
+        return _iter_selectolax(content, div_id)
+    return _iter_bs4(content, div_id, backend)
+
+
+def player_key(href):
+    """The slug Sports Reference uses for a player, i.e. /players/A/AdamDa01.htm -> AdamDa01. It never changes, unlike
+    the player's position in the alphabetical list"""
+    return href.rstrip("/").rsplit("/", 1)[-1].rsplit(".", 1)[0]  # some slugs have dots in them, GreeA.00
+
+
+def stable_id(href):
+    """Integer roster Id derived from the player's slug, so adding a player doesn't shift anyone else's Id. 63 bits of
+    a hash so it fits sqlite's signed INTEGER"""
+    digest = hashlib.blake2b(player_key(href).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+def roster_digest(content, sport="football"):
+    """Hash of the player list on a letter page. Only the list itself is hashed (from the roster div up to the first
+    closing div), the rest of the page has ads and timestamps that change on every request"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    start = content.find('id="{0}"'.format(ROSTER_DIVS[sport]).encode("ascii"))
+    end = content.find(b"</div>", start) if start != -1 else -1
+    section = content[start:end] if end != -1 else content
+    return hashlib.sha1(section).hexdigest()
@@ -0,0 +1,192 @@
+"""Column types for the stats tables scraped from Sports Reference.
+
+Each table id maps column heading -> pandas dtype. Seasons/counting stats are nullable small ints, rates are
+float32 and repeated labels (team, league, position) are categoricals. Columns that aren't listed are kept as strings.
+Duplicate headings (i.e. the receiving and rushing "Yds") share a dtype.
+
+In the database the same columns are INTEGER/REAL/TEXT (SQL_TYPES) and percentages are stored as fractions, 52.0%
+is 0.52. DataFrames keep the site's scale, the conversion happens in sql_ready on the way in.
+"""
+import pandas as pd
+
+
+class SchemaMismatch(ValueError):
+    """Scraped rows that don't line up with the table's columns"""
+    cause = "schema_mismatch"  # see metrics.error_cause
+
+
+INT = "Int16"      # nullable, a blank cell becomes <NA> instead of failing the whole column
+BIG_INT = "Int32"  # career totals that can go past 32767 (plate appearances, batters faced)
+RATE = "float32"
+LABEL = "category"
+TEXT = "string"
+
+TABLE_DTYPES = {
+    "batting_standard": {
+        "Year": INT, "Age": INT, "Tm": LABEL, "Lg": LABEL, "G": INT, "PA": BIG_INT, "AB": BIG_INT, "R": INT,
+        "H": INT, "2B": INT, "3B": INT, "HR": INT, "RBI": INT, "SB": INT, "CS": INT, "BB": INT, "SO": INT, "BA": RATE,
+        "OBP": RATE, "SLG": RATE, "OPS": RATE, "OPS+": INT, "TB": INT, "GDP": INT, "HBP": INT, "SH": INT, "SF": INT,
+        "IBB": INT, "Pos": LABEL, "Awards": TEXT,
+    },
+    "pitching_standard": {
+        "Year": INT, "Age": INT, "Tm": LABEL, "Lg": LABEL, "W": INT, "L": INT, "W-L%": RATE, "ERA": RATE, "G": INT,
+        "GS": INT, "GF": INT, "CG": INT, "SHO": INT, "SV": INT, "IP": RATE, "H": INT, "R": INT, "ER": INT, "HR": INT,
+        "BB": INT, "IBB": INT, "SO": INT, "HBP": INT, "BK": INT, "WP": INT, "BF": BIG_INT, "ERA+": INT, "FIP": RATE,
+        "WHIP": RATE, "H9": RATE, "HR9": RATE, "BB9": RATE, "SO9": RATE, "SO/W": RATE, "Awards": TEXT,
+    },
+    "standard_fielding": {
+        "Year": INT, "Age": INT, "Tm": LABEL, "Lg": LABEL, "Pos": LABEL, "G": INT, "GS": INT, "CG": INT, "Inn": RATE,
+        "Ch": INT, "PO": INT, "A": INT, "E": INT, "DP": INT, "Fld%": RATE, "lgFld%": RATE, "Rtot": INT,
+        "Rtot/yr": INT, "Rdrs": INT, "Rdrs/yr": INT, "RF/9": RATE, "lgRF9": RATE, "RF/G": RATE, "lgRFG": RATE,
+        "Awards": TEXT,
+    },
+    "receiving_and_rushing": {
+        "Year": INT, "Age": INT, "Tm": LABEL, "Pos": LABEL, "No.": INT, "G": INT, "GS": INT, "Tgt": INT, "Rec": INT,
+        "Yds": INT, "Y/R": RATE, "TD": INT, "1D": INT, "Lng": INT, "R/G": RATE, "Y/G": RATE, "Ctch%": RATE,
+        "Y/Tgt": RATE, "Rush": INT, "Y/A": RATE, "A/G": RATE, "YScm": INT, "RRTD": INT, "Fmb": INT, "AV": INT,
+    },
+    "rushing_and_receiving": {
+        "Year": INT, "Age": INT, "Tm": LABEL, "Pos": LABEL, "No.": INT, "G": INT, "GS": INT, "Att": INT, "Yds": INT,
+        "TD": INT, "1D": INT, "Lng": INT, "Y/A": RATE, "Y/G": RATE, "A/G": RATE, "Tgt": INT, "Rec": INT, "Y/R": RATE,
+        "R/G": RATE, "Ctch%": RATE, "Y/Tgt": RATE, "Touch": INT, "Y/Tch": RATE, "YScm": INT, "RRTD": INT, "Fmb": INT,
+        "AV": INT,
+    },
+    "passing": {
+        "Year": INT, "Age": INT, "Tm": LABEL, "Pos": LABEL, "No.": INT, "G": INT, "GS": INT, "QBrec": TEXT,
+        "Cmp": INT, "Att": INT, "Cmp%": RATE, "Yds": BIG_INT, "TD": INT, "TD%": RATE, "Int": INT, "Int%": RATE,
+        "1D": INT, "Lng": INT, "Y/A": RATE, "AY/A": RATE, "Y/C": RATE, "Y/G": RATE, "Rate": RATE, "QBR": RATE,
+        "Sk": INT, "NY/A": RATE, "ANY/A": RATE, "Sk%": RATE, "4QC": INT, "GWD": INT, "AV": INT,
+    },
+    # career summary row written by nfl_stat_builder. The other positions' are made from their table_specs
+    "nfl_wr_summary": {
+        "GS": INT, "Tgt": INT, "Rec": INT, "Yds": INT, "Y/R": RATE, "TD": INT, "1D": INT, "Lng": INT, "R/G": RATE,
+        "Y/G": RATE, "Ctch%": RATE, "Y/Tgt": RATE, "Name": TEXT, "HOF": LABEL,
+    },
+}
+
+# the postseason tables have the same columns as the regular season ones
+TABLE_DTYPES["batting_postseason"] = TABLE_DTYPES["batting_standard"]
+TABLE_DTYPES["pitching_postseason"] = TABLE_DTYPES["pitching_standard"]
+
+NFL_WR_SUMMARY_COLUMNS = list(TABLE_DTYPES["nfl_wr_summary"])
+
+# stat tables get this column as a foreign key to the roster table's Id
+PLAYER_ID = "player_id"
+
+SQL_TYPES = {INT: "INTEGER", BIG_INT: "INTEGER", RATE: "REAL", LABEL: "TEXT", TEXT: "TEXT"}
+
+# rates the sites show out of 100 ("62.5%"). Baseball's W-L% and Fld% are already fractions (".625") and stay as is
+PERCENT_COLUMNS = {"Ctch%", "Cmp%", "TD%", "Int%", "Sk%"}
+
+
+def is_percent(column):
+    return column in PERCENT_COLUMNS
+
+
+def sql_type(dtype):
+    """sqlite type for a pandas dtype, for tables made from whatever columns a frame has"""
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def sql_columns(table_id, columns=None):
+    """(column, sqlite type) pairs for a stat table. columns defaults to the ones declared for table_id, anything
+    not declared is TEXT"""
+    dtypes = TABLE_DTYPES.get(table_id, {})
+    return [(column, SQL_TYPES.get(dtypes.get(column), "TEXT")) for column in (columns or dtypes)]
+
+_not_numeric = r"[^0-9.\-]"  # %, commas, *, + (hall of fame markers) etc.
+
+
+def coerce_values(values, dtype):
+    """Converts a column of scraped strings to dtype in one vectorized pass. Numeric columns have everything but
+    digits, '.' and '-' stripped first, so "52.0%" -> 52.0 and blanks/dashes -> NaN rather than an exception.
+    Percentages keep the site's scale (52.0, not 0.52)."""
+    if dtype == LABEL:
+        return pd.Series(values, dtype=object).replace("", None).astype(LABEL)
+    if dtype == TEXT:
+        return pd.Series(values, dtype=TEXT)
+
+    raw = pd.Series(values, dtype=object)
+    numbers = pd.to_numeric(raw.str.replace(_not_numeric, "", regex=True), errors="coerce")
+    try:
+        return numbers.astype(dtype)
+    except (TypeError, ValueError):
+        return numbers.astype(RATE)  # i.e. a fractional value in an int column, keep it rather than fail
+
+
+def frame_from_rows(rows, columns, table_id):
+    """Builds a typed DataFrame straight from the scraped rows (lists of cell strings), one column at a time, instead
+    of building an all-object frame and converting it afterwards"""
+    dtypes = TABLE_DTYPES.get(table_id, {})
+    for row in rows:
+        if len(row) != len(columns):
+            raise ValueError("{0} columns passed, passed data had {1} columns".format(len(columns), len(row)))
+    cells = list(zip(*rows)) if rows else [()] * len(columns)
+    data = {}
+    for i, (column, values) in enumerate(zip(columns, cells)):
+        data[i] = coerce_values(values, dtypes[column]) if column in dtypes else pd.Series(values, dtype=object)
+    frame = pd.DataFrame(data)
+    frame.columns = columns  # set afterwards so duplicate headings survive
+    return frame
+
+
+def coerce_frame(df, table_id):
+    """Applies the table's dtypes to an existing DataFrame of strings"""
+    dtypes = TABLE_DTYPES.get(table_id, {})
+    data = {}
+    for i, column in enumerate(df.columns):
+        values = df.iloc[:, i]
+        data[i] = coerce_values(values.to_numpy(), dtypes[column]).array if column in dtypes else values.array
+    typed = pd.DataFrame(data, index=df.index)
+    typed.columns = df.columns
+    return typed
+
+
+def concat_frames(frames, table_id):
+    """pd.concat for typed frames. Categories usually differ player to player (different teams) which makes concat
+    fall back to object columns, so the categoricals are put back afterwards"""
+    combined = pd.concat(frames, ignore_index=True)
+    for column, dtype in TABLE_DTYPES.get(table_id, {}).items():
+        if dtype == LABEL and column in combined.columns and combined[column].dtype != LABEL:
+            combined[column] = combined[column].astype(LABEL)
+    return combined
+
+
+def sql_ready(df):
+    """float32 widens to float64 with noise in the last digits (13.2 -> 13.199999809), which would end up in the
+    database. Sports Reference never shows more than 3 decimals, so round the rates back on the way out. Percentages
+    are turned into fractions and repeated headings renamed (unique_columns) here too"""
+    data = {}
+    for i, (column, dtype) in enumerate(zip(df.columns, df.dtypes)):
+        values = df.iloc[:, i]
+        if dtype == RATE:
+            values = (values.astype("float64") / 100).round(6) if is_percent(column) else \
+                values.astype("float64").round(4)
+        data[i] = values.array
+    ready = pd.DataFrame(data, index=df.index)
+    ready.columns = unique_columns(df.columns)
+    return ready
+
+
+def unique_columns(columns):
+    """A table can't have two columns with the same name, so repeated headings get a suffix the way pandas.read_csv
+    does it: the rushing "Yds" after the receiving one becomes "Yds.1"
+    """
+    seen = {}
+    renamed = []
+    for column in columns:
+        count = seen.get(column, 0)
+        seen[column] = count + 1
+        renamed.append(column if count == 0 else "{0}.{1}".format(column, count))
+    return renamed
+
+
+def sql_rows(df):
+    """Row tuples of plain python values with None for missing, which is what sqlite3's executemany can bind (it
+    can't take numpy ints or pd.NA)"""
+    columns = [[None if pd.isna(value) else value for value in df.iloc[:, i].tolist()] for i in range(df.shape[1])]
+    return list(zip(*columns))
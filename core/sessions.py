@@ -0,0 +1,159 @@
+"""One shared set of connections per sqlite database.
+
+Every module used to open its own connections (and read_all_from_db a new SQLAlchemy engine per call, never
+disposed), each with sqlite's defaults: a rollback journal, so one writer blocks every reader, and a full fsync per
+commit. Now they all check connections out of the Database for the file:
+
+    with get_database("Databases/NFL.db").connection() as conn:
+        conn.execute(...)
+
+Each database is switched to WAL the first time it is opened, so readers (analysis, RosterConnection) keep reading
+while a scrape writes and writers wait on each other for busy_timeout instead of failing with "database is locked".
+The connections get the PRAGMAS below and are kept in a small pool; check_same_thread is off, a connection is only
+ever used by whoever checked it out.
+"""
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 30
+
+# applied to every new connection. synchronous=NORMAL is safe with WAL (a power cut can lose the last commits but
+# never corrupts the file), cache_size is in KiB when negative
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": DEFAULT_TIMEOUT * 1000,
+    "cache_size": -64 * 1024,
+    "mmap_size": 256 * 1024 ** 2,
+    "temp_store": "MEMORY",
+}
+
+
+class _Connection(sqlite3.Connection):
+    """Remembers the process that opened it"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pid = os.getpid()
+
+
+class Database:
+    """Connection pool for one database file.
+
+    ---Arguments---
+
+    -abs_path:      the sqlite file. Created if it does not exist
+    -pool_size:     idle connections kept open. More than that can be checked out at once, the extra ones are
+                    closed when they come back
+    -pragmas:       defaults to PRAGMAS
+    """
+
+    def __init__(self, abs_path, pool_size=DEFAULT_POOL_SIZE, pragmas=None):
+        self.abs_path = abs_path
+        self.pool_size = pool_size
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._engine = None
+        self._pid = os.getpid()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.abs_path, timeout=DEFAULT_TIMEOUT, check_same_thread=False, factory=_Connection)
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute("PRAGMA {0} = {1}".format(name, value))
+            except sqlite3.OperationalError:
+                pass  # i.e. journal_mode on a read only file, the connection still works without it
+        return conn
+
+    def checkout(self):
+        """A connection for the caller's use until it is given back with release()"""
+        self._after_fork()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        """Gives a connection back, rolling back anything the caller left uncommitted and undoing the settings
+        callers change (JobQueue turns on autocommit, some set a row_factory)"""
+        if getattr(conn, "pid", None) != os.getpid():
+            return  # opened before a fork, belongs to the parent even if this process has a pool of its own by now
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.isolation_level = ""
+            conn.row_factory = None
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def engine(self, dialect="sqlite"):
+        """SQLAlchemy engine for pandas, made once per database. It keeps its own pool (SQLAlchemy's QueuePool) but
+        its connections are opened with the same settings"""
+        with self._lock:
+            if self._engine is None:
+                from sqlalchemy import create_engine
+                self._engine = create_engine(dialect + ":///" + self.abs_path, creator=self._connect,
+                                             pool_size=self.pool_size)
+            return self._engine
+
+    def close(self):
+        """Closes the idle connections and disposes the engine. The pool stays usable, connections still checked
+        out go back into it as usual"""
+        with self._lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _after_fork(self):
+        # sqlite connections can't cross a fork, a child process starts its own pool
+        if self._pid != os.getpid():
+            self._idle = queue.LifoQueue(maxsize=self.pool_size)
+            self._lock = threading.Lock()
+            self._engine = None
+            self._pid = os.getpid()
+
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(abs_path):
+    """The Database for a file, the same one for every caller in the process"""
+    key = os.path.abspath(abs_path)
+    with _databases_lock:
+        db = _databases.get(key)
+        if db is None:
+            db = _databases[key] = Database(abs_path)
+        return db
+
+
+def engine(abs_path, dialect="sqlite"):
+    return get_database(abs_path).engine(dialect)
+
+
+@atexit.register
+def close_all():
+    with _databases_lock:
+        for db in _databases.values():
+            db.close()
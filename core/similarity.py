@@ -0,0 +1,177 @@
+"""Feature matrices of player stats and a nearest neighbour index for finding comparable players.
+
+The wide receiver notebook builds its matrix by hand (to_numeric, fillna, StandardScaler on six columns) before
+PCA/KMeans. build_features does the same for any stat table in one vectorized pass: the columns become a float32
+matrix, missing values are filled with the column mean and every column is standardized, with the mean and scale
+kept so new rows can be put on the same scale. load_features caches the result under a directory as .npz files,
+keyed by the table's version (read_from_db.table_version), so the matrix is only rebuilt after the table changes.
+
+SimilarityIndex answers "who are the closest players to X" with a brute force search, one matrix-vector product
+per query (BLAS), which is a few milliseconds even over every player in the database:
+
+    index = SimilarityIndex(load_features("Databases/NFL.db", "nfl_wrs_1994", ANALYSIS_COLUMNS))
+    index.query("Jerry Rice", k=10)
+"""
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+ANALYSIS_COLUMNS = ["GS", "Tgt", "Rec", "Yds", "TD", "1D"]  # the columns the wide receiver notebook clusters on
+DEFAULT_NEIGHBOURS = 10
+
+# never used as features when the columns are left to default
+_NOT_FEATURES = {"index", "player_id", "Id", "Year", "Age", "first", "last"}
+
+
+class FeatureMatrix:
+    """
+    ---Attributes---
+
+    -keys:          one per row, the player_id or name the row belongs to
+    -names:         the player names, for display
+    -columns:       the stat behind each column of values
+    -values:        float32 array of rows x columns, standardized
+    -mean, scale:   per column, values = (raw - mean) / scale
+    """
+
+    def __init__(self, keys, names, columns, values, mean, scale):
+        self.keys = keys
+        self.names = names
+        self.columns = list(columns)
+        self.values = values
+        self.mean = mean
+        self.scale = scale
+        self._rows = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def row(self, key):
+        """Row number of a key"""
+        if self._rows is None:
+            self._rows = {k: i for i, k in enumerate(self.keys.tolist())}
+        return self._rows[key]
+
+    def transform(self, raw):
+        """Standardizes raw stat values (in the order of columns) the same way the matrix was"""
+        raw = np.asarray(raw, dtype=np.float32)
+        return np.where(np.isnan(raw), 0, (raw - self.mean) / self.scale).astype(np.float32)
+
+    def to_frame(self):
+        return pd.DataFrame(self.values, index=self.keys, columns=self.columns)
+
+    def save(self, path, version=None):
+        np.savez(path, keys=self.keys, names=self.names, columns=np.array(self.columns), values=self.values,
+                 mean=self.mean, scale=self.scale, version=np.array(json.dumps(version)))
+
+    @classmethod
+    def load(cls, path):
+        """Returns (FeatureMatrix, version it was saved with)"""
+        with np.load(path, allow_pickle=False) as data:
+            features = cls(data["keys"], data["names"], data["columns"].tolist(), data["values"], data["mean"],
+                           data["scale"])
+            return features, json.loads(str(data["version"]))
+
+
+def feature_columns(df):
+    """The numeric columns of a stat table, less the ids and years"""
+    return [column for column in df.columns
+            if column not in _NOT_FEATURES and (pd.api.types.is_numeric_dtype(df[column]) or
+                                                pd.to_numeric(df[column], errors="coerce").notna().any())]
+
+
+def build_features(df, columns=None, key=None, name="Name"):
+    """FeatureMatrix of a DataFrame of stats, one row per key (player_id if the frame has it, otherwise the name;
+    later duplicates are dropped like the notebook does). Text like "52.0%" or "" is parsed/treated as missing"""
+    key = key or ("player_id" if "player_id" in df.columns and df["player_id"].notna().all() else name)
+    df = df.drop_duplicates([key])
+    columns = columns or feature_columns(df)
+
+    raw = np.empty((len(df), len(columns)), dtype=np.float32)
+    for i, column in enumerate(columns):
+        values = df[column]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = pd.to_numeric(values.astype("string").str.rstrip("%"), errors="coerce")
+        raw[:, i] = values.to_numpy(dtype=np.float32, na_value=np.nan)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # columns with no values at all, mean 0 scale 1 below
+        mean = np.nan_to_num(np.nanmean(raw, axis=0)).astype(np.float32)
+        scale = np.nan_to_num(np.nanstd(raw, axis=0)).astype(np.float32)
+    scale[scale == 0] = 1
+    values = (raw - mean) / scale
+    values[np.isnan(values)] = 0  # a missing stat sits at the column mean
+
+    keys = df[key].to_numpy()
+    keys = keys.astype(np.int64) if pd.api.types.is_integer_dtype(df[key]) else keys.astype(str)
+    names = (df[name] if name in df.columns else df[key]).to_numpy().astype(str)
+    return FeatureMatrix(keys, names, columns, np.ascontiguousarray(values, dtype=np.float32), mean, scale)
+
+
+def load_features(abs_path, table, columns=None, key=None, cache_dir=None):
+    """build_features of a sqlite table, cached in cache_dir (none by default) until the table's version changes"""
+    from .read_from_db import table_version, iter_from_db
+
+    version = None
+    if cache_dir is not None:
+        version = table_version(abs_path, table)  # only reads, the stat table is left as it is
+        spec = hashlib.sha256(json.dumps([os.path.abspath(abs_path), table, columns, key]).encode()).hexdigest()[:16]
+        path = os.path.join(cache_dir, "{0}-{1}.npz".format(table, spec))
+        if os.path.exists(path):
+            features, cached_version = FeatureMatrix.load(path)
+            if cached_version == version:
+                return features
+
+    df = pd.concat(iter_from_db(abs_path, table), ignore_index=True)
+    features = build_features(df, columns=columns, key=key)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        features.save(path, version)
+    return features
+
+
+class SimilarityIndex:
+    """Exact k nearest neighbours by euclidean distance over a FeatureMatrix.
+
+    Squared distances come from |a|^2 - 2 a.b + |b|^2 with the squared norms precomputed, so a query is one float32
+    matrix-vector product plus an argpartition. weights scales columns before searching (i.e. to care more about
+    Yds than GS).
+    """
+
+    def __init__(self, features, weights=None):
+        self.features = features
+        self.weights = None if weights is None else np.asarray(
+            [weights.get(column, 1.0) for column in features.columns] if isinstance(weights, dict) else weights,
+            dtype=np.float32)
+        self._values = features.values if self.weights is None else features.values * self.weights
+        self._norms = np.einsum("ij,ij->i", self._values, self._values)
+
+    def query(self, key, k=DEFAULT_NEIGHBOURS):
+        """The k players closest to the player with this key (not counting them), as a DataFrame of key, name and
+        distance, closest first"""
+        row = self.features.row(key)
+        return self._nearest(self._values[row], k, exclude=row)
+
+    def query_stats(self, raw, k=DEFAULT_NEIGHBOURS):
+        """The k players closest to a made up stat line (raw values, in the order of features.columns)"""
+        vector = self.features.transform(raw)
+        if self.weights is not None:
+            vector = vector * self.weights
+        return self._nearest(vector, k)
+
+    def _nearest(self, vector, k, exclude=None):
+        distances = self._norms - 2 * (self._values @ vector) + vector @ vector
+        if exclude is not None:
+            distances[exclude] = np.inf
+        k = min(k, len(distances) - (exclude is not None))
+        if k <= 0:
+            return pd.DataFrame({"key": [], "name": [], "distance": []})
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return pd.DataFrame({"key": self.features.keys[nearest], "name": self.features.names[nearest],
+                             "distance": np.sqrt(np.maximum(distances[nearest], 0))})
@@ -0,0 +1,143 @@
+"""Declared sqlite tables for the scraped stats, and a migration for databases built before they existed.
+
+The first builds let pandas create the stat tables, so every stat column is TEXT (the raw strings from the page,
+"52.0%" and all) and there is an extra "index" column with its own index. Any numeric filter has to cast each row.
+create_stat_table makes the table with the column types from schemas.sql_columns plus a player_id foreign key to the
+roster, and migrate_stat_table converts an old table to that layout in place:
+
+    python -m sportscrape.stat_tables Databases/NFL.db nfl_wrs_1994 nfl_wr_summary --position WR
+"""
+import argparse
+
+import pandas as pd
+
+from .schemas import PLAYER_ID, sql_columns, coerce_frame, sql_ready, sql_rows
+from .sessions import get_database
+
+
+NFL_ROSTER = "all_nfl_players_table"
+DEFAULT_CHUNK_ROWS = 5000
+
+
+def create_stat_table(connection, table, table_id, columns=None, roster_table=NFL_ROSTER):
+    """CREATE TABLE IF NOT EXISTS for a stat table with typed columns. columns defaults to the ones declared for
+    table_id in schemas.TABLE_DTYPES. roster_table=None leaves out the player_id column"""
+    definitions = ['"{0}" {1}'.format(column, sql_type) for column, sql_type in sql_columns(table_id, columns)]
+    if roster_table is not None:
+        definitions.append('"{0}" INTEGER REFERENCES "{1}" ("Id")'.format(PLAYER_ID, roster_table))
+    connection.execute('CREATE TABLE IF NOT EXISTS "{0}" ({1})'.format(table, ", ".join(definitions)))
+    if roster_table is not None:
+        connection.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" ON "{0}" ("{1}")'.format(table, PLAYER_ID))
+
+
+def is_legacy(connection, table, table_id):
+    """True if the table exists and still has the pandas "index" column or TEXT where the schema wants a number"""
+    declared = dict(sql_columns(table_id))
+    existing = {row[1]: row[2].upper() for row in connection.execute('PRAGMA table_info("{0}")'.format(table))}
+    if not existing:
+        return False
+    return "index" in existing or any(declared.get(column, "TEXT") != sql_type and sql_type == "TEXT"
+                                      for column, sql_type in existing.items())
+
+
+def ensure_stat_table(abs_path, table, table_id, columns=None, roster_table=NFL_ROSTER, position=None):
+    """Makes sure the stat builders write to a typed table: creates it, or migrates an old all-TEXT one first"""
+    pooled = get_database(abs_path)
+    with pooled.connection() as connection:
+        legacy = is_legacy(connection, table, table_id)
+    if legacy:
+        migrate_stat_table(abs_path, table, table_id, columns=columns, roster_table=roster_table, position=position)
+    with pooled.connection() as connection, connection:
+        create_stat_table(connection, table, table_id, columns=columns, roster_table=roster_table)
+
+
+def player_ids(connection, roster_table=NFL_ROSTER, position=None):
+    """Name -> roster Id for the names that only belong to one player (at the position, if given). The old tables
+    only have the name to go on, so players sharing a name get no player_id rather than a wrong one"""
+    sql = 'SELECT Name, Id FROM "{0}"'.format(roster_table)
+    params = ()
+    if position is not None:
+        sql += " WHERE Position = ?"
+        params = (position,)
+    ids = {}
+    for name, id_ in connection.execute(sql, params):
+        ids[name] = None if name in ids else id_
+    return ids
+
+
+def migrate_stat_table(abs_path, table, table_id, columns=None, roster_table=NFL_ROSTER, position=None,
+                       chunk_rows=DEFAULT_CHUNK_ROWS, vacuum=True):
+    """Rewrites an all-TEXT stat table with the declared types, chunk_rows rows at a time so the whole table is never
+    in memory. Values are converted the same way the builders convert them (schemas.coerce_frame + sql_ready), the
+    "index" column and its index are dropped and player_id is filled from the roster where the name is unambiguous.
+    The copy and the swap happen in one transaction, so an interrupted migration leaves the old table as it was.
+    vacuum=True gives the freed pages back to the file system afterwards. Returns the number of rows migrated.
+    """
+    pooled = get_database(abs_path)
+    connection = pooled.checkout()
+    try:
+        existing = [row[1] for row in connection.execute('PRAGMA table_info("{0}")'.format(table))]
+        if not existing:
+            raise ValueError("{0} has no table {1}".format(abs_path, table))
+        kept = [column for column in existing if column != "index"]
+        columns = columns or [column for column, _ in sql_columns(table_id)]
+        ids = player_ids(connection, roster_table, position) if roster_table is not None else {}
+
+        new_table = table + "__typed"
+        insert = 'INSERT INTO "{0}" ({1}) VALUES ({2})'
+        rows = 0
+        connection.isolation_level = None  # BEGIN/COMMIT by hand so the DDL is inside the transaction too
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute('DROP TABLE IF EXISTS "{0}"'.format(new_table))
+            create_stat_table(connection, new_table, table_id, columns=columns, roster_table=None)
+            if roster_table is not None:
+                connection.execute('ALTER TABLE "{0}" ADD COLUMN "{1}" INTEGER REFERENCES "{2}" ("Id")'.format(
+                    new_table, PLAYER_ID, roster_table))
+
+            cursor = connection.execute('SELECT {0} FROM "{1}" ORDER BY rowid'.format(
+                ", ".join('"{0}"'.format(c) for c in kept), table))
+            while True:
+                chunk = cursor.fetchmany(chunk_rows)
+                if not chunk:
+                    break
+                df = sql_ready(coerce_frame(pd.DataFrame.from_records(chunk, columns=kept).fillna(""), table_id))
+                if roster_table is not None and "Name" in df.columns:
+                    df[PLAYER_ID] = [ids.get(name) for name in df["Name"]]
+                connection.executemany(insert.format(new_table, ", ".join('"{0}"'.format(c) for c in df.columns),
+                                                     ", ".join("?" * len(df.columns))), sql_rows(df))
+                rows += len(df)
+
+            connection.execute('DROP TABLE "{0}"'.format(table))  # takes the ix_<table>_index index with it
+            connection.execute('ALTER TABLE "{0}" RENAME TO "{1}"'.format(new_table, table))
+            if roster_table is not None:
+                connection.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" ON "{0}" ("{1}")'.format(table, PLAYER_ID))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        if vacuum:
+            connection.execute("VACUUM")
+    finally:
+        pooled.release(connection)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converts an all-TEXT stat table to the typed layout in place")
+    parser.add_argument("database")
+    parser.add_argument("table")
+    parser.add_argument("table_id", help="key in schemas.TABLE_DTYPES, i.e. nfl_wr_summary")
+    parser.add_argument("--roster-table", default=NFL_ROSTER)
+    parser.add_argument("--position", default=None, help="narrows the roster used to fill in player_id")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args(argv)
+
+    rows = migrate_stat_table(args.database, args.table, args.table_id, roster_table=args.roster_table,
+                              position=args.position, chunk_rows=args.chunk_rows, vacuum=not args.no_vacuum)
+    print("Migrated {0} rows of {1}".format(rows, args.table))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import re
+from importlib.util import find_spec
+
+# lxml is only needed so BeautifulSoup can use it. find_spec checks it is there without importing it, bs4 and lxml
+# are loaded the first time a table is actually parsed
+FRAGMENT_FEATURES = "lxml" if find_spec("lxml") is not None else "html.parser"
+
+
+class MissingTable(LookupError):
+    """The page doesn't have the table, i.e. a player without receiving stats or a 404 page"""
+    cause = "missing_table"  # see metrics.error_cause
+
+
+_table_open = re.compile(rb"<table\b[^>]*>", re.IGNORECASE)
+_table_id = re.compile(rb"""\bid\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_table_tag = re.compile(rb"<(/?)table\b", re.IGNORECASE)
+
+
+def _as_bytes(content):
+    return content.encode("utf-8") if isinstance(content, str) else content
+
+
+def _in_comment(content, pos):
+    """Sports Reference ships a lot of its tables inside <!-- --> so they can be loaded in later by javascript"""
+    return content.rfind(b"<!--", 0, pos) > content.rfind(b"-->", 0, pos)
+
+
+def _table_end(content, start):
+    """Position just past the </table> that closes the table opened at `start`, accounting for nested tables"""
+    depth = 0
+    for tag in _table_tag.finditer(content, start):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            end = content.find(b">", tag.end())
+            return len(content) if end == -1 else end + 1
+    return len(content)
+
+
+def table_ids(content, include_comments=False):
+    """Ids of the tables on the page in the order they appear. Tables inside comments are skipped unless
+    include_comments is True (a full BeautifulSoup parse doesn't see them either)"""
+    content = _as_bytes(content)
+    ids = []
+    for tag in _table_open.finditer(content):
+        table_id = _table_id.search(tag.group(0))
+        if table_id is None:
+            continue
+        if include_comments or not _in_comment(content, tag.start()):
+            ids.append(table_id.group(1).decode("utf-8"))
+    return ids
+
+
+def first_table_id(content):
+    """Same as soup.find_all('table')[0].get('id') without parsing the page. None if there are no tables"""
+    ids = table_ids(content)
+    return ids[0] if ids else None
+
+
+def find_table(content, table_id):
+    """Returns the raw html (bytes) of the table with the given id, including tables hidden in comments, or None"""
+    content = _as_bytes(content)
+    pattern = re.compile(rb"""<table\b[^>]*\bid\s*=\s*["']""" + re.escape(table_id.encode("utf-8")) + rb"""["']""",
+                         re.IGNORECASE)
+    match = pattern.search(content)
+    if match is None:
+        return None
+    return content[match.start():_table_end(content, match.start())]
+
+
+def find_tables(content, table_ids):
+    """find_table for several tables in one pass over the page. Returns {table id: raw html} for the ones it has"""
+    content = _as_bytes(content)
+    wanted = set(table_ids)
+    found = {}
+    for tag in _table_open.finditer(content):
+        table_id = _table_id.search(tag.group(0))
+        if table_id is None:
+            continue
+        table_id = table_id.group(1).decode("utf-8")
+        if table_id in wanted and table_id not in found:
+            found[table_id] = content[tag.start():_table_end(content, tag.start())]
+            if len(found) == len(wanted):
+                break
+    return found
+
+
+def parse_fragment(fragment):
+    """bs4 <table> tag from the raw html of one table (see find_table)"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(fragment, features=FRAGMENT_FEATURES).find("table")
+
+
+def extract_table(content, table_id):
+    """Parses only the one table out of the page. Returns the bs4 <table> tag, or None if the page doesn't have it"""
+    fragment = find_table(content, table_id)
+    if fragment is None:
+        return None
+    return parse_fragment(fragment)
+
+
+def extract_tables(content, table_ids):
+    """{table id: bs4 <table> tag} for the tables out of table_ids the page has, each parsed on its own"""
+    return {table_id: parse_fragment(fragment) for table_id, fragment in find_tables(content, table_ids).items()}
+
+
+def table_tag(source, table_id):
+    """Finds a table in either a BeautifulSoup object or the raw html of the page"""
+    if isinstance(source, (bytes, str)):
+        return extract_table(source, table_id)
+    return source.find('table', attrs={"id": table_id})
+
+
+def required_table(source, table_id):
+    """table_tag that raises MissingTable instead of returning None"""
+    table = table_tag(source, table_id)
+    if table is None:
+        raise MissingTable(table_id)
+    return table
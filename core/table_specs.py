@@ -0,0 +1,222 @@
+"""Which table, rows and columns each scraper reads, as data instead of slices.
+
+The stat readers used to find their columns by position: the WR summary was all_headings[9:21] of every <th> in
+the table and cells [5:17] of the career row, batting was the first 30 <th>, the season table skipped the first 8.
+Any extra column on the page (a new "No." column, a second over-header) shifted every one of those, and the only
+position anyone had written slices for was WR.
+
+A TableSpec names the table, which rows to read (body seasons, the career row or the whole tfoot) and the columns
+to keep by their heading. Repeated headings are told apart the way schemas.unique_columns names them, so the
+rushing "Yds" after the receiving one is "Yds.1". Specs live in a registry keyed by (sport, position, kind), so a new
+position is a register() call and not new parsing code.
+
+extract_rows compiles a spec against the heading row of the page it is given into an Extractor (the cell index of
+every column) and keeps it, keyed by the raw bytes of the table's <thead>. Every later page with the same header
+reuses it after one dict lookup, without walking the headings again, and only the <tbody> or <tfoot> the spec
+reads gets parsed. Each row is checked against the width of the compiled header, and a row that doesn't fit raises
+schemas.SchemaMismatch instead of shifting its cells into the wrong columns.
+"""
+import re
+import threading
+from collections import namedtuple, OrderedDict
+
+from .schemas import TABLE_DTYPES, TEXT, LABEL, SchemaMismatch, unique_columns
+from .table_extract import find_table, parse_fragment, MissingTable
+from .metrics import get_metrics
+
+
+SEASONS = "seasons"
+SUMMARY = "summary"
+
+BODY = "body"      # every tbody row with one of the spec's classes ("" for rows without a class)
+FOOT = "foot"      # every tfoot row
+CAREER = "career"  # the first tfoot row only
+
+MAX_LAYOUTS = 256  # compiled extractors kept, there are only ever a handful of header layouts per table
+
+# name is the schemas.TABLE_DTYPES entry the rows are typed with (and the summary table's name). columns is
+# ((column, heading), ...), or None to keep every column under the page's own headings
+TableSpec = namedtuple("TableSpec", ["name", "sport", "position", "kind", "table_id", "columns", "rows", "classes"])
+
+_specs = {}
+
+
+def register(spec):
+    """Adds a spec to the registry, replacing any with the same (sport, position, kind). A summary spec also gets
+    column types in schemas.TABLE_DTYPES under its name (from its source table's, plus Name and HOF), unless it
+    already has some"""
+    _specs[spec.sport, spec.position, spec.kind] = spec
+    if spec.kind == SUMMARY and spec.columns is not None and spec.name not in TABLE_DTYPES:
+        source = TABLE_DTYPES.get(spec.table_id, {})
+        dtypes = {column: source.get(column.split(".")[0], TEXT) for column, _ in spec.columns}
+        dtypes.update(Name=TEXT, HOF=LABEL)
+        TABLE_DTYPES[spec.name] = dtypes
+    return spec
+
+
+def get_spec(sport, position, kind=SEASONS):
+    """The registered spec, i.e. get_spec("football", "WR", "summary"). KeyError lists the positions there are"""
+    try:
+        return _specs[sport, position, kind]
+    except KeyError:
+        known = sorted(p for s, p, k in _specs if s == sport and k == kind)
+        raise KeyError("no {0} {1} table for {2!r}, there are {3}".format(sport, kind, position, known)) from None
+
+
+def positions(sport, kind=SEASONS):
+    return sorted(p for s, p, k in _specs if s == sport and k == kind)
+
+
+def summary_columns(spec):
+    """Columns of a summary row as stored: the spec's columns, then Name and HOF"""
+    return output_columns(spec) + ["Name", "HOF"]
+
+
+def output_columns(spec):
+    return [column for column, _ in spec.columns]
+
+
+def any_table(table_id, classes=("full", "")):
+    """Spec for every column of a table that has no spec of its own (see player_scrape.table_rows)"""
+    return TableSpec(table_id, None, None, SEASONS, table_id, None, BODY, tuple(classes))
+
+
+def _same(*headings):
+    return tuple((heading, heading) for heading in headings)
+
+
+_RECEIVING = ("GS", "Tgt", "Rec", "Yds", "Y/R", "TD", "1D", "Lng", "R/G", "Y/G", "Ctch%", "Y/Tgt")
+_RUSHING = ("G", "GS", "Att", "Yds", "TD", "1D", "Lng", "Y/A", "Y/G", "A/G", "Tgt", "Rec", "Yds.1", "Y/R", "TD.1",
+            "Ctch%", "YScm", "RRTD", "Fmb")
+_PASSING = ("G", "GS", "QBrec", "Cmp", "Att", "Cmp%", "Yds", "TD", "TD%", "Int", "Int%", "1D", "Lng", "Y/A", "AY/A",
+            "Y/C", "Y/G", "Rate", "Sk", "Yds.1", "NY/A", "ANY/A", "Sk%", "4QC", "GWD", "AV")
+_NFL_ROWS = ("full_table", "")
+_MLB_ROWS = ("full", "")
+_MLB_SUMMARY = {"batting_standard": list(TABLE_DTYPES["batting_standard"])[4:],
+                "pitching_standard": list(TABLE_DTYPES["pitching_standard"])[4:]}
+
+for _position in ("WR", "TE"):
+    register(TableSpec("receiving_and_rushing", "football", _position, SEASONS, "receiving_and_rushing", None, BODY,
+                       _NFL_ROWS))
+    register(TableSpec("nfl_{0}_summary".format(_position.lower()), "football", _position, SUMMARY,
+                       "receiving_and_rushing", _same(*_RECEIVING), CAREER, ()))
+register(TableSpec("rushing_and_receiving", "football", "RB", SEASONS, "rushing_and_receiving", None, BODY, _NFL_ROWS))
+register(TableSpec("nfl_rb_summary", "football", "RB", SUMMARY, "rushing_and_receiving", _same(*_RUSHING), CAREER, ()))
+register(TableSpec("passing", "football", "QB", SEASONS, "passing", None, BODY, _NFL_ROWS))
+register(TableSpec("nfl_qb_summary", "football", "QB", SUMMARY, "passing", _same(*_PASSING), CAREER, ()))
+
+for _position, _table_id in (("batter", "batting_standard"), ("pitcher", "pitching_standard")):
+    register(TableSpec(_table_id, "baseball", _position, SEASONS, _table_id, _same(*TABLE_DTYPES[_table_id]), BODY,
+                       _MLB_ROWS))
+    # the tfoot's first cell ("17 Yrs", "162 Game Avg.") spans Year/Age/Tm/Lg, it is kept as Summary
+    register(TableSpec(_table_id, "baseball", _position, SUMMARY, _table_id,
+                       (("Summary", "Year"),) + _same(*_MLB_SUMMARY[_table_id]), FOOT, ()))
+
+
+class Extractor:
+    """A spec compiled against one header layout: `index` is the cell each output column comes from and `width`
+    the number of cells every row has to have"""
+    __slots__ = ("spec", "columns", "index", "width")
+
+    def __init__(self, spec, headings):
+        self.spec = spec
+        self.width = len(headings)
+        if spec.columns is None:
+            self.columns = list(headings)
+            self.index = tuple(range(len(headings)))
+            return
+        positions = {heading: i for i, heading in enumerate(unique_columns(headings))}
+        missing = [heading for _, heading in spec.columns if heading not in positions]
+        if missing:
+            raise SchemaMismatch("{0} has no {1} column on this page (headings: {2})".format(
+                spec.table_id, ", ".join(missing), ", ".join(headings)))
+        self.columns = output_columns(spec)
+        self.index = tuple(positions[heading] for _, heading in spec.columns)
+
+    def row(self, cells):
+        if len(cells) != self.width:
+            raise SchemaMismatch("{0} row has {1} cells, its header has {2}".format(self.spec.table_id, len(cells),
+                                                                                     self.width))
+        return [cells[i] for i in self.index]
+
+
+_thead = re.compile(rb"<thead\b.*?</thead>", re.IGNORECASE | re.DOTALL)
+_sections = {BODY: re.compile(rb"<tbody\b.*?</tbody>", re.IGNORECASE | re.DOTALL),
+             FOOT: re.compile(rb"<tfoot\b.*?</tfoot>", re.IGNORECASE | re.DOTALL)}
+_sections[CAREER] = _sections[FOOT]
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def _cells(tr):
+    """Cell texts of a row, a cell with colspan=n counted n times so the row lines up with the heading row"""
+    cells = []
+    for cell in tr.find_all(["th", "td"], recursive=False):
+        text = cell.get_text()
+        try:
+            span = int(cell.get("colspan", 1))
+        except ValueError:
+            span = 1
+        cells.extend([text] * max(span, 1))
+    return cells
+
+
+def _wanted(tr, classes):
+    # a row can have several classes in any order ("full_table sorted"), any one of them being wanted is enough
+    row_classes = tr.get("class") or ()
+    return not classes.isdisjoint(row_classes) if row_classes else "" in classes
+
+
+def _section(fragment, pattern):
+    match = pattern.search(fragment)
+    return parse_fragment(b"<table>" + match.group(0) + b"</table>") if match is not None else None
+
+
+def extractor(spec, fragment):
+    """The Extractor for a table's raw html, compiled the first time its header layout is seen"""
+    head = _thead.search(fragment)
+    key = (spec, head.group(0) if head is not None else b"")
+    with _compiled_lock:
+        found = _compiled.get(key)
+        if found is not None:
+            _compiled.move_to_end(key)
+            return found
+    if head is not None:
+        heading_row = parse_fragment(b"<table>" + head.group(0) + b"</table>").find("thead").find_all("tr")[-1]
+    else:
+        heading_row = parse_fragment(fragment).find("tr")
+    found = Extractor(spec, _cells(heading_row) if heading_row is not None else [])
+    get_metrics().inc("table_layouts_compiled_total", table=spec.table_id)
+    with _compiled_lock:
+        _compiled[key] = found
+        if len(_compiled) > MAX_LAYOUTS:
+            _compiled.popitem(last=False)
+    return found
+
+
+def extract_rows(source, spec):
+    """(columns, rows of cell strings) of the spec's table on a page. source is the page's raw html, or the raw html
+    of just the table (find_table). Raises table_extract.MissingTable without the table, and SchemaMismatch when the
+    page lacks a column the spec wants or a row doesn't fit the header"""
+    with get_metrics().timer("parse_table_seconds", table=spec.table_id):
+        fragment = find_table(source, spec.table_id)
+        if fragment is None:
+            raise MissingTable(spec.table_id)
+        compiled = extractor(spec, fragment)
+        section = _section(fragment, _sections[spec.rows])
+        if section is not None:
+            container = section.find("tfoot" if spec.rows in (FOOT, CAREER) else "tbody")
+        else:  # rows straight under <table>, the thead's are inside it and not picked up
+            container = parse_fragment(fragment) if spec.rows == BODY else None
+        rows = []
+        classes = frozenset(spec.classes)
+        if container is not None:
+            for tr in container.find_all("tr", recursive=False):
+                if spec.rows == BODY and not _wanted(tr, classes):
+                    continue
+                rows.append(compiled.row(_cells(tr)))
+                if spec.rows == CAREER:
+                    break
+        if spec.rows == CAREER and not rows:
+            raise MissingTable("{0} career row".format(spec.table_id))
+    return compiled.columns, rows
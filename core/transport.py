@@ -0,0 +1,306 @@
+"""The one place pages are actually downloaded. get_page, the page cache and the corpus recorder all go through
+get_transport(), which keeps a single requests.Session so connections to a site are reused instead of paying a TCP
+and TLS handshake for every page, asks for compressed pages (brotli too if the brotli package is installed), and
+never waits forever on a server that stopped answering.
+
+Throttled (429) and failed (5xx, dropped connection, timeout) requests are retried: after the Retry-After the site
+asked for if it sent one, otherwise after an exponential backoff. A Retry-After also pauses every other request to
+that host, since they would only get the same answer. Once the retries run out, or if the site wants a longer break
+than max_retry_after, an HTTPStatusError is raised, so an error page is never handed to a parser as if it were data.
+
+How many requests a host gets at once is decided by an AdaptiveLimit (AIMD): it goes up by one per round of requests
+while responses come back about as fast as the fastest ones seen, holds while they are slowing down, and is halved
+on a 429 or 5xx. The fetch_pages thread count is the most it can reach, the rate limiter still applies on top.
+"""
+import email.utils
+import importlib.util
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .metrics import get_metrics, record_response, error_cause
+
+
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0  # seconds before the first retry without a Retry-After, doubled for every retry after that
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_MAX_RETRY_AFTER = 120.0  # a site asking for a longer break than this gets an error instead of a wait
+DEFAULT_INITIAL_CONCURRENCY = 4
+DEFAULT_MAX_CONCURRENCY = 64
+USER_AGENT = "sportscrape/0.1 (+https://github.com/nickblackmore/sportscrape)"
+
+
+def _accept_encoding():
+    # urllib3 only decodes brotli when one of these is installed, asking for it otherwise would get undecodable pages
+    if any(importlib.util.find_spec(module) is not None for module in ("brotli", "brotlicffi")):
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
+
+class HTTPStatusError(IOError):
+    """A page that came back with an error status, after any retries. `response` is None if the request was never
+    sent because the host is paused for longer than max_retry_after"""
+
+    def __init__(self, url, status, response=None, retry_after=None):
+        super().__init__("{0} for {1}{2}".format(status, url, " (retry after {0:.0f}s)".format(retry_after)
+                                                 if retry_after is not None else ""))
+        self.url = url
+        self.status = status
+        self.response = response
+        self.retry_after = retry_after
+        self.cause = "http_{0}".format(status)  # see metrics.error_cause
+
+
+class Throttled(HTTPStatusError):
+    """429: the site wants fewer requests. retry_after is how long it asked for, if it said"""
+
+
+class PageNotFound(HTTPStatusError, LookupError):
+    """404/410. A LookupError like table_extract.MissingTable, so the callers that treat a missing table as a missing
+    player handle it the same way"""
+
+
+def status_error(url, status, response=None, retry_after=None):
+    if status == 429:
+        return Throttled(url, status, response, retry_after)
+    if status in (404, 410):
+        return PageNotFound(url, status, response, retry_after)
+    return HTTPStatusError(url, status, response, retry_after)
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header, which is either a number of seconds or an HTTP date. None if missing or
+    unreadable"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class AdaptiveLimit:
+    """AIMD limit on the number of requests in flight to one host. Thread safe.
+
+    A response counts as fast if it took no more than `tolerance` times the fastest recent one. Every fast response
+    adds 1/limit, so the limit grows by about one per round of requests. Slower responses leave it alone: the site
+    is queueing them, more requests would only queue more. A congested one (429, 5xx, dropped) multiplies it by
+    `decrease`, once per round, so a burst of failures from requests that were all sent before the first cut doesn't
+    halve it over and over.
+
+    ---Arguments---
+
+    -initial:       limit to start from
+    -minimum:       the limit never drops below this
+    -maximum:       or rises above this
+    -decrease:      factor the limit is multiplied by on congestion
+    -tolerance:     how much slower than the fastest recent response a response can be and still count as fast
+    """
+
+    def __init__(self, initial=DEFAULT_INITIAL_CONCURRENCY, minimum=1, maximum=DEFAULT_MAX_CONCURRENCY, decrease=0.5,
+                 tolerance=2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        self.best = None
+        self.paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Blocks until there is room for another request and the host isn't paused. Returns the start time to hand
+        to release"""
+        with self._cond:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < int(self.limit):
+                    break
+                self._cond.wait(pause if pause > 0 else None)
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, congested=False):
+        now = time.monotonic()
+        latency = now - started
+        with self._cond:
+            self.in_flight -= 1
+            if congested:
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self._last_decrease = now
+            else:
+                # drifts up towards slower responses so one lucky fast page doesn't make everything after it slow
+                self.best = latency if self.best is None else min(latency, self.best + 0.05 * (latency - self.best))
+                if latency <= self.best * self.tolerance + 0.001:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+            return self.limit
+
+    def pause(self, seconds):
+        """Holds back every request to the host for seconds (i.e. a Retry-After)"""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+    def paused_for(self):
+        return max(0.0, self.paused_until - time.monotonic())
+
+    def as_dict(self):
+        return {"limit": self.limit, "in_flight": self.in_flight, "paused_for": self.paused_for(),
+                "best_latency_ms": 1000 * self.best if self.best is not None else None}
+
+
+class Transport:
+    """Shared requests.Session plus per host AdaptiveLimits and retries. Safe to use from many threads.
+
+    ---Arguments---
+
+    -timeout:           (connect, read) seconds, or one number for both
+    -retries:           retries after the first attempt for 429s, 5xx and connection errors
+    -backoff:           seconds before the first retry when the site sent no Retry-After, doubled for each retry
+    -max_backoff:       cap on that backoff
+    -max_retry_after:   longest Retry-After that is waited out, a longer one raises Throttled straight away
+    -pool_size:         connections kept open per host. Should be at least the fetch concurrency
+    -concurrency:       (initial, maximum) for each host's AdaptiveLimit
+    -min_concurrency:   the least it backs off to. Set it to the maximum for a fixed limit
+    -headers:           extra headers sent with every request
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, max_retry_after=DEFAULT_MAX_RETRY_AFTER, pool_size=32,
+                 concurrency=(DEFAULT_INITIAL_CONCURRENCY, DEFAULT_MAX_CONCURRENCY), min_concurrency=1, headers=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.pool_size = pool_size
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.headers = {"User-Agent": USER_AGENT, "Accept-Encoding": _accept_encoding()}
+        self.headers.update(headers or {})
+        self._session = None
+        self._pid = None
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        # a session's pooled sockets can't be shared with a forked child, it gets its own
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                import requests  # only loaded once something is actually downloaded
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(self.headers)
+                self._session, self._pid = session, os.getpid()
+            return self._session
+
+    def limit(self, url):
+        """The AdaptiveLimit for the url's host"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._limits:
+                initial, maximum = self.concurrency
+                self._limits[host] = AdaptiveLimit(initial, self.min_concurrency, maximum)
+            return self._limits[host]
+
+    def _backoff_for(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def request(self, url, headers=None):
+        """GETs url and returns the requests response. 304 and other non error responses are returned as they are,
+        error statuses raise HTTPStatusError (Throttled for 429, PageNotFound for 404/410) once retries run out,
+        and so do connection errors and timeouts"""
+        import requests
+        session = self.session
+        limit = self.limit(url)
+        metrics = get_metrics()
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            paused = limit.paused_for()
+            if paused > self.max_retry_after:
+                raise Throttled(url, 429, retry_after=paused)
+
+            started = limit.acquire()
+            try:
+                response = session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.set("concurrency_limit", limit.release(started, congested=True), host=host)
+                error, delay = e, self._backoff_for(attempt)
+            else:
+                status = response.status_code
+                congested = status == 429 or status >= 500
+                metrics.set("concurrency_limit", limit.release(started, congested), host=host)
+                record_response(response)
+                if not congested:
+                    if status >= 400:
+                        raise status_error(url, status, response)
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                error = status_error(url, status, response, retry_after)
+                if retry_after is None:
+                    delay = self._backoff_for(attempt)
+                else:
+                    limit.pause(retry_after)  # the next acquire waits it out, along with everyone else's
+                    if retry_after > self.max_retry_after:
+                        raise error
+                    delay = 0.0
+
+            if attempt == self.retries:
+                raise error
+            metrics.inc("http_retries_total", reason=error_cause(error))
+            if delay:
+                time.sleep(delay)
+
+    def get(self, url, headers=None):
+        """Body of the page at url, see request"""
+        return self.request(url, headers=headers).content
+
+    def stats(self):
+        """{host: AdaptiveLimit.as_dict()}"""
+        with self._lock:
+            limits = dict(self._limits)
+        return {host: limit.as_dict() for host, limit in limits.items()}
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """The Transport every download goes through, made with the defaults the first time it is needed"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+        return _transport
+
+
+def configure_transport(**kwargs):
+    """Replaces the shared Transport with one made from kwargs (see Transport) and returns it"""
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = Transport(**kwargs)
+        return _transport
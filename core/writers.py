@@ -0,0 +1,255 @@
+import os
+import time
+
+import pandas as pd
+
+from .schemas import sql_ready, sql_rows, sql_type, frame_from_rows
+from .sessions import get_database
+from .metrics import get_metrics
+
+
+MLB_ROSTER_TABLE = "all_players_table"
+NFL_ROSTER_TABLE = "all_nfl_players_table"
+
+# (column, sqlite type) in the order the roster functions build their row_vals. Same layout the tables were
+# originally created with through SQLAlchemy so existing databases keep working
+MLB_ROSTER_COLUMNS = [("Id", "INTEGER NOT NULL"), ("Name", "VARCHAR"), ("First", "INTEGER"), ("Last", "INTEGER"),
+                      ("HOF", "VARCHAR"), ("HREF", "VARCHAR")]
+NFL_ROSTER_COLUMNS = [("Id", "INTEGER NOT NULL"), ("Position", "VARCHAR"), ("Name", "VARCHAR"), ("First", "INTEGER"),
+                      ("Last", "INTEGER"), ("HOF", "VARCHAR"), ("HREF", "VARCHAR")]
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_FLUSH_ROWS = 500
+DEFAULT_FLUSH_SECONDS = 5.0
+
+
+class RosterWriter:
+    """Batched upserts into a roster table over a single sqlite connection.
+
+    Rows are buffered with add() and written with one executemany of an INSERT ... ON CONFLICT DO UPDATE every
+    batch_size rows, each batch in its own transaction. sqlite keeps the compiled statement in its statement cache so
+    it is only prepared once. Use as a context manager (or call close()) so the last partial batch gets written.
+
+    A row that is already stored with the same values is left alone, so re-loading an unchanged roster writes nothing
+    (rows_changed counts the rows actually inserted or updated). Columns missing from an older table are added.
+
+    ---Arguments---
+
+    -abs_path:      path of the sqlite database. Created along with the table if it doesn't exist
+    -table:         name of the roster table
+    -columns:       list of (column, type) pairs. row_vals passed to add() must be in the same order
+    -key:           primary key column to upsert on
+    -batch_size:    number of rows per transaction
+    """
+
+    def __init__(self, abs_path, table, columns, key="Id", batch_size=DEFAULT_BATCH_SIZE):
+        if not os.path.isfile(abs_path):
+            print("Creating new database!")
+
+        self.abs_path = abs_path
+        self.table = table
+        self.columns = [name for name, _ in columns]
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self.rows_changed = 0
+        self._rows = []
+
+        self._database = get_database(abs_path)
+        self.connection = self._database.checkout()
+        definitions = ", ".join('"{0}" {1}'.format(name, sql_type) for name, sql_type in columns)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS "{0}" ({1}, PRIMARY KEY ("{2}"))'.format(
+            table, definitions, key))
+        existing = {row[1] for row in self.connection.execute('PRAGMA table_info("{0}")'.format(table))}
+        for name, sql_type in columns:
+            if name not in existing:
+                self.connection.execute('ALTER TABLE "{0}" ADD COLUMN "{1}" {2}'.format(
+                    table, name, sql_type.replace(" NOT NULL", "")))
+        self.connection.commit()
+
+        quoted = ", ".join('"{0}"'.format(name) for name in self.columns)
+        others = [name for name in self.columns if name != key]
+        updates = ", ".join('"{0}" = excluded."{0}"'.format(name) for name in others)
+        changed = " OR ".join('"{0}" IS NOT excluded."{0}"'.format(name) for name in others)
+        self._sql = 'INSERT INTO "{0}" ({1}) VALUES ({2}) ON CONFLICT("{3}") DO UPDATE SET {4} WHERE {5}'.format(
+            table, quoted, ", ".join("?" * len(self.columns)), key, updates, changed)
+
+    def add(self, row_vals):
+        row_vals = tuple(row_vals)
+        if len(row_vals) < len(self.columns):  # i.e. rows from before a column was added
+            row_vals += (None,) * (len(self.columns) - len(row_vals))
+        self._rows.append(row_vals)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, rows):
+        for row_vals in rows:
+            self.add(row_vals)
+
+    def flush(self):
+        if not self._rows:
+            return
+        with self.connection:  # one transaction per batch, rolled back if any row fails
+            cursor = self.connection.executemany(self._sql, self._rows)
+        self.rows_changed += cursor.rowcount  # skipped no-op updates aren't counted
+        self.rows_written += len(self._rows)
+        self._rows = []
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._database.release(self.connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def mlb_roster_writer(abs_path, table=MLB_ROSTER_TABLE, batch_size=DEFAULT_BATCH_SIZE):
+    return RosterWriter(abs_path, table, MLB_ROSTER_COLUMNS, batch_size=batch_size)
+
+
+def nfl_roster_writer(abs_path, table=NFL_ROSTER_TABLE, batch_size=DEFAULT_BATCH_SIZE):
+    return RosterWriter(abs_path, table, NFL_ROSTER_COLUMNS, batch_size=batch_size)
+
+
+class BufferedSink:
+    """Collects scraped DataFrames for one table and appends them with a single executemany inside one transaction
+    every flush_rows rows or flush_seconds seconds, whichever comes first, instead of a to_sql and commit per player.
+    Use as a context manager (or call close()) so whatever is left gets flushed at the end.
+
+    add_rows can also route rows to other tables (table=...), i.e. the pitching and fielding tables scraped from the
+    same page as the batting. Every table is written in the same transaction as the on_flush call.
+
+    Keeps track of how long each flush takes, see stats(). Flush times and rows written per table also go to
+    metrics.get_metrics().
+
+    ---Arguments---
+
+    -abs_path:          path of the sqlite database
+    -table:             destination table. Created from the first flush's columns if it doesn't exist
+    -flush_rows:        number of buffered rows that triggers a flush
+    -flush_seconds:     a flush also happens on the first add() after this many seconds since the last one
+    -on_flush:          optional function(connection, tags) called inside the flush transaction with the tags of the
+                        frames being written. jobs.JobQueue.mark_done uses it so players are only marked done in the
+                        same commit that stores their rows
+    """
+
+    def __init__(self, abs_path, table, flush_rows=DEFAULT_FLUSH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS,
+                 on_flush=None):
+        if not os.path.isfile(abs_path):
+            print("Creating new database!")
+
+        self.abs_path = abs_path
+        self.table = table
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.on_flush = on_flush
+        self._database = get_database(abs_path)
+        self.connection = self._database.checkout()
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.flush_time = 0.0
+        self.max_flush_time = 0.0
+        self._frames = []
+        self._rows = {}  # (table, columns, table_id) -> raw rows, typed all at once when flushed
+        self._tags = []
+        self._buffered = 0
+        self._started = time.perf_counter()
+        self._last_flush = time.monotonic()
+
+    def add_frame(self, df, tag=None):
+        self._frames.append(df)
+        self._added(len(df), tag)
+
+    def add_row(self, values, columns, tag=None):
+        self.add_frame(pd.DataFrame([values], columns=columns), tag=tag)
+
+    def add_rows(self, rows, columns, table_id=None, tag=None, table=None):
+        """Buffers rows of scraped cell strings. They are turned into one typed frame per flush with
+        schemas.frame_from_rows, rather than a small frame per player. table defaults to the sink's table"""
+        self._rows.setdefault((table or self.table, tuple(columns), table_id), []).extend(rows)
+        self._added(len(rows), tag)
+
+    def add_tables(self, tables, tag=None):
+        """add_rows for several tables at once, {table: (rows, columns, table_id)}. They always end up in the same
+        flush, so a tag is never committed with only some of its tables"""
+        for table, (rows, columns, table_id) in tables.items():
+            self._rows.setdefault((table, tuple(columns), table_id), []).extend(rows)
+        self._added(sum(len(rows) for rows, _, _ in tables.values()), tag)
+
+    def _added(self, n, tag):
+        if tag is not None:
+            self._tags.append(tag)
+        self._buffered += n
+        if self._buffered >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._frames and not self._tags and not self._rows:
+            return
+        metrics = get_metrics()
+        start = time.perf_counter()
+        with metrics.stage("flush"):
+            tables = {self.table: list(self._frames)} if self._frames else {}
+            for (table, columns, table_id), rows in self._rows.items():
+                if rows:
+                    tables.setdefault(table, []).append(frame_from_rows(rows, list(columns), table_id))
+            ready = {table: sql_ready(frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True))
+                     for table, frames in tables.items()}
+            with self.connection:
+                if self.on_flush is not None:
+                    # before the inserts, so a refresh can delete a player's old rows ahead of the new ones
+                    self.on_flush(self.connection, self._tags)
+                for table, df in ready.items():
+                    _append(self.connection, table, df)
+        took = time.perf_counter() - start
+        for table, df in ready.items():
+            metrics.inc("rows_written_total", len(df), table=table)
+
+        self.rows_written += sum(len(df) for df in ready.values())
+        self.flushes += 1
+        self.flush_time += took
+        self.max_flush_time = max(self.max_flush_time, took)
+        self._frames = []
+        self._rows = {}
+        self._tags = []
+        self._buffered = 0
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started
+        return {"rows": self.rows_written, "flushes": self.flushes,
+                "mean_flush_ms": 1000 * self.flush_time / self.flushes if self.flushes else 0.0,
+                "max_flush_ms": 1000 * self.max_flush_time,
+                "rows_per_sec": self.rows_written / elapsed if elapsed else 0.0}
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._database.release(self.connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _append(connection, table, df):
+    # to_sql would commit on its own, this stays inside the caller's transaction. Columns are named in the insert and
+    # ones the table doesn't have yet are added, so frames don't have to match the table's column order
+    existing = {row[1] for row in connection.execute('PRAGMA table_info("{0}")'.format(table))}
+    if not existing:
+        connection.execute(pd.io.sql.get_schema(df, table, con=connection))
+    else:
+        for column, dtype in df.dtypes.items():
+            if column not in existing:
+                connection.execute('ALTER TABLE "{0}" ADD COLUMN "{1}" {2}'.format(table, column, sql_type(dtype)))
+    connection.executemany('INSERT INTO "{0}" ({1}) VALUES ({2})'.format(
+        table, ", ".join('"{0}"'.format(column) for column in df.columns), ", ".join("?" * len(df.columns))),
+        sql_rows(df))
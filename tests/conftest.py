@@ -0,0 +1,16 @@
+import pytest
+
+from sportscrape import player_scrape
+from sportscrape.benchmarks.pages import SyntheticSite
+from sportscrape.benchmarks.standin import StandInServer
+
+
+@pytest.fixture
+def site():
+    """A StandInServer for a SyntheticSite of 30 wide receivers, with every download sent to it"""
+    with StandInServer(SyntheticSite(30, positions=["WR"])) as server:
+        player_scrape.redirect_to(server.url)
+        try:
+            yield server
+        finally:
+            player_scrape.redirect_to(None)
@@ -0,0 +1,16 @@
+"""Small hand written pages for the tests, shaped like the Sports Reference ones"""
+from sportscrape.schemas import TABLE_DTYPES
+
+
+def mlb_page(table_id="batting_standard", seasons=((1954, 1),)):
+    """A baseball-reference player page whose first table is table_id, one row per (year, value) in seasons with
+    every stat set to value, and a tfoot with their sum"""
+    headings = list(TABLE_DTYPES[table_id])
+    head = "".join("<th>{0}</th>".format(h) for h in headings)
+    body = "".join('<tr class="full"><th>{0}</th><td>25</td><td>MLN</td><td>NL</td>{1}</tr>'.format(
+        year, "<td>{0}</td>".format(value) * (len(headings) - 4)) for year, value in seasons)
+    total = sum(value for _, value in seasons)
+    foot = '<tr><th colspan="4">{0} Yrs</th>{1}</tr>'.format(len(seasons),
+                                                             "<td>{0}</td>".format(total) * (len(headings) - 4))
+    return ('<html><body><table id="{0}"><thead><tr>{1}</tr></thead><tbody>{2}</tbody><tfoot>{3}</tfoot></table>'
+            '</body></html>').format(table_id, head, body, foot).encode()
@@ -0,0 +1,113 @@
+import sqlite3
+
+import pytest
+
+from sportscrape import pipeline
+from sportscrape.add_rows_to_db import nfl_stat_builder
+from sportscrape.aggregates import materialize, career
+from sportscrape.benchmarks.pages import nfl_player_page
+from sportscrape.writers import nfl_roster_writer
+
+
+COLUMNS = ["player_id", "name", "Year", "Tm", "G", "Tgt", "Rec", "Yds", "TD"]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "stats.db")
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE seasons (player_id INTEGER, name TEXT, Year INTEGER, Tm TEXT, G INTEGER, '
+                       'Tgt INTEGER, Rec INTEGER, Yds INTEGER, TD INTEGER)')
+    connection.executemany("INSERT INTO seasons VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        (1, "Jerry Rice", 1985, "SFO", 16, None, 49, 927, 3),
+        (1, "Jerry Rice", 1986, "SFO", 16, None, 86, 1570, 15),
+        (2, "Cris Carter", 1987, "PHI", 9, None, 5, 84, 2),
+        (2, "Cris Carter", 1988, "PHI", 16, None, 39, 548, 6),
+    ])
+    connection.commit()
+    connection.close()
+    return path
+
+
+def write(path, sql, rows=()):
+    connection = sqlite3.connect(path)
+    connection.executemany(sql, rows) if rows else connection.execute(sql)
+    connection.commit()
+    connection.close()
+
+
+def career_yards(path):
+    connection = sqlite3.connect(path)
+    yards = dict(connection.execute("SELECT player_id, Yds FROM seasons_career"))
+    connection.close()
+    return yards
+
+
+def test_first_run_covers_every_player(db):
+    assert materialize(db, "seasons", "receiving_and_rushing") == {"seasons_career": 2, "seasons_peak3": 2,
+                                                                   "seasons_era": 2}
+    assert career_yards(db) == {1: 2497, 2: 632}
+
+
+def test_nothing_changed_recomputes_nobody(db):
+    materialize(db, "seasons", "receiving_and_rushing")
+    assert set(materialize(db, "seasons", "receiving_and_rushing").values()) == {0}
+
+
+def test_deleted_and_reinserted_rows_are_picked_up(db):
+    # what a refresh does to a player, and the new rows get the rowids the deleted ones had
+    materialize(db, "seasons", "receiving_and_rushing")
+    write(db, "DELETE FROM seasons WHERE player_id = 2")
+    write(db, "INSERT INTO seasons VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        (2, "Cris Carter", 1987, "PHI", 9, None, 5, 84, 2),
+        (2, "Cris Carter", 1988, "PHI", 16, None, 39, 1548, 6),
+    ])
+    assert materialize(db, "seasons", "receiving_and_rushing")["seasons_career"] == 1
+    assert career_yards(db) == {1: 2497, 2: 1632}
+
+
+def test_updates_and_new_players(db):
+    materialize(db, "seasons", "receiving_and_rushing")
+    write(db, "UPDATE seasons SET Yds = 1000 WHERE player_id = 1 AND Year = 1985")
+    write(db, "INSERT INTO seasons VALUES (3, 'Tim Brown', 1988, 'RAI', 16, NULL, 43, 725, 5)")
+    assert materialize(db, "seasons", "receiving_and_rushing")["seasons_career"] == 2
+    assert career_yards(db) == {1: 2570, 2: 632, 3: 725}
+
+
+def test_player_without_rows_loses_summary(db):
+    materialize(db, "seasons", "receiving_and_rushing")
+    write(db, "DELETE FROM seasons WHERE player_id = 1")
+    materialize(db, "seasons", "receiving_and_rushing")
+    assert career_yards(db) == {2: 632}
+
+
+def test_missing_table(tmp_path):
+    assert set(materialize(str(tmp_path / "empty.db"), "seasons", "receiving_and_rushing").values()) == {0}
+
+
+def test_career_rates_come_from_totals():
+    import pandas as pd
+    seasons = pd.DataFrame([(1, 2000, "SFO", 10, 100), (1, 2001, "SFO", 30, 100)],
+                           columns=["player_id", "Year", "Tm", "Rec", "Yds"])
+    totals = career(seasons, "receiving_and_rushing").iloc[0]
+    assert totals["Yds"] == 200
+    assert totals["Y/R"] == pytest.approx(5.0)  # not the mean of 10.0 and 3.33
+
+
+def test_seasons_build_materializes(tmp_path, monkeypatch):
+    def fetch_pages(jobs, **kwargs):
+        for job, url in jobs:
+            yield job, url, nfl_player_page(job.name, seed=job.data["Id"], seasons=4), None
+    monkeypatch.setattr(pipeline, "fetch_pages", fetch_pages)
+
+    path = str(tmp_path / "nfl.db")
+    with nfl_roster_writer(path) as writer:
+        writer.add_many([(1, "WR", "Jerry Rice", 1985, 2004, "Yes", "/players/R/RiceJe00.htm"),
+                         (2, "WR", "Cris Carter", 1987, 2002, "Yes", "/players/C/CartCr00.htm")])
+    nfl_stat_builder(database=path, destination_table="nfl_receiving", position="WR", rate=None, processes=0,
+                     seasons=True)
+    connection = sqlite3.connect(path)
+    players = connection.execute("SELECT COUNT(DISTINCT player_id) FROM nfl_receiving").fetchone()[0]
+    summaries = connection.execute("SELECT COUNT(*) FROM nfl_receiving_career").fetchone()[0]
+    connection.close()
+    assert players == 2 and summaries == players
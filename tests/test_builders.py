@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+from sportscrape import add_rows_to_db, pipeline
+from sportscrape.add_rows_to_db import mlb_create_annual_db, nfl_stat_builder
+from sportscrape.benchmarks.pages import nfl_player_page
+from sportscrape.cache import RETIRED_TTL
+from sportscrape.players_list import current_season
+from sportscrape.writers import mlb_roster_writer, nfl_roster_writer
+
+from helpers import mlb_page
+
+
+ROSTER = [(1, "WR", "Jerry Rice", 1985, 2004, "Yes", "/players/R/RiceJe00.htm"),
+          (2, "WR", "Randy Moss", 1998, 2010, "Yes", "/players/M/MossRa00.htm"),
+          (3, "WR", "Wes Welker", 2004, 2011, "No", "/players/W/WelkWe00.htm")]
+
+
+def rows(path, sql):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Hands the builder pages straight from nfl_player_page and keeps the ttl it asks for per player"""
+    ttls = {}
+
+    def fetch_pages(jobs, ttl=None, **kwargs):
+        for job, url in jobs:
+            ttls[job.key] = ttl(job)
+            yield job, url, nfl_player_page(job.name, seed=job.data["Last"]), None
+    monkeypatch.setattr(pipeline, "fetch_pages", fetch_pages)
+    return ttls
+
+
+def test_nfl_build_is_checkpointed(tmp_path, downloads):
+    path = str(tmp_path / "NFL.db")
+    with nfl_roster_writer(path) as writer:
+        writer.add_many(ROSTER)
+
+    assert nfl_stat_builder(database=path, destination_table="nfl_wrs", position="WR", rate=None, processes=0) == []
+    assert sorted(name for name, in rows(path, "SELECT Name FROM nfl_wrs")) == ["Jerry Rice", "Randy Moss",
+                                                                              "Wes Welker"]
+    downloads.clear()
+    nfl_stat_builder(database=path, destination_table="nfl_wrs", position="WR", rate=None, processes=0)
+    assert downloads == {}  # everyone is done already
+    assert len(rows(path, "SELECT Name FROM nfl_wrs")) == 3
+
+
+def test_nfl_players_from_the_last_season_are_not_cached_as_retired(tmp_path, downloads, monkeypatch):
+    path = str(tmp_path / "NFL.db")
+    with nfl_roster_writer(path) as writer:
+        writer.add_many(ROSTER)
+    # the offseason after 2010, whoever played in 2010 can still play in 2011
+    monkeypatch.setattr(add_rows_to_db, "current_season", lambda sport: 2010)
+    nfl_stat_builder(database=path, destination_table="nfl_wrs", position="WR", rate=None, processes=0)
+    assert downloads == {"/players/R/RiceJe00.htm": RETIRED_TTL, "/players/M/MossRa00.htm": None,
+                         "/players/W/WelkWe00.htm": None}
+
+
+def mlb_build(path, pages, monkeypatch, **kwargs):
+    """mlb_create_annual_db with the player pages handed over from `pages` (name -> page)"""
+    def fetch_pages(jobs, **fetch_kwargs):
+        for job, url in jobs:
+            yield job, url, pages[job.name], None
+    monkeypatch.setattr(pipeline, "fetch_pages", fetch_pages)
+    mlb_create_annual_db(abs_path=path, rate=None, processes=0, **kwargs)
+
+
+def test_mlb_refresh_replaces_active_players_only(tmp_path, monkeypatch):
+    path = str(tmp_path / "mlb.db")
+    season = current_season("baseball")
+    with mlb_roster_writer(path) as writer:
+        writer.add([1, "Hank Aaron", 1954, 1976, "Yes", "/players/a/aaronha01.shtml"])
+        writer.add([2, "Barry Bonds", season - 1, season, "No", "/players/b/bondsba01.shtml"])
+
+    mlb_build(path, {"Hank Aaron": mlb_page(seasons=((1954, 1), (1955, 2))),
+                     "Barry Bonds": mlb_page(seasons=((season - 1, 3),))}, monkeypatch)
+    assert rows(path, "SELECT player_id, SUM(HR) FROM all_players_batting GROUP BY player_id ORDER BY 1") == \
+        [(1, 3), (2, 3)]
+
+    # Bonds played another season, Aaron's page changing too must not matter since he isn't re-scraped
+    mlb_build(path, {"Hank Aaron": mlb_page(seasons=((1954, 100),)),
+                     "Barry Bonds": mlb_page(seasons=((season - 1, 3), (season, 5)))}, monkeypatch, refresh=True)
+    assert rows(path, "SELECT player_id, SUM(HR), COUNT(*) FROM all_players_batting GROUP BY player_id ORDER BY 1") \
+        == [(1, 3, 2), (2, 8, 2)]
+    assert rows(path, "SELECT player_id, HR FROM all_players_batting_career ORDER BY 1") == [(1, 3), (2, 8)]
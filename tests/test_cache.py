@@ -0,0 +1,134 @@
+import os
+import threading
+
+import pytest
+
+from sportscrape import cache
+from sportscrape.cache import ResponseCache
+
+
+class Response:
+
+    def __init__(self, status_code, content=b"", headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+class Downloads:
+    """A stand in for the transport, answers with whatever responses it is given and keeps the headers it was sent"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def __call__(self, url, headers):
+        self.sent.append(dict(headers))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """cache.time.time() moves forward one second every call, so last_used never ties, and can be jumped ahead"""
+    now = [1000000.0]
+
+    def tick():
+        now[0] += 1
+        return now[0]
+    monkeypatch.setattr(cache.time, "time", tick)
+    return now
+
+
+@pytest.fixture
+def responses(tmp_path):
+    response_cache = ResponseCache(str(tmp_path / "cache"))
+    yield response_cache
+    response_cache.close()
+
+
+def test_fresh_entry_is_served_from_disk(responses, clock):
+    download = Downloads(Response(200, b"<html>rice</html>"))
+    assert responses.get("https://x/players/R/RiceJe00.htm", download=download) == b"<html>rice</html>"
+    assert responses.get("https://x/players/R/RiceJe00.htm", download=download) == b"<html>rice</html>"
+    assert len(download.sent) == 1
+    assert (responses.hits, responses.misses) == (1, 1)
+
+
+def test_expired_entry_is_revalidated_with_its_etag(responses, clock):
+    url = "https://x/players/R/RiceJe00.htm"
+    download = Downloads(Response(200, b"<html>rice</html>", {"ETag": '"v1"', "Last-Modified": "Sun, 1 Jan 2023"}),
+                         Response(304))
+    responses.get(url, download=download)
+    clock[0] += responses.ttl_for(url) + 1
+
+    assert not responses.is_fresh(url)
+    assert responses.get(url, download=download) == b"<html>rice</html>"
+    assert download.sent[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Sun, 1 Jan 2023"}
+    assert responses.revalidated == 1
+    assert responses.is_fresh(url)  # the 304 starts a new ttl
+
+
+def test_changed_page_replaces_the_old_body(responses, clock):
+    url = "https://x/players/R/RiceJe00.htm"
+    download = Downloads(Response(200, b"old", {"ETag": '"v1"'}), Response(200, b"new", {"ETag": '"v2"'}))
+    responses.get(url, download=download)
+    clock[0] += responses.ttl_for(url) + 1
+
+    assert responses.get(url, download=download) == b"new"
+    assert not os.path.exists(responses._path(cache.hashlib.sha256(b"old").hexdigest()))  # nothing points at it
+
+
+def test_ttl_rules(responses):
+    assert responses.ttl_for("https://x/players/R/") == cache.DAY
+    assert responses.ttl_for("https://x/players/R/RiceJe00.htm") == 7 * cache.DAY
+    assert responses.ttl_for("https://x/leagues/") == cache.DEFAULT_TTL
+
+
+def test_errors_are_not_cached(responses, clock):
+    download = Downloads(Response(503, b"busy"), Response(200, b"page"))
+    assert responses.get("https://x/a", download=download) == b"busy"
+    assert not responses.is_fresh("https://x/a")
+    assert responses.get("https://x/a", download=download) == b"page"
+
+
+def test_least_recently_used_is_evicted(tmp_path, clock):
+    bodies = {url: os.urandom(1000) for url in ("https://x/a", "https://x/b", "https://x/c")}  # won't compress
+    response_cache = ResponseCache(str(tmp_path / "cache"), max_bytes=2500)
+
+    def download(url, headers):
+        return Response(200, bodies[url])
+    response_cache.get("https://x/a", download=download)
+    response_cache.get("https://x/b", download=download)
+    response_cache.get("https://x/a", download=download)  # a is now used more recently than b
+    response_cache.get("https://x/c", download=download)
+
+    assert response_cache.evictions == 1
+    assert response_cache.is_fresh("https://x/a") and response_cache.is_fresh("https://x/c")
+    assert not response_cache.is_fresh("https://x/b")
+    assert response_cache.stats()["bytes"] <= 2500
+    response_cache.close()
+
+
+def test_missing_body_is_downloaded_again_without_the_lock(responses, clock):
+    url = "https://x/players/R/RiceJe00.htm"
+    download = Downloads(Response(200, b"old", {"ETag": '"v1"'}), Response(304), Response(200, b"new"))
+    responses.get(url, download=download)
+    os.remove(responses._path(cache.hashlib.sha256(b"old").hexdigest()))
+    clock[0] += responses.ttl_for(url) + 1
+
+    unlocked = []
+
+    def try_lock():
+        if responses._lock.acquire(blocking=False):
+            responses._lock.release()
+            unlocked.append(True)
+
+    def download_and_check(url, headers):
+        # the cache can't be locked while downloading, or every other fetch thread waits on the round trip
+        thread = threading.Thread(target=try_lock)
+        thread.start()
+        thread.join()
+        return download(url, headers)
+    assert responses.get(url, download=download_and_check) == b"new"
+    assert unlocked == [True, True]
+    assert download.sent[1:] == [{"If-None-Match": '"v1"'}, {}]
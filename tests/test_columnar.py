@@ -0,0 +1,55 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from sportscrape.columnar import ColumnarStore
+from sportscrape.read_from_db import read_all_from_db
+
+
+def seasons(year, names):
+    return pd.DataFrame({"Year": [year] * len(names), "Name": names, "Yds": range(1000, 1000 + len(names)),
+                         "Tm": pd.Categorical(["SFO"] * len(names))})
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ColumnarStore(str(tmp_path / "columnar"))
+
+
+def test_partitions(store):
+    assert store.write([seasons(1994, ["Jerry Rice", "Tim Brown"]), seasons(1995, ["Jerry Rice"])],
+                       "nfl_receiving", "football", position="WR", season_column="Year") == 3
+    store.write(seasons(1994, ["Emmitt Smith"]), "nfl_receiving", "football", position="RB", season_column="Year")
+
+    assert store.datasets() == ["nfl_receiving"]
+    df = store.read("nfl_receiving", columns=["Name", "Yds"], filters={"position": "WR", "season": 1994})
+    assert list(df.columns) == ["Name", "Yds"]
+    assert sorted(df["Name"].tolist()) == ["Jerry Rice", "Tim Brown"]
+    assert isinstance(df["Yds"].dtype, pd.ArrowDtype)
+    assert store.to_arrow("nfl_receiving", filters={"season": [1994, 1995]}).num_rows == 4
+
+
+def test_writing_a_partition_replaces_it(store):
+    store.write(seasons(1994, ["Jerry Rice", "Tim Brown"]), "nfl_receiving", "football", position="WR",
+                season_column="Year")
+    store.write(seasons(1994, ["Randy Moss"]), "nfl_receiving", "football", position="WR", season_column="Year")
+    store.write(seasons(1994, ["Emmitt Smith"]), "nfl_receiving", "football", position="RB", season_column="Year")
+    assert sorted(store.read("nfl_receiving", columns=["Name"])["Name"].tolist()) == ["Emmitt Smith", "Randy Moss"]
+    assert store.write([], "nfl_receiving", "football", position="WR") == 0
+
+
+def test_import_from_sqlite(store, tmp_path):
+    path = str(tmp_path / "NFL.db")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('CREATE TABLE nfl_wrs_1994 ("Name" TEXT, "Yds" INTEGER)')
+        connection.executemany("INSERT INTO nfl_wrs_1994 VALUES (?, ?)",
+                               [("Jerry Rice", 22895), ("Tim Brown", None), ("Cris Carter", 13899)])
+    connection.close()
+
+    assert store.import_sqlite(path, "nfl_wrs_1994", "football", position="WR", chunk_rows=2) == 3
+    df = read_all_from_db(db="parquet", abs_path=store.root, table="nfl_wrs_1994", columns=["Name", "Yds"],
+                          filters={"position": "WR"})
+    assert df["Name"].tolist() == ["Jerry Rice", "Tim Brown", "Cris Carter"]
+    assert df["Yds"].tolist()[::2] == [22895, 13899] and pd.isna(df["Yds"].tolist()[1])
@@ -0,0 +1,93 @@
+import gzip
+import http.client
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from sportscrape import player_scrape
+from sportscrape.benchmarks import corpus
+from sportscrape.benchmarks.standin import StandInServer, page_file
+from sportscrape.players_list import nfl_get_roster_records
+from sportscrape.transport import get_transport
+
+
+def get(url, headers=None):
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {}), timeout=5) as response:
+        return response.status, dict(response.headers), response.read()
+
+
+def test_page_file(tmp_path):
+    directory = str(tmp_path)
+    assert page_file(directory, "/www.pro-football-reference.com/players/A/") == \
+        os.path.join(directory, "www.pro-football-reference.com", "players", "A", "index.html")
+    assert page_file(directory, "/players/R/RiceJe00.htm?x=1") == os.path.join(directory, "players", "R",
+                                                                                "RiceJe00.htm")
+    assert corpus.corpus_file(directory, "https://www.pro-football-reference.com/players/A/") == \
+        page_file(directory, "/www.pro-football-reference.com/players/A/")
+
+
+def test_record_and_replay(site, tmp_path, monkeypatch):
+    monkeypatch.setattr(corpus, "_download", lambda url: get_transport().get(player_scrape._redirected(url)))
+    directory = str(tmp_path / "fixtures")
+
+    assert corpus.record_site(directory, "football", letters="ab", players=2, position="WR", rate=None) == (2, 4)
+    requests = site.requests
+    assert corpus.record_site(directory, "football", letters="ab", players=2, position="WR", rate=None) == (2, 4)
+    assert site.requests == requests  # already recorded
+    assert corpus.record(["https://www.pro-football-reference.com/players/Z/Nobody00.htm"], directory,
+                         rate=None) == {}  # the 404 is not kept
+    assert not os.path.exists(corpus.corpus_file(directory,
+                                                 "https://www.pro-football-reference.com/players/Z/Nobody00.htm"))
+
+    recorded = list(nfl_get_roster_records("A"))
+    with StandInServer(directory=directory) as replay:
+        player_scrape.redirect_to(replay.url)
+        assert list(nfl_get_roster_records("A")) == recorded
+        href = recorded[0].href
+        assert player_scrape.get_page("https://www.pro-football-reference.com" + href) == \
+            site.pages["/www.pro-football-reference.com" + href]
+
+
+def test_injected_errors():
+    with StandInServer({"/p": b"page"}, error_rate=1.0, error_status=429, retry_after=30) as server:
+        with pytest.raises(urllib.error.HTTPError) as raised:
+            get(server.url + "/p")
+    assert raised.value.code == 429 and raised.value.headers["Retry-After"] == "30"
+    assert (server.requests, server.errors) == (1, 1)
+
+
+def test_dropped_connections():
+    with StandInServer({"/p": b"page"}, drop_rate=1.0) as server:
+        with pytest.raises((http.client.RemoteDisconnected, ConnectionError, urllib.error.URLError)):
+            get(server.url + "/p")
+    assert server.dropped == 1
+
+
+def test_max_in_flight():
+    results = []
+    with StandInServer({"/p": b"page"}, latency=0.3, max_in_flight=1) as server:
+        def request():
+            try:
+                results.append(get(server.url + "/p")[0])
+            except urllib.error.HTTPError as e:
+                results.append(e.code)
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert sorted(results) == [200, 429, 429] and server.throttled == 2
+
+
+def test_gzip_and_jitter():
+    page = b"<tr><td>1570</td></tr>" * 100
+    with StandInServer({"/p": page}, latency=0.01, jitter=0.01) as server:
+        status, headers, body = get(server.url + "/p", {"Accept-Encoding": "gzip"})
+        assert headers["Content-Encoding"] == "gzip" and gzip.decompress(body) == page
+        assert get(server.url + "/p")[2] == page
+        with pytest.raises(urllib.error.HTTPError) as raised:
+            get(server.url + "/missing")
+    assert raised.value.code == 404
@@ -0,0 +1,83 @@
+import json
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from sportscrape import players_list
+from sportscrape.benchmarks.pages import fake_nfl_roster, nfl_letter_page
+from sportscrape.exporters import export, exporter_for, CSVExporter, JSONLExporter
+from sportscrape.players_list import iter_all_nfl_players, iter_roster_chunks
+from sportscrape.read_from_db import iter_from_db
+from sportscrape.roster_parser import RosterRecord
+
+
+ROWS = [(1994 + i, "Player {0}".format(i), None if i % 3 else 100 * i, 0.5 + i) for i in range(7)]
+
+
+@pytest.fixture
+def stats(tmp_path):
+    path = str(tmp_path / "NFL.db")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('CREATE TABLE nfl_wrs_1994 ("Year" INTEGER, "Name" TEXT, "Yds" INTEGER, "Y/R" REAL)')
+        connection.executemany("INSERT INTO nfl_wrs_1994 VALUES (?, ?, ?, ?)", ROWS)
+    connection.close()
+    return path
+
+
+def test_chunks_agree_on_their_types(stats):
+    chunks = list(iter_from_db(stats, "nfl_wrs_1994", chunk_rows=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert all(str(chunk["Yds"].dtype) == "Int64" for chunk in chunks)  # the last chunk is all NULL
+    assert list(chunks[0].columns) == ["Year", "Name", "Yds", "Y/R"]
+    assert list(next(iter_from_db(stats, "nfl_wrs_1994", columns=["Name"])).columns) == ["Name"]
+
+
+@pytest.mark.parametrize("extension", ["csv", "jsonl", "parquet"])
+def test_round_trip(stats, tmp_path, extension):
+    path = str(tmp_path / "nfl_wrs_1994.{0}".format(extension))
+    assert export(iter_from_db(stats, "nfl_wrs_1994", chunk_rows=3), path) == len(ROWS)
+
+    if extension == "csv":
+        df = pd.read_csv(path, dtype={"Yds": "Int64"})
+    elif extension == "jsonl":
+        df = pd.read_json(path, lines=True, dtype={"Yds": "Int64"})
+    else:
+        df = pd.read_parquet(path)
+    assert list(df.columns) == ["Year", "Name", "Yds", "Y/R"]
+    assert [tuple(None if pd.isna(value) else value for value in row) for row in df.itertuples(index=False)] == ROWS
+
+
+def test_jsonl_is_one_object_per_row(tmp_path):
+    path = str(tmp_path / "players.json")
+    with exporter_for(path) as exporter:
+        assert isinstance(exporter, JSONLExporter)
+        exporter.write(pd.DataFrame({"Name": ["Jerry Rice"], "Pos": ["WR"]}))
+        exporter.write(pd.DataFrame(columns=["Name", "Pos"]))
+        exporter.write(pd.DataFrame({"Name": ["Randy Moss"], "Pos": ["WR"]}))
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["Name"] for line in f] == ["Jerry Rice", "Randy Moss"]
+
+
+def test_parquet_chunks_with_different_categories(tmp_path):
+    path = str(tmp_path / "teams.parquet")
+    chunks = [pd.DataFrame({"Tm": pd.Categorical(["SFO", "OAK"])}), pd.DataFrame({"Tm": pd.Categorical(["SEA"])})]
+    assert export(chunks, path) == 3
+    assert pd.read_parquet(path)["Tm"].tolist() == ["SFO", "OAK", "SEA"]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        exporter_for(str(tmp_path / "players.xlsx"))
+    with exporter_for(str(tmp_path / "players.txt"), format="CSV") as exporter:
+        assert isinstance(exporter, CSVExporter)
+
+
+def test_roster_export(tmp_path, monkeypatch):
+    letters = {"A": fake_nfl_roster(5, seed=1, letter="A"), "B": fake_nfl_roster(3, seed=2, letter="B")}
+    monkeypatch.setattr(players_list, "get_page",
+                        lambda url: nfl_letter_page(letters[url.rstrip("/").rsplit("/", 1)[-1].upper()]))
+    path = str(tmp_path / "roster.csv")
+    assert export(iter_roster_chunks(iter_all_nfl_players(letters=["A", "B"]), chunk_rows=4), path) == 8
+    assert list(pd.read_csv(path).columns) == list(RosterRecord._fields)
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from sportscrape.fetch import TokenBucket, HostRateLimiter, fetch_pages
+
+
+def test_bucket_spaces_requests_out():
+    bucket = TokenBucket(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 5 / 50 * 0.9  # the first token is there already, the other five are waited for
+
+
+def test_burst_goes_through_at_once():
+    bucket = TokenBucket(rate=1, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+def test_hosts_are_limited_separately():
+    limiter = HostRateLimiter(rate=1)
+    assert limiter.bucket("https://www.pro-football-reference.com/players/A/") is \
+        limiter.bucket("https://www.pro-football-reference.com/players/B/")
+    start = time.monotonic()
+    limiter.acquire("https://www.pro-football-reference.com/players/A/")
+    limiter.acquire("https://www.baseball-reference.com/players/a/")
+    assert time.monotonic() - start < 0.5
+
+
+def test_pages_are_fetched_concurrently_and_errors_handed_back():
+    lock, running, most = threading.Lock(), [0], [0]
+
+    def fetch(url):
+        with lock:
+            running[0] += 1
+            most[0] = max(most[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        if url.endswith("7"):
+            raise IOError("503")
+        return url.encode()
+
+    jobs = [(i, "https://x/players/{0}".format(i)) for i in range(20)]
+    results = {key: (content, error) for key, url, content, error in fetch_pages(jobs, concurrency=4, rate=None,
+                                                                              fetch=fetch)}
+    assert sorted(results) == list(range(20))
+    assert results[3] == (b"https://x/players/3", None)
+    assert results[7][0] is None and str(results[7][1]) == "503"
+    assert most[0] == 4
@@ -0,0 +1,78 @@
+import pytest
+
+from sportscrape import jobs
+from sportscrape.jobs import JobQueue, PENDING, IN_FLIGHT, DONE, FAILED
+
+
+PLAYERS = [("RiceJe00", "/players/R/RiceJe00.htm", "Jerry Rice", {"position": "WR"}),
+           ("CartCr00", "/players/C/CartCr00.htm", "Cris Carter", {"position": "WR"}),
+           ("BrowTi00", "/players/B/BrowTi00.htm", "Tim Brown", {"position": "WR"})]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(jobs.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def queue(tmp_path):
+    job_queue = JobQueue(str(tmp_path / "NFL.db"), "nfl_wrs", max_attempts=3, backoff=10, worker="a")
+    job_queue.enqueue(PLAYERS)
+    yield job_queue
+    job_queue.close()
+
+
+def test_workers_never_claim_the_same_player(queue):
+    other = JobQueue(queue.abs_path, queue.job, worker="b")
+    first, second = queue.claim(2), other.claim(2)
+    other.close()
+
+    assert [job.key for job in first] == ["RiceJe00", "CartCr00"]
+    assert [job.key for job in second] == ["BrowTi00"]
+    assert first[0].data == {"position": "WR"}
+    assert queue.counts() == {PENDING: 0, IN_FLIGHT: 3, DONE: 0, FAILED: 0}
+
+
+def test_done_players_stay_done(queue):
+    queue.complete([job.key for job in queue.claim(3)])
+    queue.enqueue(PLAYERS)
+    assert queue.claim(3) == []
+    assert queue.counts()[DONE] == 3
+
+
+def test_failures_back_off_then_give_up(queue, clock):
+    queue.claim(3)
+    queue.fail("RiceJe00", "503")
+    assert queue.next_retry_in() == 10
+    assert queue.claim(3) == []  # not due yet
+
+    clock[0] += 10
+    assert [job.key for job in queue.claim(3)] == ["RiceJe00"]
+    queue.fail("RiceJe00", "503")
+    assert queue.next_retry_in() == 20  # doubled
+
+    clock[0] += 20
+    assert queue.claim(3)[0].attempts == 2
+    queue.fail("RiceJe00", "503")
+    assert queue.failures() == [("RiceJe00", "Jerry Rice", 3, "503")]
+    assert queue.next_retry_in() is None
+
+    queue.retry_failed()
+    assert [job.key for job in queue.claim(3)] == ["RiceJe00"]
+
+
+def test_stale_claims_are_released(queue, clock):
+    queue.claim(3)
+    clock[0] += 60
+    assert queue.release_stale(older_than=120) == 0
+    assert queue.release_stale(older_than=30) == 3
+    assert len(queue.claim(3)) == 3
+
+
+def test_requeue_resets_done_players(queue):
+    queue.complete([job.key for job in queue.claim(3)])
+    queue.requeue([("RiceJe00", "/players/R/RiceJe00.htm", "Jerry Rice", {"position": "WR", "refresh": True})])
+    jobs_claimed = queue.claim(3)
+    assert [(job.key, job.data["refresh"], job.attempts) for job in jobs_claimed] == [("RiceJe00", True, 0)]
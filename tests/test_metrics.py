@@ -0,0 +1,85 @@
+import gzip
+import io
+import os
+import pickle
+
+from sportscrape.metrics import Metrics, Histogram, collecting, error_cause, get_metrics, record_response
+
+
+class Response:
+
+    def __init__(self, content, raw=None, headers=None, status_code=200):
+        self.content = content
+        self.raw = raw
+        self.headers = headers or {}
+        self.status_code = status_code
+
+
+class MissingPage(IOError):
+    def __init__(self, status):
+        self.response = Response(b"", status_code=status)
+
+
+class Stale(Exception):
+    cause = "stale"
+
+
+def test_counters_sum_over_labels():
+    metrics = Metrics()
+    metrics.inc("http_responses_total", status=200)
+    metrics.inc("http_responses_total", 2, status=429)
+    assert metrics.value("http_responses_total") == 3
+    assert metrics.value("http_responses_total", status=429) == 2
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1, 2, 4, float("inf")))
+    for value in (0.5, 1.5, 1.5, 3):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1.0) == 3
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_worker_snapshots_merge():
+    metrics = Metrics()
+    metrics.inc("pages_total")
+    with collecting() as worker:
+        get_metrics().inc("pages_total", 2)
+        get_metrics().observe("stage_seconds", 0.2, stage="parse")
+    assert get_metrics() is not worker and worker.value("pages_total") == 2
+
+    metrics.merge(pickle.loads(pickle.dumps(worker.snapshot())))  # the way it comes back from a parser process
+    assert metrics.value("pages_total") == 3
+    assert metrics.histogram("stage_seconds", stage="parse").count == 1
+
+
+def test_error_cause():
+    assert error_cause(MissingPage(429)) == "http_429"
+    assert error_cause(Stale()) == "stale"
+    assert error_cause(KeyError("x")) == "KeyError"
+    assert error_cause("Pitcher") == "pitcher"
+
+
+def test_prometheus_text():
+    metrics = Metrics()
+    metrics.inc("errors_total", stage="parse", cause='say "what"')
+    metrics.observe("stage_seconds", 0.003, stage="fetch")
+    text = metrics.to_prometheus()
+    assert '# TYPE sportscrape_errors_total counter' in text
+    assert 'sportscrape_errors_total{cause="say \\"what\\"",stage="parse"} 1' in text
+    assert 'sportscrape_stage_seconds_bucket{stage="fetch",le="0.005"} 1' in text
+    assert 'sportscrape_stage_seconds_count{stage="fetch"} 1' in text
+
+
+def test_downloaded_bytes_are_the_compressed_ones():
+    page = os.urandom(200) * 50
+    sent = gzip.compress(page)
+    raw = io.BytesIO(sent)
+    raw.read()  # urllib3's tell() is the number of bytes read off the socket
+    with collecting() as metrics:
+        record_response(Response(page, raw=raw))
+        record_response(Response(page, headers={"Content-Length": str(len(sent))}))
+        record_response(Response(page))  # nothing to go on but the body
+    assert metrics.value("bytes_downloaded_total") == 2 * len(sent) + len(page)
+    assert metrics.value("bytes_decoded_total") == 3 * len(page)
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from sportscrape import pipeline, player_scrape
+from sportscrape.add_rows_to_db import mlb_create_annual_db, MLB_TABLE_DESTINATIONS
+from sportscrape.player_scrape import table_rows, get_player_tables, player_url
+from sportscrape.schemas import frame_from_rows, sql_ready, sql_rows, is_percent
+from sportscrape.table_extract import find_table
+from sportscrape.writers import mlb_roster_writer
+
+from helpers import mlb_page
+
+
+RUTH = "/players/r/ruthba01.shtml"
+MINORS = '<tr class="minors_table hidden"><th>1913</th><td>18</td><td>BAL</td><td>IL</td></tr>'
+
+
+def two_way_page():
+    """Babe Ruth's page: batting in the page, pitching commented out like the site does below the fold, and a minor
+    league season in the batting table"""
+    batting = find_table(mlb_page(seasons=((1915, 1), (1916, 2))), "batting_standard").decode()
+    batting = batting.replace("<tbody>", "<tbody>" + MINORS)
+    pitching = find_table(mlb_page("pitching_standard", seasons=((1915, 3),)), "pitching_standard").decode()
+    return "<html><body>{0}<div><!--\n{1}\n--></div></body></html>".format(batting, pitching).encode()
+
+
+def test_every_table_from_one_pass():
+    tables = table_rows(two_way_page(), ["batting_standard", "pitching_standard", "standard_fielding"])
+    assert sorted(tables) == ["batting_standard", "pitching_standard"]
+    columns, rows = tables["batting_standard"]
+    assert columns[:4] == ["Year", "Age", "Tm", "Lg"] and len(columns) == len(rows[0])
+    assert [row[0] for row in rows] == ["1915", "1916"]  # no minor league season
+    columns, rows = tables["pitching_standard"]
+    assert "ERA" in columns and [row[0] for row in rows] == ["1915"]
+
+
+def test_player_tables_are_one_download(monkeypatch):
+    downloads = []
+
+    def get_page(url, ttl=None):
+        downloads.append(url)
+        return two_way_page()
+    monkeypatch.setattr(player_scrape, "get_page", get_page)
+
+    tables = get_player_tables("Babe Ruth")
+    assert downloads == [player_url("Babe Ruth")]
+    assert sorted(tables) == ["batting_standard", "pitching_standard"]
+    assert tables["pitching_standard"]["name"].tolist() == ["Babe Ruth"]
+    assert str(tables["batting_standard"]["HR"].dtype) == "Int16"
+
+
+def test_baseball_rates_are_already_fractions():
+    assert not is_percent("W-L%") and not is_percent("Fld%") and is_percent("Ctch%")
+    df = frame_from_rows([["1915", ".600", "2.44"]], ["Year", "W-L%", "ERA"], "pitching_standard")
+    assert sql_rows(sql_ready(df)) == [(1915, 0.6, 2.44)]
+
+
+def test_builder_stores_every_table(tmp_path, monkeypatch):
+    downloads = []
+
+    def fetch_pages(jobs, **kwargs):
+        for job, url in jobs:
+            downloads.append(url)
+            yield job, url, two_way_page(), None
+    monkeypatch.setattr(pipeline, "fetch_pages", fetch_pages)
+
+    path = str(tmp_path / "mlb.db")
+    with mlb_roster_writer(path) as writer:
+        writer.add([1, "Babe Ruth", 1914, 1935, "Yes", RUTH])
+    mlb_create_annual_db(abs_path=path, rate=None, processes=0, tables=MLB_TABLE_DESTINATIONS)
+    assert downloads == [player_url("Babe Ruth")]
+
+    connection = sqlite3.connect(path)
+    try:
+        assert connection.execute("SELECT player_id, Year, HR FROM all_players_batting ORDER BY Year").fetchall() \
+            == [(1, 1915, 1), (1, 1916, 2)]
+        assert connection.execute("SELECT player_id, Year, W FROM all_players_pitching").fetchall() == [(1, 1915, 3)]
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute("SELECT * FROM all_players_fielding")  # not on the page, no table made
+    finally:
+        connection.close()
@@ -0,0 +1,87 @@
+from functools import partial
+
+import pytest
+
+from sportscrape import pipeline
+from sportscrape.benchmarks.pages import nfl_player_page
+from sportscrape.jobs import Job
+from sportscrape.pipeline import (run_pipeline, iter_stat_chunks, parse_pool, parse_mlb_batting, parse_nfl_seasons,
+                                  parse_nfl_summary, _checked)
+from sportscrape.schemas import SchemaMismatch
+
+from helpers import mlb_page
+
+
+PAGES = {"https://x/players/{0}".format(i): mlb_page(seasons=[(1954 + i, i + 1)]) for i in range(12)}
+PAGES["https://x/players/pitcher"] = mlb_page("pitching_standard")
+JOBS = [(Job(url, url, "Player {0}".format(url.rsplit("/", 1)[1]), {}, 0), url) for url in PAGES]
+
+
+def fetch(url):
+    if url.endswith("/5"):
+        raise IOError("503")
+    return PAGES[url]
+
+
+@pytest.mark.parametrize("processes", [0, 2])
+def test_every_page_is_parsed_and_written(processes):
+    results, errors = {}, {}
+    stats = run_pipeline(JOBS, parse_mlb_batting, lambda job, result: results.__setitem__(job.key, result),
+                         lambda job, error: errors.__setitem__(job.key, error), processes=processes, rate=None,
+                         fetch=fetch, queue_size=2)
+
+    assert sorted(errors) == ["https://x/players/5"] and str(errors["https://x/players/5"]) == "503"
+    assert results.pop("https://x/players/pitcher") == "Pitcher"
+    assert len(results) == 11
+    columns, rows = results["https://x/players/3"]
+    assert columns[0] == "Year" and columns[-1] == "name"
+    assert rows[0][0] == "1957" and rows[0][-1] == "Player 3"
+    assert stats.write.items == 13 and stats.write.errors == 1 and stats.parse.items == 12
+
+
+def test_parse_failures_go_to_on_error():
+    errors = []
+    with parse_pool(0) as executor:
+        run_pipeline(JOBS[:3], partial(parse_nfl_summary, position="WR"), lambda job, result: None,
+                     lambda job, error: errors.append(error), executor=executor, rate=None, fetch=fetch)
+    assert len(errors) == 3  # baseball pages have no receiving_and_rushing table
+
+
+def test_writer_failure_stops_the_pipeline():
+    def on_result(job, result):
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        run_pipeline(JOBS, parse_mlb_batting, on_result, lambda job, error: None, processes=0, rate=None,
+                     fetch=fetch, queue_size=1)
+
+
+def test_chunks(monkeypatch):
+    def fetch_pages(jobs, **kwargs):
+        for job, url in jobs:
+            try:
+                yield job, url, fetch(url), None
+            except IOError as e:
+                yield job, url, None, e
+    monkeypatch.setattr(pipeline, "fetch_pages", fetch_pages)
+
+    errors = []
+    chunks = list(iter_stat_chunks(JOBS, parse_mlb_batting, "batting_standard", chunk_rows=5, rate=None,
+                                   errors=errors))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 1]
+    assert chunks[0]["Year"].tolist() == [1954, 1955, 1956, 1957, 1958]
+    assert str(chunks[0]["Year"].dtype) == "Int16" and chunks[2]["Year"].tolist() == [1965]
+    assert [str(error) for _, error in errors] == ["503", "Pitcher"]
+
+
+def test_nfl_seasons():
+    page = nfl_player_page("Jerry Rice", seed=1, seasons=3)
+    columns, rows = parse_nfl_seasons(page, Job("/players/R/RiceJe00.htm", None, "Jerry Rice", {}, 0))
+    assert columns[-1] == "name" and len(rows) == 3
+    assert all(len(row) == len(columns) and row[-1] == "Jerry Rice" for row in rows)
+
+
+def test_rows_that_dont_match_the_columns():
+    assert _checked(["Year", "Tm"], [["1994", "SFO"]]) == (["Year", "Tm"], [["1994", "SFO"]])
+    with pytest.raises(SchemaMismatch):
+        _checked(["Year", "Tm"], [["1994", "SFO"], ["1995"]])
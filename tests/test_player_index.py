@@ -0,0 +1,87 @@
+import sqlite3
+
+import pytest
+
+from sportscrape import player_index
+from sportscrape.player_index import (PlayerIndex, IndexEntry, UnknownPlayer, AmbiguousPlayer, normalize_name,
+                                      load_index, set_index)
+from sportscrape.player_scrape import MLB
+from sportscrape.writers import mlb_roster_writer
+
+
+GRIFFEY_SR = IndexEntry("Ken Griffey", 1973, 1991, "No", "/players/g/griffke01.shtml", "")
+GRIFFEY_JR = IndexEntry("Ken Griffey", 1989, 2010, "No", "/players/g/griffke02.shtml", "")
+AARON = IndexEntry("Hank Aaron", 1954, 1976, "Yes", "/players/a/aaronha01.shtml", "")
+PENA = IndexEntry("José Peña", 2014, 2016, "No", "/players/p/penajo01.shtml", "")
+
+
+@pytest.fixture
+def index():
+    return PlayerIndex([GRIFFEY_SR, GRIFFEY_JR, AARON, PENA])
+
+
+@pytest.fixture
+def no_index():
+    yield
+    set_index("baseball")
+
+
+def test_normalize_name():
+    assert normalize_name("José Peña Jr.") == "jose pena"
+    assert normalize_name("Karim Abdul-Jabbar") == "karim abdul jabbar"
+    assert normalize_name("D.J. Moore") == "dj moore"
+
+
+def test_resolve(index):
+    assert index.resolve("jose pena") == PENA
+    assert index.resolve("Ken Griffey Jr.") == GRIFFEY_JR
+    assert index.resolve("Ken Griffey Sr.") == GRIFFEY_SR
+    assert index.resolve("Ken Griffey", year=1975) == GRIFFEY_SR
+    assert index.url("Hank Aaron") == "https://www.baseball-reference.com/players/a/aaronha01.shtml"
+
+
+def test_resolve_failures(index):
+    with pytest.raises(AmbiguousPlayer) as raised:
+        index.resolve("Ken Griffey")
+    assert raised.value.candidates == [GRIFFEY_SR, GRIFFEY_JR]
+    with pytest.raises(UnknownPlayer) as raised:
+        index.resolve("Hank Aron")
+    assert raised.value.suggestions == ["Hank Aaron"]
+
+
+def test_search(index):
+    assert index.search("griff") == [GRIFFEY_SR, GRIFFEY_JR]  # prefix of the first or the last name
+    assert index.search("aaron") == [AARON]
+    assert index.search("hnak aaron") == [AARON]  # fuzzy
+
+
+def test_load_index_only_reads_the_roster(tmp_path, no_index):
+    path = str(tmp_path / "MLB.db")
+    with mlb_roster_writer(path) as writer:
+        writer.add([1, AARON.name, AARON.first_year, AARON.last_year, AARON.hof, AARON.href])
+
+    connection = sqlite3.connect(path)
+    schema = connection.execute("SELECT name FROM sqlite_master ORDER BY name").fetchall()
+    first = load_index(path)
+    assert load_index(path) is first
+    assert connection.execute("SELECT name FROM sqlite_master ORDER BY name").fetchall() == schema
+
+    connection.execute("INSERT INTO all_players_table VALUES (2, ?, ?, ?, ?, ?)", PENA[:5])
+    connection.commit()
+    connection.close()
+    assert load_index(path).resolve("Jose Pena") == PENA  # rebuilt after the roster changed
+
+
+def test_mlb_looks_its_url_up_when_needed(index, no_index, monkeypatch):
+    set_index(index)
+    lookups = []
+    monkeypatch.setattr(PlayerIndex, "url", lambda self, name, **years: lookups.append(name) or
+                        player_index.SITES["baseball"] + self.resolve(name, **years).href)
+
+    griffey = MLB("Ken Griffey")  # two of them, construction doesn't care
+    assert lookups == []
+    assert griffey.url == "https://www.baseball-reference.com/players/g/griffke01.shtml"  # the guess
+    assert MLB("Ken Griffey", year=2005).url == "https://www.baseball-reference.com/players/g/griffke02.shtml"
+    assert MLB("Jose Pena").url == "https://www.baseball-reference.com/players/p/penajo01.shtml"
+    assert MLB("Hank Aaron", url="https://example.com/aaron").url == "https://example.com/aaron"
+    assert lookups == ["Ken Griffey", "Ken Griffey", "Jose Pena"]
@@ -0,0 +1,73 @@
+import pytest
+
+from sportscrape import player_scrape
+from sportscrape.player_scrape import Athlete, MLB, NFL
+from sportscrape.roster_parser import RosterRecord
+from sportscrape.table_extract import MissingTable
+from sportscrape.benchmarks.pages import nfl_player_page
+
+from helpers import mlb_page
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Serves pages from a dict instead of the network, counting the downloads of each url"""
+    pages, counts = {}, {}
+
+    def get_page(url, ttl=None):
+        counts[url] = counts.get(url, 0) + 1
+        return pages[url]
+    monkeypatch.setattr(player_scrape, "get_page", get_page)
+    return pages, counts
+
+
+def test_athlete_needs_from_href():
+    class Partial(Athlete):
+        __slots__ = ()
+
+    with pytest.raises(TypeError):
+        Partial("Hank Aaron", "01")
+
+
+def test_mlb_summary_is_one_download(downloads):
+    pages, counts = downloads
+    url = "https://www.baseball-reference.com/players/a/aaronha01.shtml"
+    pages[url] = mlb_page()
+    summary = MLB("Hank Aaron", url=url).get_summary()
+    assert summary["Summary"].tolist() == ["1 Yrs"]
+    assert counts == {url: 1}
+
+
+def test_mlb_summary_after_stats_keeps_the_table_id(downloads):
+    pages, counts = downloads
+    url = "https://www.baseball-reference.com/players/a/aaronha01.shtml"
+    pages[url] = mlb_page("pitching_standard")
+    player = MLB("Hank Aaron", url=url)
+    assert player.id == "pitching_standard"
+    assert len(player.get_summary()) == 1
+
+
+def test_mlb_summary_without_batting_or_pitching(downloads):
+    pages, _ = downloads
+    url = "https://www.baseball-reference.com/players/a/aaronha01.shtml"
+    pages[url] = b'<html><body><table id="standard_fielding"><tr><td>1</td></tr></table></body></html>'
+    with pytest.raises(MissingTable):
+        MLB("Hank Aaron", url=url).get_summary()
+
+
+def test_nfl_is_lazy_and_releases_the_page(downloads):
+    pages, counts = downloads
+    player = NFL("Jerry Rice", player_url="/players/R/RiceJe00.htm")
+    assert counts == {}
+    pages[player.url] = nfl_player_page("Jerry Rice", seed=1)
+    assert len(player.career_stats) and player.career_summary[-2:] == ["Jerry Rice", "No"]
+    assert counts == {player.url: 1}
+    assert player._content is None and player._soup is None
+
+
+def test_from_roster_batch():
+    batch = NFL.from_roster([RosterRecord("Jerry Rice", "WR", 1985, 2004, "Yes", "/players/R/RiceJe00.htm"),
+                             RosterRecord("Tim Brown", "WR", 1988, 2004, "Yes", "/players/B/BrowTi00.htm")])
+    assert len(batch) == 2
+    assert batch.name(1) == "Tim Brown" and batch.position(0) == "WR"
+    assert batch[0].url.endswith("/players/R/RiceJe00.htm")
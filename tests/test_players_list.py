@@ -0,0 +1,91 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from sportscrape import players_list
+from sportscrape.benchmarks.pages import fake_nfl_roster, nfl_letter_page
+from sportscrape.players_list import (nfl_get_player_list, get_all_nfl_players, refresh_roster, current_season,
+                                      NFL_ROSTER_TABLE)
+from sportscrape.roster_parser import stable_id
+from sportscrape.writers import nfl_roster_writer
+
+
+def rows(path, sql):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def letters(monkeypatch):
+    """Letter pages A and B of a small made up roster (every other letter is empty), served in place of the site"""
+    roster = {"A": fake_nfl_roster(6, seed=1, letter="A"), "B": fake_nfl_roster(4, seed=2, letter="B")}
+
+    def get_page(url):
+        return nfl_letter_page(roster.get(url.rstrip("/").rsplit("/", 1)[-1].upper(), []))
+
+    def fetch_pages(jobs, rate=None, **kwargs):
+        for letter, url in jobs:
+            yield letter, url, get_page(url), None
+
+    monkeypatch.setattr(players_list, "get_page", get_page)
+    monkeypatch.setattr(players_list, "fetch_pages", fetch_pages)
+    return roster
+
+
+@pytest.fixture
+def counter_roster(tmp_path, letters):
+    """A roster built the old way, Ids counting up from 0, with a stat table pointing at them"""
+    path = str(tmp_path / "NFL.db")
+    players = letters["A"] + letters["B"]
+    with nfl_roster_writer(path) as writer:
+        writer.add_many([i] + list(player) for i, player in enumerate(players))
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE nfl_wrs (player_id INTEGER, Name TEXT, Yds INTEGER)")
+    connection.executemany("INSERT INTO nfl_wrs VALUES (?, ?, ?)", [(i, player[1], 1000)
+                                                                     for i, player in enumerate(players)])
+    connection.commit()
+    connection.close()
+    return path, players
+
+
+def test_letter_load_rekeys_a_counter_roster(counter_roster):
+    path, players = counter_roster
+    nfl_get_player_list("A", path)
+
+    ids = sorted(stable_id(player[-1]) for player in players)
+    assert [id_ for id_, in rows(path, 'SELECT Id FROM "{0}" ORDER BY Id'.format(NFL_ROSTER_TABLE))] == ids
+    assert [id_ for id_, in rows(path, "SELECT player_id FROM nfl_wrs ORDER BY player_id")] == ids
+
+
+def test_full_load_rekeys_a_counter_roster(counter_roster):
+    path, players = counter_roster
+    get_all_nfl_players(path)
+
+    ids = sorted(stable_id(player[-1]) for player in players)
+    assert [id_ for id_, in rows(path, 'SELECT Id FROM "{0}" ORDER BY Id'.format(NFL_ROSTER_TABLE))] == ids
+    assert rows(path, "SELECT COUNT(*) FROM nfl_wrs WHERE player_id NOT IN (SELECT Id FROM {0})".format(
+        NFL_ROSTER_TABLE)) == [(0,)]
+
+
+def test_refresh_skips_unchanged_letters(tmp_path, letters):
+    path = str(tmp_path / "NFL.db")
+    first = refresh_roster(path, letters=["a", "b"], rate=None)
+    assert (first["letters_changed"], first["rows_written"]) == (2, len(letters["A"]) + len(letters["B"]))
+
+    again = refresh_roster(path, letters=["a", "b"], rate=None)
+    assert (again["letters_fetched"], again["letters_changed"], again["rows_written"]) == (2, 0, 0)
+
+    letters["B"][0] = letters["B"][0][:3] + (2021,) + letters["B"][0][4:]  # came out of retirement
+    changed = refresh_roster(path, letters=["a", "b"], rate=None)
+    assert (changed["letters_changed"], changed["rows_written"]) == (1, 1)
+
+
+def test_current_season():
+    assert current_season("football", datetime(2024, 2, 10)) == 2023
+    assert current_season("football", datetime(2024, 9, 5)) == 2024
+    assert current_season("baseball", datetime(2024, 4, 1)) == 2024
+    assert current_season("baseball", datetime(2024, 1, 15)) == 2023
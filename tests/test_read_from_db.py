@@ -0,0 +1,83 @@
+import sqlite3
+
+import pytest
+
+from sportscrape.read_from_db import RosterConnection
+
+
+PLAYERS = [("Jerry Rice", "WR", 1985, 2004, "Yes"), ("Randy Moss", "WR", 1998, 2012, "Yes"),
+           ("Emmitt Smith", "RB", 1990, 2004, "Yes"), ("Davante Adams", "WR", 2014, 2030, "No")]
+
+
+@pytest.fixture
+def roster(tmp_path):
+    path = str(tmp_path / "NFL.db")
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('CREATE TABLE all_nfl_players_table ("Id" INTEGER, "Name" TEXT, "Position" TEXT, '
+                           '"First" INTEGER, "Last" INTEGER, "HOF" TEXT)')
+        connection.executemany("INSERT INTO all_nfl_players_table VALUES (?, ?, ?, ?, ?, ?)",
+                               [(i,) + player for i, player in enumerate(PLAYERS)])
+    connection.close()
+    players = RosterConnection(path, "all_nfl_players_table")
+    yield players
+    players.close()
+
+
+def test_select(roster):
+    assert roster.select(columns=["Name"], where={"Position": "WR"}, order_by="First")["Name"].tolist() == \
+        ["Jerry Rice", "Randy Moss", "Davante Adams"]
+    assert roster.select(columns=["Name"], where={"Last": (">=", 2004), "First": ("<", 1995)},
+                         order_by=["Name"])["Name"].tolist() == ["Emmitt Smith", "Jerry Rice"]
+    assert roster.select(columns=["Id"], where={"Name": ("in", ["Randy Moss", "Emmitt Smith"])},
+                         order_by="Id")["Id"].tolist() == [1, 2]
+    assert roster.select(where={"Name": ("LIKE", "%Smith")})["Position"].tolist() == ["RB"]
+    assert len(roster.select(limit=2)) == 2
+    assert roster.special_select("Position", "WR", last_year=2010)["Name"].tolist() == \
+        ["Randy Moss", "Davante Adams"]
+
+
+def test_nothing_from_the_caller_ends_up_in_the_sql(roster):
+    assert roster.select(where={"Name": "x' OR '1'='1"}).empty
+    with pytest.raises(ValueError):
+        roster.select(where={"Name; DROP TABLE all_nfl_players_table": "x"})
+    with pytest.raises(ValueError):
+        roster.select(columns=["Name"], order_by="Name DESC")
+    with pytest.raises(ValueError):
+        roster.select(where={"Last": ("> 0 OR 1 >", 2000)})
+
+
+def test_indexes_are_made(roster):
+    indexes = {row[0] for row in roster.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"ix_all_nfl_players_table_position_last_first", "ix_all_nfl_players_table_name"} <= indexes
+    plan = roster.connection.execute('EXPLAIN QUERY PLAN SELECT * FROM all_nfl_players_table WHERE "Position" = ? '
+                                     'AND "Last" >= ?', ("WR", 2000)).fetchall()
+    assert "ix_all_nfl_players_table_position_last_first" in str(plan)
+
+
+def test_results_are_cached_until_the_table_changes(roster):
+    first = roster.select(where={"Position": "WR"})
+    first.loc[0, "Name"] = "changed"  # callers get a copy
+    assert roster.select(where={"Position": "WR"})["Name"].tolist()[0] == "Jerry Rice"
+    assert (roster.hits, roster.misses) == (1, 1)
+
+    other = sqlite3.connect(roster.db)
+    with other:
+        other.execute("UPDATE all_nfl_players_table SET Position = 'WR' WHERE Name = 'Emmitt Smith'")
+    other.close()
+    assert len(roster.select(where={"Position": "WR"})) == 4
+    assert (roster.hits, roster.misses) == (1, 2)
+
+
+def test_cache_is_bounded(roster):
+    roster.cache_size = 2
+    for year in (1990, 2000, 2010):
+        roster.select(where={"Last": (">=", year)})
+    roster.select(where={"Last": (">=", 1990)})
+    assert roster.misses == 4 and len(roster._results) == 2
+
+
+def test_iter_select(roster):
+    chunks = list(roster.iter_select(columns=["Id", "Name"], order_by="Id", chunk_rows=3))
+    assert [len(chunk) for chunk in chunks] == [3, 1]
+    assert str(chunks[0]["Id"].dtype) == "Int64"
@@ -0,0 +1,55 @@
+import pytest
+
+from sportscrape import roster_parser
+from sportscrape.benchmarks.pages import fake_nfl_roster, nfl_letter_page, mlb_letter_page
+from sportscrape.roster_parser import iter_roster, parse_entry, RosterRecord, player_key, stable_id, roster_digest
+
+
+BACKENDS = ["html.parser"] + (["lxml"] if roster_parser.BS4_FEATURES == "lxml" else []) + \
+    (["selectolax"] if roster_parser.SELECTOLAX else [])
+
+ROSTER = fake_nfl_roster(200, seed=3)
+
+
+def test_parse_entry():
+    assert parse_entry("Isaako Aaitui (NT) 2013-2014", "Isaako Aaitui", "/players/A/AaitIs00.htm") == \
+        RosterRecord("Isaako Aaitui", "NT", 2013, 2014, "No", "/players/A/AaitIs00.htm")
+    assert parse_entry("Hank Aaron+ (1954-1976)", "Hank Aaron", "/players/a/aaronha01.shtml") == \
+        RosterRecord("Hank Aaron", "", 1954, 1976, "Yes", "/players/a/aaronha01.shtml")
+    assert parse_entry("Joe Smith (1999)", "Joe Smith", "/players/s/smithjo99.shtml")[2:4] == (1999, 1999)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_nfl_letter_page(backend):
+    records = list(iter_roster(nfl_letter_page(ROSTER), sport="football", backend=backend))
+    assert records == [RosterRecord(name, position, first, last, hof, href)
+                       for position, name, first, last, hof, href in ROSTER]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_mlb_letter_page(backend):
+    records = list(iter_roster(mlb_letter_page(ROSTER), sport="baseball", backend=backend))
+    assert [(r.name, r.position, r.first_year, r.last_year, r.hof) for r in records] == \
+        [(name, "", first, last, hof) for _, name, first, last, hof, _ in ROSTER]
+    assert records[0].href == ROSTER[0][5].lower().replace(".htm", ".shtml")
+
+
+def test_stable_ids():
+    assert player_key("/players/A/AdamDa01.htm") == "AdamDa01"
+    assert player_key("/players/g/greea.01.shtml") == "greea.01"
+    assert stable_id("/players/A/AdamDa01.htm") == stable_id("https://x/players/A/AdamDa01.htm")
+    assert 0 <= stable_id("/players/A/AdamDa01.htm") < 2 ** 63
+    assert len({stable_id(href) for *_, href in ROSTER}) == len({href for *_, href in ROSTER})
+
+
+def test_digest_ignores_the_rest_of_the_page():
+    page = nfl_letter_page(ROSTER[:10])
+    assert roster_digest(page) == roster_digest(page.replace(b"<body>", b"<body><p>ad 12:01</p>"))
+    assert roster_digest(page) != roster_digest(nfl_letter_page(ROSTER[:9]))
+
+
+def test_same_players_as_the_old_loop():
+    from sportscrape.benchmarks.bench_roster_parse import old_parse
+    page = nfl_letter_page(ROSTER)
+    old = [(position, name, hof, href) for position, name, _, _, hof, href in old_parse(page)]
+    assert [(r.position, r.name, r.hof, r.href) for r in iter_roster(page, sport="football")] == old
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from sportscrape.schemas import (coerce_values, coerce_frame, frame_from_rows, concat_frames, sql_ready, sql_rows,
+                                 unique_columns, INT, RATE, LABEL, TEXT)
+
+
+def test_coerce_values():
+    assert coerce_values(["12", "", "-", "1,024"], "Int32").tolist() == [12, pd.NA, pd.NA, 1024]
+    assert coerce_values(["52.0%", ".625"], RATE).tolist() == [52.0, 0.625]
+    assert coerce_values(["1.5"], INT).tolist() == [1.5]  # kept as a rate rather than failing
+    assert coerce_values(["GNB", ""], LABEL).tolist()[0] == "GNB"
+    assert str(coerce_values(["x"], TEXT).dtype) == "string"
+
+
+def test_frame_from_rows():
+    rows = [["1994", "GNB", "52.0%", "1,200", "8"], ["1995", "", "", "", "3"]]
+    df = frame_from_rows(rows, ["Year", "Tm", "Ctch%", "Yds", "Yds"], "receiving_and_rushing")
+    assert list(df.columns) == ["Year", "Tm", "Ctch%", "Yds", "Yds"]  # duplicate headings survive
+    assert [str(dtype) for dtype in df.dtypes] == [INT, LABEL, RATE, INT, INT]
+    assert df.iloc[:, 3].tolist() == [1200, pd.NA]
+    assert coerce_frame(pd.DataFrame(rows, columns=["Year", "Tm", "Ctch%", "Yds", "Rush"]),
+                        "receiving_and_rushing")["Yds"].tolist() == [1200, pd.NA]
+    with pytest.raises(ValueError):
+        frame_from_rows([["1994", "GNB"]], ["Year"], "receiving_and_rushing")
+
+
+def test_concat_keeps_categories():
+    first = frame_from_rows([["1994", "GNB"]], ["Year", "Tm"], "receiving_and_rushing")
+    second = frame_from_rows([["1995", "CHI"]], ["Year", "Tm"], "receiving_and_rushing")
+    assert str(concat_frames([first, second], "receiving_and_rushing")["Tm"].dtype) == LABEL
+
+
+def test_sql_ready():
+    df = frame_from_rows([["52.0%", "13.2", "1", "2"]], ["Ctch%", "Y/R", "Yds", "Yds"], "receiving_and_rushing")
+    ready = sql_ready(df)
+    assert list(ready.columns) == ["Ctch%", "Y/R", "Yds", "Yds.1"]
+    assert sql_rows(ready) == [(0.52, 13.2, 1, 2)]  # percentages as fractions, no float32 noise
+    assert sql_rows(sql_ready(frame_from_rows([["", ""]], ["Ctch%", "Yds"], "receiving_and_rushing"))) == \
+        [(None, None)]
+
+
+def test_unique_columns():
+    assert unique_columns(["Yds", "TD", "Yds", "TD", "Yds"]) == ["Yds", "TD", "Yds.1", "TD.1", "Yds.2"]
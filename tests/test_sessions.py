@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+
+from sportscrape.sessions import Database, get_database, engine
+
+
+@pytest.fixture
+def database(tmp_path):
+    db = Database(str(tmp_path / "NFL.db"), pool_size=2)
+    yield db
+    db.close()
+
+
+def test_one_database_per_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert get_database("NFL.db") is get_database(str(tmp_path / "NFL.db"))
+    assert engine("NFL.db") is engine(str(tmp_path / "NFL.db"))
+
+
+def test_connections_are_reused(database):
+    with database.connection() as first:
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    with database.connection() as second:
+        assert second is first
+
+
+def test_release_resets_the_connection(database):
+    with database.connection() as conn:
+        conn.execute("CREATE TABLE players (name TEXT)")
+        conn.commit()
+        conn.isolation_level = None
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO players VALUES ('Jerry Rice')")
+        conn.row_factory = dict
+    with database.connection() as conn:
+        assert (conn.isolation_level, conn.row_factory, conn.in_transaction) == ("", None, False)
+        assert conn.execute("SELECT COUNT(*) FROM players").fetchone() == (0,)
+
+
+def test_extra_connections_are_closed(database):
+    connections = [database.checkout() for _ in range(3)]
+    assert len(set(map(id, connections))) == 3
+    for conn in connections:
+        database.release(conn)
+    assert database._idle.qsize() == 2
+
+
+def test_readers_are_not_blocked_by_a_writer(database):
+    with database.connection() as writer, database.connection() as reader:
+        writer.execute("CREATE TABLE players (name TEXT)")
+        writer.execute("INSERT INTO players VALUES ('Jerry Rice')")
+        writer.commit()
+        writer.execute("INSERT INTO players VALUES ('Randy Moss')")  # left open
+        assert reader.execute("SELECT COUNT(*) FROM players").fetchone() == (1,)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_a_forked_child_opens_its_own_connections(database):
+    with database.connection() as parent:
+        parent.execute("CREATE TABLE players (name TEXT)")
+        parent.commit()
+
+    held = database.checkout()
+    pid = os.fork()
+    if pid == 0:  # child: exit code 0 only if it got a new connection that works
+        code = 1
+        try:
+            with database.connection() as conn:
+                conn.execute("INSERT INTO players VALUES ('Jerry Rice')")
+                conn.commit()
+                code = 0 if conn is not held and database._idle.qsize() == 0 else 2
+            database.release(held)  # the parent's, kept out of the child's pool
+            code = code or (3 if database._idle.qsize() != 1 else 0)
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+    assert held.execute("SELECT name FROM players").fetchall() == [("Jerry Rice",)]
+    database.release(held)
+    with database.connection() as conn:
+        assert conn is held
@@ -0,0 +1,59 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from sportscrape.similarity import build_features, load_features, SimilarityIndex
+
+
+ROWS = [(1, "Jerry Rice", 16, 1570, 15), (2, "Cris Carter", 16, 1256, 17), (3, "Tim Brown", 16, 1408, 9),
+        (4, "Wes Welker", 16, 1569, 11)]
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "stats.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE wrs (player_id INTEGER, Name TEXT, G INTEGER, Yds INTEGER, TD INTEGER)")
+    connection.executemany("INSERT INTO wrs VALUES (?, ?, ?, ?, ?)", ROWS)
+    connection.commit()
+    connection.close()
+    return path
+
+
+def test_features_are_standardized():
+    import pandas as pd
+    features = build_features(pd.DataFrame(ROWS, columns=["player_id", "Name", "G", "Yds", "TD"]))
+    assert features.values.dtype == np.float32
+    assert features.columns == ["G", "Yds", "TD"]
+    assert np.allclose(features.values[:, 1:].mean(axis=0), 0, atol=1e-6)
+
+
+def test_nearest_neighbour():
+    import pandas as pd
+    index = SimilarityIndex(build_features(pd.DataFrame(ROWS, columns=["player_id", "Name", "G", "Yds", "TD"]),
+                                           columns=["Yds"]))
+    assert index.query(1, k=1)["name"].tolist() == ["Wes Welker"]
+
+
+def test_cache_reads_without_changing_the_table(db, tmp_path):
+    load_features(db, "wrs", cache_dir=str(tmp_path / "cache"))
+    connection = sqlite3.connect(db)
+    schema = connection.execute("SELECT type, name FROM sqlite_master").fetchall()
+    connection.close()
+    assert schema == [("table", "wrs")]
+
+
+def test_cache_is_rebuilt_after_rows_are_replaced(db, tmp_path):
+    cache = str(tmp_path / "cache")
+    first = load_features(db, "wrs", cache_dir=cache)
+    assert load_features(db, "wrs", cache_dir=cache).values.tobytes() == first.values.tobytes()
+
+    # same row count and the same rowid, only the content differs
+    connection = sqlite3.connect(db)
+    connection.execute("DELETE FROM wrs WHERE player_id = 4")
+    connection.execute("INSERT INTO wrs VALUES (4, 'Wes Welker', 16, 400, 1)")
+    connection.commit()
+    connection.close()
+    second = load_features(db, "wrs", cache_dir=cache)
+    assert second.values.tobytes() != first.values.tobytes()
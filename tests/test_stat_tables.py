@@ -0,0 +1,93 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from sportscrape import stat_tables
+from sportscrape.schemas import NFL_WR_SUMMARY_COLUMNS
+from sportscrape.sessions import get_database
+from sportscrape.stat_tables import migrate_stat_table, ensure_stat_table, is_legacy
+
+
+def summary(name, yards, catch_rate):
+    row = dict.fromkeys(NFL_WR_SUMMARY_COLUMNS, "1")
+    row.update({"Name": name, "Yds": yards, "Ctch%": catch_rate, "HOF": "No"})
+    return row
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    """An NFL.db the way the first builds left it: an all-TEXT nfl_wrs_1994 with the pandas index column"""
+    path = str(tmp_path / "NFL.db")
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE all_nfl_players_table ("Id" INTEGER, "Name" TEXT, "Position" TEXT)')
+    connection.executemany("INSERT INTO all_nfl_players_table VALUES (?, ?, ?)",
+                           [(1, "Jerry Rice", "WR"), (2, "Mike Davis", "WR"), (3, "Mike Davis", "WR"),
+                            (4, "Tim Brown", "WR")])
+    df = pd.DataFrame([summary("Jerry Rice", "22,895", "52.0%"), summary("Mike Davis", "", ""),
+                       summary("Tim Brown", "14,934", "")]).astype(str)
+    df.to_sql("nfl_wrs_1994", connection, dtype={column: "TEXT" for column in df.columns})
+    connection.commit()
+    connection.close()
+    return path
+
+
+def query(path, sql):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+def test_migration(legacy):
+    assert migrate_stat_table(legacy, "nfl_wrs_1994", "nfl_wr_summary", position="WR", chunk_rows=2) == 3
+
+    types = {row[1]: row[2] for row in query(legacy, 'PRAGMA table_info("nfl_wrs_1994")')}
+    assert "index" not in types
+    assert (types["Yds"], types["Ctch%"], types["Name"], types["player_id"]) == ("INTEGER", "REAL", "TEXT",
+                                                                                "INTEGER")
+    assert query(legacy, 'SELECT Name, Yds, "Ctch%", player_id FROM nfl_wrs_1994 ORDER BY rowid') == \
+        [("Jerry Rice", 22895, 0.52, 1), ("Mike Davis", None, None, None), ("Tim Brown", 14934, None, 4)]
+    assert not [name for name, in query(legacy, "SELECT name FROM sqlite_master") if "index" in name]
+
+    with sqlite3.connect(legacy) as connection:
+        assert not is_legacy(connection, "nfl_wrs_1994", "nfl_wr_summary")
+
+
+def test_failed_migration_leaves_the_old_table(legacy, monkeypatch):
+    before = query(legacy, "SELECT * FROM nfl_wrs_1994")
+    sql_rows, chunks = stat_tables.sql_rows, []
+
+    def interrupted(df):
+        chunks.append(df)
+        if len(chunks) == 2:
+            raise KeyboardInterrupt
+        return sql_rows(df)
+
+    monkeypatch.setattr(stat_tables, "sql_rows", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        migrate_stat_table(legacy, "nfl_wrs_1994", "nfl_wr_summary", chunk_rows=2)
+
+    assert query(legacy, "SELECT * FROM nfl_wrs_1994") == before
+    assert "index" in {row[1] for row in query(legacy, 'PRAGMA table_info("nfl_wrs_1994")')}
+    assert not query(legacy, "SELECT name FROM sqlite_master WHERE name = 'nfl_wrs_1994__typed'")
+
+
+def test_missing_table(legacy):
+    pooled = get_database(legacy)
+    with pooled.connection():
+        pass
+    idle = pooled._idle.qsize()
+    with pytest.raises(ValueError):
+        migrate_stat_table(legacy, "nfl_tes_1994", "nfl_wr_summary")
+    assert pooled._idle.qsize() == idle  # the connection went back to the pool
+
+
+def test_ensure_stat_table(legacy):
+    ensure_stat_table(legacy, "nfl_wrs_2000", "nfl_wr_summary")
+    assert [row[1:3] for row in query(legacy, 'PRAGMA table_info("nfl_wrs_2000")')][-2:] == \
+        [("HOF", "TEXT"), ("player_id", "INTEGER")]
+
+    ensure_stat_table(legacy, "nfl_wrs_1994", "nfl_wr_summary", position="WR")
+    assert query(legacy, 'SELECT Yds FROM nfl_wrs_1994 WHERE Name = "Jerry Rice"') == [(22895,)]
@@ -0,0 +1,50 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from sportscrape.benchmarks.pages import nfl_player_page, commented_table
+from sportscrape.table_extract import (table_ids, first_table_id, find_table, find_tables, extract_table,
+                                       required_table, MissingTable)
+
+
+PAGE = nfl_player_page("Jerry Rice", seed=1, extra_tables=2)
+NESTED = (b'<html><!-- <table id="old"></table> --><table id="outer"><tr><td><table id="inner"><tr><td>1</td></tr>'
+          b'</table></td></tr><tr><td>2</td></tr></table><p>after</p></html>')
+
+
+def test_table_ids():
+    assert table_ids(PAGE) == ["receiving_and_rushing"]
+    assert table_ids(PAGE, include_comments=True) == ["receiving_and_rushing", "extra_0", "extra_1"]
+    assert first_table_id(NESTED) == "outer"
+    assert first_table_id(b"<html></html>") is None
+
+
+def test_same_table_as_a_full_parse():
+    full = BeautifulSoup(PAGE, features="html.parser").find("table", attrs={"id": "receiving_and_rushing"})
+    table = extract_table(PAGE, "receiving_and_rushing")
+    assert [td.get_text() for td in table.find_all("td")] == [td.get_text() for td in full.find_all("td")]
+
+
+def test_tables_in_comments_are_found():
+    table = extract_table(PAGE, "extra_1")
+    assert table["id"] == "extra_1"
+    assert len(table.find("tbody").find_all("tr")) == 10
+    assert find_table(commented_table("x"), "x").startswith(b"<table")
+
+
+def test_nested_tables():
+    assert find_table(NESTED, "outer").endswith(b"<td>2</td></tr></table>")
+    assert find_table(NESTED, "inner") == b'<table id="inner"><tr><td>1</td></tr></table>'
+    assert find_table(NESTED.decode(), "outer") == find_table(NESTED, "outer")
+
+
+def test_several_tables_in_one_pass():
+    found = find_tables(PAGE, ["extra_0", "receiving_and_rushing", "defense"])
+    assert sorted(found) == ["extra_0", "receiving_and_rushing"]
+    assert found["extra_0"] == find_table(PAGE, "extra_0")
+
+
+def test_missing_table():
+    assert find_table(PAGE, "defense") is None
+    assert extract_table(PAGE, "defense") is None
+    with pytest.raises(MissingTable):
+        required_table(PAGE, "defense")
@@ -0,0 +1,68 @@
+import pytest
+
+from sportscrape import table_specs
+from sportscrape.table_specs import TableSpec, get_spec, extract_rows, extractor, any_table, SUMMARY, BODY
+from sportscrape.schemas import SchemaMismatch
+from sportscrape.table_extract import MissingTable
+from sportscrape.benchmarks.pages import nfl_player_page
+
+
+def page(rows, headings=("Year", "Tm", "Yds"), table_id="stats"):
+    head = "".join("<th>{0}</th>".format(h) for h in headings)
+    body = "".join(rows)
+    return ('<html><body><table id="{0}"><thead><tr>{1}</tr></thead><tbody>{2}</tbody></table></body></html>'
+            .format(table_id, head, body)).encode()
+
+
+def row(values, classes=None):
+    attribute = ' class="{0}"'.format(classes) if classes is not None else ""
+    return "<tr{0}>{1}</tr>".format(attribute, "".join("<td>{0}</td>".format(v) for v in values))
+
+
+def test_rows_are_kept_by_any_of_their_classes():
+    content = page([row(["2000", "SFO", "1"], "full"), row(["2001", "SFO", "2"], "full sorted"),
+                    row(["2002", "SFO", "3"], "sorted full"), row(["2003", "SFO", "4"]),
+                    row(["Year", "Tm", "Yds"], "thead"), row(["2004", "2TM", "5"], "partial_table")])
+    columns, rows = extract_rows(content, any_table("stats", classes=("full", "")))
+    assert columns == ["Year", "Tm", "Yds"]
+    assert [r[0] for r in rows] == ["2000", "2001", "2002", "2003"]
+
+
+def test_rows_without_a_class_only_when_asked_for():
+    content = page([row(["2000", "SFO", "1"], "full"), row(["2001", "SFO", "2"])])
+    _, rows = extract_rows(content, any_table("stats", classes=("full",)))
+    assert [r[0] for r in rows] == ["2000"]
+
+
+def test_columns_are_picked_by_heading():
+    spec = TableSpec("stats", None, None, "seasons", "stats", (("Yards", "Yds"), ("Season", "Year")), BODY, ("",))
+    columns, rows = extract_rows(page([row(["2000", "7", "SFO", "1"])], headings=("Year", "No.", "Tm", "Yds")), spec)
+    assert columns == ["Yards", "Season"] and rows == [["1", "2000"]]  # an extra column doesn't shift anything
+
+
+def test_missing_column_and_misaligned_row():
+    spec = TableSpec("stats", None, None, "seasons", "stats", (("TD", "TD"),), BODY, ("",))
+    with pytest.raises(SchemaMismatch):
+        extract_rows(page([row(["2000", "SFO", "1"])]), spec)
+    with pytest.raises(SchemaMismatch):
+        extract_rows(page([row(["2000", "SFO"])]), any_table("stats", classes=("",)))
+
+
+def test_missing_table():
+    with pytest.raises(MissingTable):
+        extract_rows(b"<html></html>", get_spec("football", "WR", SUMMARY))
+
+
+def test_layouts_are_compiled_once():
+    spec = get_spec("football", "WR", SUMMARY)
+    first = extractor(spec, table_specs.find_table(nfl_player_page("A", seed=1), "receiving_and_rushing"))
+    second = extractor(spec, table_specs.find_table(nfl_player_page("B", seed=2), "receiving_and_rushing"))
+    assert first is second
+
+
+def test_wr_summary_and_seasons():
+    content = nfl_player_page("Jerry Rice", seed=3, seasons=4)
+    columns, rows = extract_rows(content, get_spec("football", "WR", SUMMARY))
+    assert columns[:3] == ["GS", "Tgt", "Rec"] and len(rows) == 1
+    columns, rows = extract_rows(content, get_spec("football", "WR"))
+    assert len(rows) == 4 and columns.count("Yds") == 2
@@ -0,0 +1,97 @@
+import email.utils
+import time
+
+import pytest
+
+from sportscrape.benchmarks.standin import StandInServer
+from sportscrape.metrics import collecting
+from sportscrape.transport import (Transport, AdaptiveLimit, HTTPStatusError, Throttled, PageNotFound,
+                                   parse_retry_after)
+
+
+PAGE = b"<html><table id='receiving_and_rushing'></table></html>"
+
+
+@pytest.fixture
+def transport():
+    client = Transport(retries=2, backoff=0, max_retry_after=120)
+    yield client
+    client.close()
+
+
+def test_page(transport):
+    with StandInServer({"/players/R/RiceJe00.htm": PAGE}) as server:
+        assert transport.get(server.url + "/players/R/RiceJe00.htm") == PAGE
+
+
+def test_missing_page_is_not_retried(transport):
+    with StandInServer() as server:
+        with pytest.raises(PageNotFound) as raised:
+            transport.get(server.url + "/players/R/RiceJe00.htm")
+    assert raised.value.status == 404 and isinstance(raised.value, LookupError)
+    assert server.requests == 1
+
+
+def test_throttled_request_is_retried_after_retry_after(transport):
+    # with seed 9 only the first request rolls under error_rate
+    with StandInServer({"/players/R/RiceJe00.htm": PAGE}, error_rate=0.5, error_status=429, retry_after=0,
+                       seed=9) as server:
+        assert transport.get(server.url + "/players/R/RiceJe00.htm") == PAGE
+        assert server.requests == 2
+        assert transport.stats()[server.url.split("//")[1]]["limit"] == 2.5  # halved from 4, then +1/limit
+
+
+def test_server_errors_raise_once_retries_run_out(transport):
+    with StandInServer({"/players/R/RiceJe00.htm": PAGE}, error_rate=1.0, error_status=503) as server:
+        with pytest.raises(HTTPStatusError) as raised:
+            transport.get(server.url + "/players/R/RiceJe00.htm")
+    assert raised.value.status == 503 and not isinstance(raised.value, Throttled)
+    assert server.requests == 3
+
+
+def test_long_retry_after_is_not_waited_out(transport):
+    with StandInServer({"/players/R/RiceJe00.htm": PAGE}, error_rate=1.0, error_status=429,
+                       retry_after=600) as server:
+        url = server.url + "/players/R/RiceJe00.htm"
+        with pytest.raises(Throttled) as raised:
+            transport.get(url)
+        assert raised.value.retry_after == 600
+        with pytest.raises(Throttled) as raised:
+            transport.get(url)  # the host is still paused, nothing is sent
+        assert raised.value.response is None
+        assert server.requests == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("-5") == 0
+    assert 50 < parse_retry_after(email.utils.formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_limit_halves_once_per_round():
+    limit = AdaptiveLimit(initial=8)
+    started = [limit.acquire() for _ in range(4)]
+    for start in started:
+        limit.release(start, congested=True)
+    assert limit.limit == 4
+
+    limit.release(limit.acquire())
+    assert limit.limit == 4.25
+
+
+def test_pause_holds_back_requests():
+    limit = AdaptiveLimit()
+    limit.pause(0.2)
+    before = time.monotonic()
+    limit.release(limit.acquire())
+    assert time.monotonic() - before >= 0.2
+
+
+def test_compressed_bytes_are_counted(transport):
+    page = b"<tr><td>1570</td></tr>" * 500
+    with StandInServer({"/players/R/RiceJe00.htm": page}) as server, collecting() as metrics:
+        assert transport.get(server.url + "/players/R/RiceJe00.htm") == page
+    assert metrics.value("bytes_decoded_total") == len(page)
+    assert 0 < metrics.value("bytes_downloaded_total") < len(page) / 10  # gzipped by the stand-in
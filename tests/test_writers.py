@@ -0,0 +1,158 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from sportscrape.writers import RosterWriter, BufferedSink, NFL_ROSTER_COLUMNS, nfl_roster_writer
+
+
+ROSTER = [(1, "WR", "Jerry Rice", 1985, 2004, "HOF", "/players/R/RiceJe00.htm"),
+          (2, "WR", "Cris Carter", 1987, 2002, "HOF", "/players/C/CartCr00.htm"),
+          (3, "WR", "Tim Brown", 1988, 2004, "HOF", "/players/B/BrowTi00.htm")]
+
+
+def _rows(path, table="all_nfl_players_table", order_by="Id"):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute('SELECT * FROM "{0}" ORDER BY "{1}"'.format(table, order_by)).fetchall()
+    finally:
+        connection.close()
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    path = str(tmp_path / "NFL.db")
+    writer = nfl_roster_writer(path, batch_size=2)
+    writer.add_many(ROSTER)
+    assert writer.rows_written == 2 and len(_rows(path)) == 2  # the last partial batch waits for close
+    writer.close()
+    assert writer.rows_written == 3
+    assert _rows(path) == ROSTER
+
+
+def test_unchanged_reload_writes_nothing(tmp_path):
+    path = str(tmp_path / "NFL.db")
+    with nfl_roster_writer(path, batch_size=2) as writer:
+        writer.add_many(ROSTER)
+    assert (writer.rows_written, writer.rows_changed) == (3, 3)
+
+    with nfl_roster_writer(path) as writer:
+        writer.add_many(ROSTER)
+    assert (writer.rows_written, writer.rows_changed) == (3, 0)
+    assert _rows(path) == ROSTER
+
+
+def test_changed_rows_are_updated(tmp_path):
+    path = str(tmp_path / "NFL.db")
+    with nfl_roster_writer(path) as writer:
+        writer.add_many(ROSTER)
+
+    with nfl_roster_writer(path) as writer:
+        writer.add_many([ROSTER[0][:4] + (2005,) + ROSTER[0][5:]] + ROSTER[1:])
+    assert writer.rows_changed == 1
+    assert _rows(path)[0][4] == 2005
+
+
+def test_missing_columns_are_added(tmp_path):
+    path = str(tmp_path / "NFL.db")
+    old_columns = [column for column in NFL_ROSTER_COLUMNS if column[0] != "HREF"]
+    with RosterWriter(path, "all_nfl_players_table", old_columns) as writer:
+        writer.add_many(row[:-1] for row in ROSTER)
+
+    with nfl_roster_writer(path) as writer:
+        writer.add_many(ROSTER)
+    assert writer.rows_changed == 3  # every row gets its HREF
+    assert _rows(path) == ROSTER
+
+
+def test_failed_batch_is_rolled_back(tmp_path):
+    path = str(tmp_path / "NFL.db")
+    with pytest.raises(sqlite3.ProgrammingError):
+        with RosterWriter(path, "all_nfl_players_table", NFL_ROSTER_COLUMNS) as writer:
+            writer.add_many([ROSTER[0], ROSTER[1][:-1] + (object(),)])
+    assert _rows(path) == []
+
+
+def test_sink_flushes_every_flush_rows(tmp_path):
+    path = str(tmp_path / "stats.db")
+    with BufferedSink(path, "wrs", flush_rows=3, flush_seconds=3600) as sink:
+        sink.add_frame(pd.DataFrame([["Jerry Rice", 1570], ["Cris Carter", 1256]], columns=["Name", "Yds"]))
+        assert sink.flushes == 0
+        sink.add_row(["Tim Brown", 1408], ["Name", "Yds"])
+        assert sink.flushes == 1 and len(_rows(path, "wrs", "Name")) == 3
+        sink.add_row(["Wes Welker", 1569], ["Name", "Yds"])
+    assert sink.flushes == 2  # the rest are written on close
+    assert _rows(path, "wrs", "Name")[-1] == ("Wes Welker", 1569)
+    assert sink.stats()["rows"] == 4
+
+
+def test_sink_flushes_after_flush_seconds(tmp_path):
+    path = str(tmp_path / "stats.db")
+    with BufferedSink(path, "wrs", flush_rows=100, flush_seconds=0) as sink:
+        sink.add_row(["Jerry Rice", 1570], ["Name", "Yds"])
+        assert sink.flushes == 1
+
+
+def _mark_done(connection, tags):
+    connection.executemany("INSERT INTO done VALUES (?)", [(tag,) for tag in tags])
+
+
+def test_sink_marks_tags_with_their_rows(tmp_path):
+    path = str(tmp_path / "stats.db")
+    sqlite3.connect(path).execute("CREATE TABLE done (tag TEXT)").connection.close()
+    flushed = []
+
+    def on_flush(connection, tags):
+        flushed.append(list(tags))
+        _mark_done(connection, tags)
+
+    with BufferedSink(path, "wrs", flush_rows=100, on_flush=on_flush) as sink:
+        sink.add_row(["Jerry Rice", 1570], ["Name", "Yds"], tag="RiceJe00")
+        sink.add_row(["Cris Carter", 1256], ["Name", "Yds"], tag="CartCr00")
+    assert flushed == [["RiceJe00", "CartCr00"]]
+    assert sink.flushes == 1
+    assert _rows(path, "wrs", "Name") == [("Cris Carter", 1256), ("Jerry Rice", 1570)]
+    assert _rows(path, "done", "tag") == [("CartCr00",), ("RiceJe00",)]
+
+
+def test_tables_of_a_tag_are_flushed_together(tmp_path):
+    path = str(tmp_path / "stats.db")
+    sqlite3.connect(path).execute("CREATE TABLE done (tag TEXT)").connection.close()
+    flushed = []
+
+    def on_flush(connection, tags):
+        flushed.append(list(tags))
+        _mark_done(connection, tags)
+
+    with BufferedSink(path, "batting", flush_rows=100, on_flush=on_flush) as sink:
+        sink.add_tables({"batting": ([["Hank Aaron", "755"]], ["Name", "HR"], None),
+                         "pitching": ([["Hank Aaron", "0"]], ["Name", "W"], None)}, tag="aaronha01")
+        sink.add_tables({"batting": ([["Babe Ruth", "714"]], ["Name", "HR"], None)}, tag="ruthba01")
+    assert flushed == [["aaronha01", "ruthba01"]]
+    assert sink.flushes == 1
+    assert _rows(path, "batting", "Name") == [("Babe Ruth", "714"), ("Hank Aaron", "755")]
+    assert _rows(path, "pitching", "Name") == [("Hank Aaron", "0")]
+    assert _rows(path, "done", "tag") == [("aaronha01",), ("ruthba01",)]
+
+
+def test_failed_flush_marks_nothing_done(tmp_path):
+    path = str(tmp_path / "stats.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE done (tag TEXT)")
+    connection.execute("CREATE TABLE wrs (Name TEXT, Yds TEXT CHECK (Yds != 'bad'))")
+    connection.close()
+
+    sink = BufferedSink(path, "wrs", flush_rows=100, on_flush=_mark_done)
+    sink.add_row(["Jerry Rice", "1570"], ["Name", "Yds"], tag="RiceJe00")
+    sink.add_row(["Cris Carter", "bad"], ["Name", "Yds"], tag="CartCr00")
+    with pytest.raises(sqlite3.IntegrityError):
+        sink.close()
+    assert _rows(path, "done", "tag") == []
+    assert _rows(path, "wrs", "Name") == []
+
+
+def test_sink_types_raw_rows_once_per_flush(tmp_path):
+    path = str(tmp_path / "stats.db")
+    with BufferedSink(path, "wrs", flush_rows=100) as sink:
+        sink.add_rows([["1994", "1,499"]], ["Year", "Yds"], table_id="receiving_and_rushing", tag="RiceJe00")
+        sink.add_rows([["1994", ""]], ["Year", "Yds"], table_id="receiving_and_rushing", tag="CartCr00")
+    assert _rows(path, "wrs", "Yds") == [(1994, None), (1994, 1499)]